@@ -0,0 +1,229 @@
+"""
+Query Analysis Cache
+Persistent cache of QueryAnalyzer results with exact lookup on the
+normalized question and semantic lookup by question-embedding similarity
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+
+def make_namespace(prompt_template: str, model: str) -> str:
+    """Cache namespace of a prompt template and model; changing either starts a fresh namespace"""
+    return hashlib.sha256(f"{model}\x1f{prompt_template}".encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    Two-level analysis cache persisted in SQLite
+
+    Level one is an exact match on the normalized question (whitespace
+    collapsed, case folded, trailing punctuation removed). Level two embeds
+    the question and serves the entry of the most similar cached question
+    when the cosine similarity reaches similarity_threshold and the optional
+    guard accepts the pair (e.g. both name the same facet values). All
+    entries of the namespace are loaded into memory on start, so the cache
+    is warm after a restart or deploy; entries from other namespaces (older
+    prompts or models) are never served and age out.
+    """
+
+    def __init__(self,
+                 path: str,
+                 namespace: str,
+                 embed: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = 0.97,
+                 guard: Optional[Callable[[str, str], bool]] = None,
+                 max_entries: int = 10000,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        """
+        Args:
+            path: SQLite database file
+            namespace: make_namespace(prompt template, model)
+            embed: Question embedding function; None disables semantic lookup
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            guard: guard(question, cached_question) must be True for a semantic hit
+            max_entries: Entries kept per namespace, oldest evicted first
+            ttl_seconds: Age after which an entry is no longer served
+        """
+        self.path = path
+        self.namespace = namespace
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.guard = guard
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                namespace TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                vector BLOB,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, question_key)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (namespace, created_at)"
+        )
+        self._connection.commit()
+
+        # question_key -> (question, analysis, created_at)
+        self._entries: Dict[str, tuple] = {}
+        # Semantic table: unit vectors aligned with _vector_keys
+        self._vector_keys: List[str] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "embedding_errors": 0}
+        self._load()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Case-, whitespace- and trailing-punctuation-insensitive form of a question"""
+        return re.sub(r"\s+", " ", question or "").strip().rstrip("?!. ").casefold()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_seconds
+        rows = self._connection.execute(
+            "SELECT question_key, question, analysis, vector, created_at FROM analyses "
+            "WHERE namespace = ? AND created_at >= ? ORDER BY created_at",
+            (self.namespace, cutoff)
+        ).fetchall()
+        for key, question, analysis, vector, created_at in rows:
+            self._entries[key] = (question, json.loads(analysis), created_at)
+            if vector is not None:
+                self._add_vector(key, np.frombuffer(vector, dtype=np.float32))
+
+    def _add_vector(self, key: str, vector: np.ndarray):
+        norm = float(np.linalg.norm(vector))
+        # Vectors from another embedding size (a changed embedding model) cannot be compared
+        if norm == 0 or (self._vectors and self._vectors[0].shape != vector.shape):
+            return
+        self._vector_keys.append(key)
+        self._vectors.append((vector / norm).astype(np.float32))
+        self._matrix = None
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.embed is None:
+            return None
+        try:
+            embedding = self.embed(question)
+        except Exception as e:
+            print(f"Error embedding question for analysis cache: {str(e)}")
+            embedding = None
+        if not embedding:
+            with self._lock:
+                self._stats["embedding_errors"] += 1
+            return None
+        return np.asarray(embedding, dtype=np.float32)
+
+    def get(self, question: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis for question or a near-identical one, else None"""
+        key = self.normalize(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] < self.ttl_seconds:
+                self._stats["exact_hits"] += 1
+                return dict(entry[1], source="cache")
+            has_vectors = bool(self._vectors)
+
+        if has_vectors:
+            vector = self._embed(question)
+            if vector is not None:
+                match = self._nearest(question, vector, now)
+                if match is not None:
+                    return match
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _nearest(self, question: str, vector: np.ndarray, now: float) -> Optional[Dict[str, Any]]:
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return None
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            if self._matrix.shape[1] != vector.shape[0]:
+                return None
+            similarities = self._matrix @ (vector / norm)
+            for index in np.argsort(-similarities)[:5]:
+                if similarities[index] < self.similarity_threshold:
+                    break
+                entry = self._entries.get(self._vector_keys[index])
+                if entry is None or now - entry[2] >= self.ttl_seconds:
+                    continue
+                if self.guard is not None and not self.guard(question, entry[0]):
+                    continue
+                self._stats["semantic_hits"] += 1
+                return dict(entry[1], source="semantic_cache", cache_similarity=round(float(similarities[index]), 4))
+        return None
+
+    def put(self, question: str, analysis: Dict[str, Any]):
+        """Store the analysis of question (and its embedding for semantic lookup)"""
+        key = self.normalize(question)
+        stored = {k: v for k, v in analysis.items() if k not in ("source", "cache_similarity")}
+        vector = self._embed(question)
+        now = time.time()
+
+        with self._lock:
+            replaced = key in self._entries
+            self._entries[key] = (question, stored, now)
+            if vector is not None and not replaced:
+                self._add_vector(key, vector)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO analyses (namespace, question_key, question, analysis, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, question, json.dumps(stored),
+                 vector.tobytes() if vector is not None else None, now)
+            )
+            self._connection.commit()
+            self._stats["stores"] += 1
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the oldest entries beyond max_entries (caller holds the lock)"""
+        excess = sorted(self._entries, key=lambda key: self._entries[key][2])[:len(self._entries) - self.max_entries]
+        self._connection.executemany(
+            "DELETE FROM analyses WHERE namespace = ? AND question_key = ?",
+            [(self.namespace, key) for key in excess]
+        )
+        self._connection.commit()
+        for key in excess:
+            del self._entries[key]
+        keep = [i for i, key in enumerate(self._vector_keys) if key in self._entries]
+        self._vector_keys = [self._vector_keys[i] for i in keep]
+        self._vectors = [self._vectors[i] for i in keep]
+        self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["vectors"] = len(self._vectors)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        stats["namespace"] = self.namespace
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,7 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.log_config import logger
 from app.rate_limiter import rate_limiter
 from app.routes.routes import router as api_router
+from app.services.process import QueryProcessorService
+from app.services.rag_system import RAGSystem
 import sentry_sdk
 
 sentry_sdk.init(
@@ -12,9 +16,24 @@ sentry_sdk.init(
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the RAG clients once per process and warm their connections
+    rag_system = RAGSystem()
+    warm_up = await rag_system.warm_up()
+    logger.info(f"RAG system warmed up: {warm_up}")
+    app.state.query_processor = QueryProcessorService(rag_system)
+    try:
+        yield
+    finally:
+        await rag_system.aclose()
+        logger.info("RAG system clients closed")
+
+
 app = FastAPI(
     title="Experian POC API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = ["http://localhost:3000", "http://localhost:5173", "http://localhost:5174"]
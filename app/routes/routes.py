@@ -1,10 +1,10 @@
 import time
 from typing import List, Optional
-from fastapi import APIRouter, File, Form, UploadFile
+from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.params import Query
 from app.dummy.dummy import generate_string_with_query
 from app.models.models import QueryPromptRequest
-from app.services.process import QueryProcessorService
+from app.services.process import QueryProcessorService, get_query_processor
 
 from app.log_config import logger
 
@@ -16,15 +16,21 @@ def health_check():
     return {"data": {}, "message": "API is healthy", "status": 200}
 
 
+@router.get("/metrics", tags=["Health"])
+def get_metrics(query_processor: QueryProcessorService = Depends(get_query_processor)):
+    return {"data": query_processor.rag_system.get_metrics(), "message": "Metrics retrieved", "status": 200}
+
+
 @router.post("/analyse", tags=["Assessment analyser"])
 async def handle_assessment(
     prompt: str = Form(..., description="The assessment prompt string"),
-    files: Optional[List[UploadFile]] = File(None, description="Optional list of uploaded files")):
+    files: Optional[List[UploadFile]] = File(None, description="Optional list of uploaded files"),
+    query_processor: QueryProcessorService = Depends(get_query_processor)):
     logger.info(f"Received assessment request: {prompt}")
     try:
         request_data = QueryPromptRequest(prompt=prompt)
         logger.info(f"Assessment request received - {request_data}")
-        response = await QueryProcessorService().process_assessment(request_data, files=files)
+        response = await query_processor.process_assessment(request_data, files=files)
         logger.info(f"Assessment processed successfully: {response}")
         return {"data": response, "status": 200, "message": "Assessment handled successfully"}
     except Exception as e:
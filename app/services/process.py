@@ -1,7 +1,7 @@
 from datetime import datetime
 import sys
 from typing import List, Optional
-from fastapi import UploadFile
+from fastapi import Request, UploadFile
 from urllib.parse import urlparse
 from app.models.models import QueryPromptRequest
 from app.services.blobservice import download_blob_to_local, download_blob_to_local, upload_blob, upload_png_to_blob
@@ -14,7 +14,11 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 class QueryProcessorService:
     print("Initializing RAG System...")
-    def __init__(self):
+    def __init__(self, rag_system: Optional[RAGSystem] = None):
+        # The API shares one RAGSystem built at startup; standalone use builds its own
+        if rag_system is not None:
+            self.rag_system = rag_system
+            return
         try:
             self.rag_system = RAGSystem()
             print("System initialized successfully!\n")
@@ -33,7 +37,7 @@ class QueryProcessorService:
                 file_uploaded_response = await upload_blob(files)
             
             # pass the query to rag system to process and get response
-            rag_response = self.rag_system.answer_question(prompt)
+            rag_response = await self.rag_system.answer_question_async(prompt)
             print(f"RAG System response: ", rag_response)
 
             return {"message": f"Processed query: {prompt}", "upload_info": file_uploaded_response if files else None, "rag_response": rag_response}
@@ -92,4 +96,9 @@ class QueryProcessorService:
             return {"message": assessment_result, "upload_info": file_uploaded_response if files else None}
         except Exception as e:
             logger.error(f"Error processing assessment: {e}")
-            return {"error": "Failed to process assessment"}
\ No newline at end of file
+            return {"error": "Failed to process assessment"}
+
+
+def get_query_processor(request: Request) -> QueryProcessorService:
+    """FastAPI dependency returning the process-wide QueryProcessorService created at startup"""
+    return request.app.state.query_processor
@@ -3,20 +3,46 @@ RAG System Orchestrator
 Integrates query analysis, document retrieval, and answer generation
 """
 
+import asyncio
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
 from openai import AzureOpenAI
 from query_analyzer import QueryAnalyzer
-from hybrid_search_client import HybridSearchClient
+from async_hybrid_search_client import AsyncHybridSearchClient
+from search_backend import create_search_client, get_search_backend
+from score_cutoff import ScoreCutoff
+from facet_vocabulary import FacetVocabulary
+from filter_grounding import FilterGrounder
+from speculative_search import SpeculativeSearch
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class RAGSystem:
     def __init__(self):
-        self.query_analyzer = QueryAnalyzer()
-        self.search_client = HybridSearchClient()
+        # SEARCH_BACKEND selects Azure AI Search, the local snapshot engine or Azure with local fallback
+        self.search_backend = get_search_backend()
+        self.search_client = create_search_client(self.search_backend)
+        # The analyzer's fast path matches questions against the index's current facet values
+        self.facet_vocabulary = FacetVocabulary.for_search_client(self.search_client)
+        self.query_analyzer = QueryAnalyzer(
+            vocabulary=self.facet_vocabulary,
+            embed=self.search_client.create_embedding
+        )
+        # Snaps analyzed filter values to facet values that exist, dropping those that match none
+        self.filter_grounder = FilterGrounder.from_env(self.facet_vocabulary)
+        self.async_search_client = AsyncHybridSearchClient() if self.search_backend == "azure" else None
+        # Drops the low-relevance tail of the results before they reach the prompt
+        self.score_cutoff = ScoreCutoff.from_env()
+        # Searches the raw question while it is analyzed; used when the analysis does not change the search
+        self.speculative_search = SpeculativeSearch.from_env()
+        self._speculation_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SPECULATIVE_SEARCH_MAX_PARALLEL", "8")),
+            thread_name_prefix="speculative-search"
+        )
         
         # Azure AI Foundry configuration for GPT-5
         self.foundry_endpoint = os.getenv("AZURE_AI_FOUNDRY_ENDPOINT")
@@ -53,52 +79,30 @@ class RAGSystem:
             Dictionary with answer, sources, and metadata
         """
         
-        result = {
-            "question": question,
-            "answer": "",
-            "sources": [],
-            "metadata": {
-                "search_query": "",
-                "filters": "",
-                "intent": "",
-                "documents_retrieved": 0
-            }
-        }
+        result = self._new_result(question)
         
         try:
-            # Step 1: Analyze question and extract search parameters
+            # Step 1: Analyze question and extract search parameters; while
+            # the LLM analyzes it, the raw question is searched speculatively
             print(f"\nAnalyzing question...")
-            analysis = self.query_analyzer.analyze_question(question)
-            result["metadata"]["search_query"] = analysis["search_query"]
-            result["metadata"]["filters"] = analysis["filters"]
-            result["metadata"]["intent"] = analysis["intent"]
+            speculation = None
+            analysis = self.query_analyzer.analyze_without_llm(question)
+            if analysis is None:
+                if self.speculative_search.enabled:
+                    speculation = (self._speculation_executor.submit(self._timed_search, question, top_k),
+                                   time.perf_counter())
+                analysis = self.query_analyzer.analyze_with_llm(question)
+            analysis = self._ground_filters(analysis)
+            self._record_analysis(result, analysis)
             
             # Step 2: Retrieve relevant documents
             print(f"Searching for relevant documents...")
-            search_results = self.search_client.hybrid_search(
-                query=analysis["search_query"],
-                filters=analysis["filters"] if analysis["filters"] else None,
-                top=top_k,
-                select_fields=["NameofTools", "Manufacturer", "TEBStatus", 
-                             "Capabilities", "SubCapability", "Description", 
-                             "MetaTags", "Version", "StandardsComments", 
-                             "EANotes", "StandardCategory", "EAReferenceID", 
-                             "MetaTagsDescription", "CapabilityManager"]
-            )
-            
-            if "error" in search_results:
-                result["answer"] = f"Error retrieving documents: {search_results['error']}"
-                return result
-            
-            total_count = search_results.get("total_count", 0)
-            documents = search_results.get("results", [])
-            
-            result["metadata"]["documents_retrieved"] = total_count
-            
-            print(f"Found {total_count} relevant documents, retrieved {len(documents)} documents")
+            search_results = self._resolve_speculation(result, question, analysis, speculation)
+            if search_results is None:
+                search_results = self.search_client.hybrid_search(**self._search_params(analysis, top_k))
             
+            documents = self._collect_documents(result, search_results)
             if not documents:
-                result["answer"] = "No relevant documents found in the knowledge base to answer your question."
                 return result
             
             # Step 3: Format documents as context
@@ -116,6 +120,271 @@ class RAGSystem:
             result["answer"] = f"Error processing question: {str(e)}"
             return result
     
+    async def answer_question_async(self, question: str, top_k: int = 100, retrieve_all: bool = True) -> Dict[str, Any]:
+        """
+        Non-blocking answer_question for the async API path
+        
+        Retrieval uses the async search client; the analysis and generation
+        LLM calls run in worker threads so the event loop keeps serving
+        other requests meanwhile.
+        """
+        logging.info("Initiated:: Answering question using RAG System (async)")
+        result = self._new_result(question)
+        
+        try:
+            # Speculation only pays off behind the LLM; the other analyzers answer in microseconds
+            speculation = None
+            analysis = await asyncio.to_thread(self.query_analyzer.analyze_without_llm, question)
+            if analysis is None:
+                if self.speculative_search.enabled:
+                    speculation = (asyncio.ensure_future(self._timed_search_async(question, top_k)),
+                                   time.perf_counter())
+                try:
+                    analysis = await asyncio.to_thread(self.query_analyzer.analyze_with_llm, question)
+                except BaseException:
+                    if speculation:
+                        speculation[0].cancel()
+                    raise
+            analysis = await asyncio.to_thread(self._ground_filters, analysis)
+            self._record_analysis(result, analysis)
+            
+            search_results = await self._resolve_speculation_async(result, question, analysis, speculation)
+            if search_results is None:
+                search_params = self._search_params(analysis, top_k)
+                if self.async_search_client:
+                    search_results = await self.async_search_client.hybrid_search(**search_params)
+                else:
+                    search_results = await asyncio.to_thread(self.search_client.hybrid_search, **search_params)
+            
+            documents = self._collect_documents(result, search_results)
+            if not documents:
+                return result
+            
+            context = self._format_documents_as_context(documents)
+            result["answer"] = await asyncio.to_thread(self._generate_answer, question, context, documents)
+            result["sources"] = documents
+            
+            return result
+            
+        except Exception as e:
+            result["answer"] = f"Error processing question: {str(e)}"
+            return result
+    
+    async def warm_up(self) -> Dict[str, float]:
+        """
+        Open pooled connections before the first request arrives
+        
+        Issues a trivial search and a query embedding through the async
+        client, loads the facet vocabulary (fast path and filter grounding) and
+        lists models on the LLM clients so DNS, TLS and
+        connection setup are paid at startup. Failures are reported, not
+        raised, so an unavailable dependency does not block startup.
+        
+        Returns:
+            Seconds spent per warm-up step
+        """
+        async def timed(name, step):
+            started = time.perf_counter()
+            try:
+                outcome = await step
+                if isinstance(outcome, dict) and "error" in outcome:
+                    print(f"Warm-up {name} failed: {outcome['error']}")
+            except Exception as e:
+                print(f"Warm-up {name} failed: {str(e)}")
+            return name, round(time.perf_counter() - started, 3)
+        
+        if self.async_search_client:
+            await self.async_search_client.open()
+            search_steps = [
+                timed("search", self.async_search_client.keyword_search("*", top=1)),
+                timed("embedding", self.async_search_client.create_embedding("warm-up"))
+            ]
+        else:
+            search_steps = [
+                timed("search", asyncio.to_thread(self.search_client.keyword_search, "*", top=1)),
+                timed("embedding", asyncio.to_thread(self.search_client.create_embedding, "warm-up"))
+            ]
+        search_steps.append(timed("facet_vocabulary", asyncio.to_thread(self.facet_vocabulary.current)))
+        timings = await asyncio.gather(
+            *search_steps,
+            timed("analysis", asyncio.to_thread(self.query_analyzer.openai_client.models.list)),
+            timed("generation", asyncio.to_thread(self.foundry_client.models.list))
+        )
+        return dict(timings)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Cache and request-coalescing counters of the analyzer and search clients"""
+        metrics = {
+            "search_backend": self.search_backend,
+            "single_flight": {"analyze_question": self.query_analyzer.get_single_flight_stats()},
+            "analysis_fast_path": self.query_analyzer.get_fast_path_stats(),
+            "analysis_cache": self.query_analyzer.get_analysis_cache_stats(),
+            "analysis_local_model": self.query_analyzer.get_local_analyzer_stats(),
+            "filter_grounding": self.filter_grounder.stats(),
+            "speculative_search": self.speculative_search.stats()
+        }
+        if hasattr(self.search_client, "get_single_flight_stats"):
+            metrics["single_flight"]["search"] = self.search_client.get_single_flight_stats()
+        if self.async_search_client:
+            metrics["single_flight"]["async_search"] = self.async_search_client.get_single_flight_stats()
+        if hasattr(self.search_client, "get_filter_validation_stats"):
+            metrics["filter_validation"] = self.search_client.get_filter_validation_stats()
+        if hasattr(self.search_client, "get_result_cache_stats"):
+            metrics["result_cache"] = self.search_client.get_result_cache_stats()
+        if hasattr(self.search_client, "get_fallback_stats"):
+            metrics["fallback"] = self.search_client.get_fallback_stats()
+        metrics["embedding_cache"] = self.search_client.get_embedding_cache_stats()
+        return metrics
+    
+    async def aclose(self):
+        """Release every client's pooled connections"""
+        if self.async_search_client:
+            await self.async_search_client.close()
+        self._speculation_executor.shutdown(wait=False, cancel_futures=True)
+        self.search_client.close()
+        self.query_analyzer.close()
+        self.foundry_client.close()
+    
+    def _new_result(self, question: str) -> Dict[str, Any]:
+        return {
+            "question": question,
+            "answer": "",
+            "sources": [],
+            "metadata": {
+                "search_query": "",
+                "filters": "",
+                "intent": "",
+                "documents_retrieved": 0,
+                "documents_used": 0,
+                "cutoff": None
+            }
+        }
+    
+    def _ground_filters(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """The analysis with its filter values grounded to the index's facet values"""
+        grounding = self.filter_grounder.ground(analysis["filters"])
+        if grounding["snapped"] or grounding["dropped"]:
+            analysis = dict(analysis, filters=grounding["filter"],
+                            grounding={"snapped": grounding["snapped"], "dropped": grounding["dropped"]})
+        return analysis
+    
+    def _record_analysis(self, result: Dict[str, Any], analysis: Dict[str, Any]):
+        result["metadata"]["search_query"] = analysis["search_query"]
+        result["metadata"]["filters"] = analysis["filters"]
+        result["metadata"]["intent"] = analysis["intent"]
+        result["metadata"]["analysis_source"] = analysis.get("source", "llm")
+        if "grounding" in analysis:
+            result["metadata"]["filter_grounding"] = analysis["grounding"]
+    
+    def _search_params(self, analysis: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+        """hybrid_search arguments for an analyzed question"""
+        return {
+            "query": analysis["search_query"],
+            "filters": analysis["filters"] if analysis["filters"] else None,
+            "top": top_k,
+            "select_fields": ["NameofTools", "Manufacturer", "TEBStatus", 
+                              "Capabilities", "SubCapability", "Description", 
+                              "MetaTags", "Version", "StandardsComments", 
+                              "EANotes", "StandardCategory", "EAReferenceID", 
+                              "MetaTagsDescription", "CapabilityManager"]
+        }
+    
+    def _timed_search(self, question: str, top_k: int):
+        """Unfiltered hybrid search for the raw question and the time it finished"""
+        try:
+            search_results = self.search_client.hybrid_search(
+                **self._search_params({"search_query": question, "filters": ""}, top_k)
+            )
+        except Exception as e:
+            search_results = {"error": str(e)}
+        return search_results, time.perf_counter()
+    
+    async def _timed_search_async(self, question: str, top_k: int):
+        if not self.async_search_client:
+            return await asyncio.to_thread(self._timed_search, question, top_k)
+        search_results = await self.async_search_client.hybrid_search(
+            **self._search_params({"search_query": question, "filters": ""}, top_k)
+        )
+        return search_results, time.perf_counter()
+    
+    def _resolve_speculation(self, result: Dict[str, Any], question: str, analysis: Dict[str, Any],
+                             speculation) -> Optional[Dict[str, Any]]:
+        """Speculative search results when the analysis accepts them, else None (the search is discarded)"""
+        if speculation is None:
+            return None
+        future, started = speculation
+        hit, reason, similarity = self.speculative_search.accepts(question, analysis)
+        if not hit:
+            # Only skips a search still waiting for a worker; a running one completes and its results are ignored
+            future.cancel()
+            finished = future.result()[1] if future.done() and not future.cancelled() else time.perf_counter()
+            return self._record_speculation(result, None, reason, similarity, finished - started, 0.0)
+        
+        waiting = time.perf_counter()
+        search_results, finished = future.result()
+        return self._record_speculation(result, search_results, reason, similarity,
+                                        finished - started, time.perf_counter() - waiting)
+    
+    async def _resolve_speculation_async(self, result: Dict[str, Any], question: str, analysis: Dict[str, Any],
+                                         speculation) -> Optional[Dict[str, Any]]:
+        if speculation is None:
+            return None
+        task, started = speculation
+        hit, reason, similarity = self.speculative_search.accepts(question, analysis)
+        if not hit:
+            finished = task.result()[1] if task.done() and not task.cancelled() and not task.exception() \
+                else time.perf_counter()
+            task.cancel()
+            return self._record_speculation(result, None, reason, similarity, finished - started, 0.0)
+        
+        waiting = time.perf_counter()
+        try:
+            search_results, finished = await task
+        except Exception as e:
+            # Recorded as an error and answered by the search of the analyzed query
+            print(f"Error in speculative search: {str(e)}")
+            search_results, finished = {"error": str(e)}, time.perf_counter()
+        return self._record_speculation(result, search_results, reason, similarity,
+                                        finished - started, time.perf_counter() - waiting)
+    
+    def _record_speculation(self, result: Dict[str, Any], search_results: Optional[Dict[str, Any]],
+                            reason: str, similarity: Optional[float],
+                            search_seconds: float, waited_seconds: float) -> Optional[Dict[str, Any]]:
+        """Count the speculation, note it in the metadata and return the results to use, if any"""
+        error = search_results is not None and "error" in search_results
+        if error:
+            # Searched again with the analyzed query rather than reporting the speculative failure
+            search_results, reason = None, "error"
+        speculation = self.speculative_search.record(search_results is not None, search_seconds,
+                                                     waited_seconds, error=error)
+        speculation.update({"reason": reason, "query_similarity": similarity})
+        result["metadata"]["speculation"] = speculation
+        if search_results is not None:
+            print(f"Using speculative search results ({reason}), "
+                  f"{speculation['latency_saved_seconds']}s saved")
+        return search_results
+    
+    def _collect_documents(self, result: Dict[str, Any], search_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Retrieved documents, or [] with result["answer"] explaining why there are none"""
+        if "error" in search_results:
+            result["answer"] = f"Error retrieving documents: {search_results['error']}"
+            return []
+        
+        total_count = search_results.get("total_count", 0)
+        documents, cutoff = self.score_cutoff.apply(search_results.get("results", []))
+        
+        result["metadata"]["documents_retrieved"] = total_count
+        result["metadata"]["documents_used"] = len(documents)
+        result["metadata"]["cutoff"] = cutoff
+        
+        print(f"Found {total_count} relevant documents, retrieved {cutoff['input_documents']} documents")
+        if cutoff["applied"]:
+            print(f"Score cutoff ({cutoff['reason']}) kept {len(documents)} documents")
+        
+        if not documents:
+            result["answer"] = "No relevant documents found in the knowledge base to answer your question."
+        return documents
+    
     def _format_documents_as_context(self, documents: List[Dict[str, Any]]) -> str:
         """Format retrieved documents as context for the LLM"""
         
@@ -0,0 +1,486 @@
+"""
+Async Azure AI Search Hybrid Search Client
+Non-blocking counterpart of HybridSearchClient for the FastAPI request path,
+built on azure.search.documents.aio and AsyncAzureOpenAI with pooled transports
+"""
+
+import asyncio
+import os
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+import httpx
+from openai import AsyncAzureOpenAI
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.search.documents.aio import SearchClient
+from azure.search.documents.models import (
+    VectorizedQuery,
+    QueryType,
+    QueryCaptionType,
+    QueryAnswerType
+)
+from index_registry import IndexPointer, resolve_serving_index
+from vector_config import VectorSettings, VECTOR_FIELD_NAME
+from query_embedding_cache import QueryEmbeddingCache
+from search_result_cache import make_result_key
+from single_flight import AsyncSingleFlight
+from odata_filter import FilterValidator, ODataFilterError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class AsyncHybridSearchClient:
+    """
+    Async hybrid search client with the same methods and results as HybridSearchClient
+
+    All search clients share one aiohttp session and all embedding calls one
+    httpx client, so connections are pooled and reused across concurrent
+    requests up to the configured limits. Transports are opened on first use,
+    inside the running event loop, and released by close().
+    """
+
+    def __init__(self):
+        # Azure AI Search configuration
+        self.search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+        self.search_key = os.getenv("AZURE_SEARCH_KEY")
+        self.search_index_name = "technology-tools-index"
+        self.index_pointer = IndexPointer()
+        self.serving_index_name = resolve_serving_index(self.search_index_name, self.index_pointer)
+
+        # Azure OpenAI configuration for embeddings
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_endpoint = os.getenv("OPENAI_ENDPOINT")
+        self.openai_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+        # Must match the settings used at ingestion so queries share the document vector space
+        self.vector_settings = VectorSettings.from_env()
+        self.embedding_kwargs = self.vector_settings.embedding_kwargs(self.embedding_model)
+
+        # Connection pool limits shared by all concurrent requests
+        self.search_max_connections = int(os.getenv("SEARCH_MAX_CONNECTIONS", "100"))
+        self.openai_max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+        self.openai_max_keepalive_connections = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        self.http_timeout = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+
+        self.embedding_cache = None
+        if os.getenv("QUERY_EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            self.embedding_cache = QueryEmbeddingCache(
+                model=self.embedding_model,
+                dimensions=self.vector_settings.dimensions,
+                max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000")),
+                ttl_seconds=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")),
+                redis_url=os.getenv("QUERY_EMBEDDING_CACHE_REDIS_URL"),
+                redis_ttl_seconds=int(os.getenv("QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS", "86400"))
+            )
+
+        # Filters are checked against the index schema and canonicalized before any request
+        self.filter_validator = FilterValidator.from_env()
+
+        # Identical concurrent embedding and hybrid calls share one upstream request
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        self.embedding_flight = AsyncSingleFlight("create_embedding")
+        self.hybrid_flight = AsyncSingleFlight("hybrid_search")
+
+        self.credential = AzureKeyCredential(self.search_key)
+        self.search_client: Optional[SearchClient] = None
+        self.openai_client: Optional[AsyncAzureOpenAI] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._transport: Optional[AioHttpTransport] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+
+    async def open(self):
+        """Create the pooled transports and clients (idempotent)"""
+        if self._session is not None:
+            return
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+
+        async with self._open_lock:
+            if self._session is not None:
+                return
+            try:
+                # One aiohttp session for every Azure AI Search client
+                session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=self.search_max_connections,
+                        limit_per_host=self.search_max_connections,
+                        ttl_dns_cache=300
+                    ),
+                    timeout=aiohttp.ClientTimeout(total=self.http_timeout),
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                    auto_decompress=False
+                )
+                self._transport = AioHttpTransport(session=session, session_owner=False)
+                self.search_client = self._create_search_client(self.serving_index_name)
+
+                # One httpx pool for Azure OpenAI embeddings
+                self._http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.openai_max_connections,
+                        max_keepalive_connections=self.openai_max_keepalive_connections
+                    ),
+                    timeout=self.http_timeout
+                )
+                self.openai_client = AsyncAzureOpenAI(
+                    api_key=self.openai_api_key,
+                    api_version=self.openai_api_version,
+                    azure_endpoint=self.openai_endpoint,
+                    http_client=self._http_client
+                )
+                self._session = session
+
+                print("Async Hybrid Search Client initialized successfully")
+
+            except Exception as e:
+                print(f"Error initializing async search client: {str(e)}")
+                raise
+
+    async def close(self):
+        """Close the search clients and release the pooled connections"""
+        if self._session is None:
+            return
+        if self.search_client is not None:
+            await self.search_client.close()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        await self._session.close()
+        self._session = None
+        self.search_client = None
+        self.openai_client = None
+
+    async def __aenter__(self) -> "AsyncHybridSearchClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_details):
+        await self.close()
+
+    def _create_search_client(self, index_name: str) -> SearchClient:
+        return SearchClient(
+            endpoint=self.search_endpoint,
+            index_name=index_name,
+            credential=self.credential,
+            transport=self._transport
+        )
+
+    async def _get_search_client(self) -> SearchClient:
+        """Return a search client for the served index, following blue/green flips"""
+        await self.open()
+        serving_index_name = resolve_serving_index(self.search_index_name, self.index_pointer)
+        if serving_index_name != self.serving_index_name:
+            print(f"Index pointer moved: now querying '{serving_index_name}'")
+            # The transport is shared and not owned by the client, so closing keeps the pool
+            previous_client = self.search_client
+            self.serving_index_name = serving_index_name
+            self.search_client = self._create_search_client(serving_index_name)
+            await previous_client.close()
+        return self.search_client
+
+    async def _cache_get(self, text: str) -> Optional[List[float]]:
+        # Redis lookups block, so they run off the event loop
+        if self.embedding_cache.redis_enabled:
+            return await asyncio.to_thread(self.embedding_cache.get, text)
+        return self.embedding_cache.get(text)
+
+    async def _cache_put(self, text: str, embedding: List[float]):
+        if self.embedding_cache.redis_enabled:
+            await asyncio.to_thread(self.embedding_cache.put, text, embedding)
+        else:
+            self.embedding_cache.put(text, embedding)
+
+    async def create_embedding(self, text: str) -> List[float]:
+        """Create embedding for text using Azure OpenAI, served from the query cache when possible"""
+        if self.embedding_cache:
+            cached = await self._cache_get(text)
+            if cached is not None:
+                return cached
+
+        if not self.single_flight_enabled:
+            return await self._create_embedding(text)
+        return await self.embedding_flight.do(text, lambda: self._create_embedding(text))
+
+    async def _create_embedding(self, text: str) -> List[float]:
+        await self.open()
+        try:
+            response = await self.openai_client.embeddings.create(
+                input=text,
+                model=self.embedding_model,
+                **self.embedding_kwargs
+            )
+            embedding = response.data[0].embedding
+        except Exception as e:
+            print(f"Error creating embedding: {str(e)}")
+            return []
+
+        if self.embedding_cache:
+            await self._cache_put(text, embedding)
+        return embedding
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Query embedding cache hit rates (empty when the cache is disabled)"""
+        return self.embedding_cache.stats() if self.embedding_cache else {}
+
+    def get_filter_validation_stats(self) -> Dict[str, Any]:
+        """Filters checked, repaired and rejected before reaching the service"""
+        return self.filter_validator.stats()
+
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """Calls, upstream executions and coalesced requests per coalesced operation"""
+        return {
+            "create_embedding": self.embedding_flight.stats(),
+            "hybrid_search": self.hybrid_flight.stats()
+        }
+
+    def _build_vector_query(self, query_embedding: List[float], top: int) -> VectorizedQuery:
+        """Vector query against content_vector; compressed indexes rescore with their default oversampling"""
+        return VectorizedQuery(
+            vector=query_embedding,
+            k_nearest_neighbors=top,
+            fields=VECTOR_FIELD_NAME
+        )
+
+    async def _run_search(self, search_params: Dict[str, Any]):
+        """Run a search and return (total_count, result dicts)"""
+        search_client = await self._get_search_client()
+        results = await search_client.search(**search_params)
+        documents = [dict(result) async for result in results]
+        return await results.get_count(), documents
+
+    async def keyword_search(self,
+                             query: str,
+                             filters: Optional[str] = None,
+                             top: int = 100,
+                             select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Perform keyword search with optional filtering
+
+        Args:
+            query: Search query text
+            filters: OData filter expression (e.g., "teb_status eq 'TEB Approved'")
+            top: Number of results to return (default: 100 to retrieve all relevant documents)
+            select_fields: Fields to return in results
+        """
+        try:
+            filters = self.filter_validator.check(filters)
+
+            search_params = {
+                "search_text": query,
+                "top": top,
+                "include_total_count": True
+            }
+
+            if filters:
+                search_params["filter"] = filters
+
+            if select_fields:
+                search_params["select"] = select_fields
+
+            total_count, documents = await self._run_search(search_params)
+
+            return {
+                "query_type": "keyword",
+                "query": query,
+                "filters": filters,
+                "total_count": total_count,
+                "results": documents
+            }
+
+        except Exception as e:
+            print(f"Error in keyword search: {str(e)}")
+            return {"error": str(e)}
+
+    async def vector_search(self,
+                            query: str,
+                            filters: Optional[str] = None,
+                            top: int = 100,
+                            select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Perform vector search with optional filtering
+
+        Args:
+            query: Search query text
+            filters: OData filter expression
+            top: Number of results to return (default: 100 to retrieve all relevant documents)
+            select_fields: Fields to return in results
+        """
+        try:
+            filters = self.filter_validator.check(filters)
+
+            # Create embedding for the query
+            query_embedding = await self.create_embedding(query)
+            if not query_embedding:
+                return {"error": "Failed to create embedding for query"}
+
+            search_params = {
+                "vector_queries": [self._build_vector_query(query_embedding, top)],
+                "top": top,
+                "include_total_count": True
+            }
+
+            if filters:
+                search_params["filter"] = filters
+
+            if select_fields:
+                search_params["select"] = select_fields
+
+            total_count, documents = await self._run_search(search_params)
+
+            return {
+                "query_type": "vector",
+                "query": query,
+                "filters": filters,
+                "total_count": total_count,
+                "results": documents
+            }
+
+        except Exception as e:
+            print(f"Error in vector search: {str(e)}")
+            return {"error": str(e)}
+
+    async def hybrid_search(self,
+                            query: str,
+                            filters: Optional[str] = None,
+                            top: int = 100,
+                            select_fields: Optional[List[str]] = None,
+                            semantic_configuration_name: str = "default-semantic-config") -> Dict[str, Any]:
+        """
+        Perform hybrid search (vector + keyword + semantic) with optional filtering
+
+        Args:
+            query: Search query text
+            filters: OData filter expression
+            top: Number of results to return (default: 100 to retrieve all relevant documents)
+            select_fields: Fields to return in results
+            semantic_configuration_name: Semantic search configuration name
+        """
+        try:
+            filters = self.filter_validator.check(filters)
+        except ODataFilterError as e:
+            return {"error": f"Invalid filter: {str(e)}"}
+        compute = lambda: self._hybrid_search(query, filters, top, select_fields, semantic_configuration_name)
+        if not self.single_flight_enabled:
+            return await compute()
+        key = (make_result_key("hybrid", query, filters, select_fields, top), semantic_configuration_name)
+        return await self.hybrid_flight.do(key, compute)
+
+    async def _hybrid_search(self, query, filters, top, select_fields,
+                             semantic_configuration_name) -> Dict[str, Any]:
+        try:
+            # Create embedding for the query
+            query_embedding = await self.create_embedding(query)
+            if not query_embedding:
+                return {"error": "Failed to create embedding for query"}
+
+            search_params = {
+                "search_text": query,
+                "vector_queries": [self._build_vector_query(query_embedding, top)],
+                "top": top,
+                "include_total_count": True,
+                "query_type": QueryType.SEMANTIC,
+                "semantic_configuration_name": semantic_configuration_name,
+                "query_caption": QueryCaptionType.EXTRACTIVE,
+                "query_answer": QueryAnswerType.EXTRACTIVE
+            }
+
+            if filters:
+                search_params["filter"] = filters
+
+            if select_fields:
+                search_params["select"] = select_fields
+
+            total_count, documents = await self._run_search(search_params)
+
+            return {
+                "query_type": "hybrid",
+                "query": query,
+                "filters": filters,
+                "total_count": total_count,
+                "results": documents
+            }
+
+        except Exception as e:
+            print(f"Error in hybrid search: {str(e)}")
+            return {"error": str(e)}
+
+    async def filter_search(self,
+                            filters: str,
+                            top: int = 100,
+                            select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Perform filtered search without text query
+
+        Args:
+            filters: OData filter expression
+            top: Number of results to return (default: 100 to retrieve all relevant documents)
+            select_fields: Fields to return in results
+        """
+        try:
+            filters = self.filter_validator.check(filters)
+
+            search_params = {
+                "search_text": "*",
+                "top": top,
+                "include_total_count": True
+            }
+
+            # Empty when validation dropped every clause
+            if filters:
+                search_params["filter"] = filters
+
+            if select_fields:
+                search_params["select"] = select_fields
+
+            total_count, documents = await self._run_search(search_params)
+
+            return {
+                "query_type": "filter",
+                "query": "*",
+                "filters": filters,
+                "total_count": total_count,
+                "results": documents
+            }
+
+        except Exception as e:
+            print(f"Error in filter search: {str(e)}")
+            return {"error": str(e)}
+
+    async def get_facet_counts(self,
+                               search_text: str = "*",
+                               facets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get facet counts for specified fields
+
+        Args:
+            search_text: Search text (default: "*" for all)
+            facets: List of fields to facet on
+        """
+        try:
+            if not facets:
+                facets = ["TEBStatus", "Manufacturer", "Capabilities", "SubCapability"]
+
+            search_params = {
+                "search_text": search_text,
+                "facets": facets,
+                "top": 0,
+                "include_total_count": True
+            }
+
+            search_client = await self._get_search_client()
+            results = await search_client.search(**search_params)
+
+            return {
+                "query_type": "facets",
+                "search_text": search_text,
+                "facets": facets,
+                "total_count": await results.get_count(),
+                "facet_counts": dict(await results.get_facets() or {})
+            }
+
+        except Exception as e:
+            print(f"Error getting facet counts: {str(e)}")
+            return {"error": str(e)}
@@ -0,0 +1,229 @@
+"""
+Vector Compression Benchmark
+Measures recall, storage size and query latency of reduced-dimension and
+quantized embeddings on the technology catalog, to choose VectorSettings
+
+Full-size embeddings are computed once (and cached on disk). Every setting
+is then simulated locally the same way the service applies it:
+text-embedding-3 dimension reduction is truncation plus renormalization,
+scalar quantization is per-dimension int8, binary quantization is the sign
+bit with Hamming distance, and compressed results are rescored against the
+uncompressed vectors with oversampling (rerankWithOriginalVectors).
+Latency is brute-force search time on this machine, useful for relative
+comparison only.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from openai import AzureOpenAI
+from dotenv import load_dotenv
+
+from data_ingestion import AzureSearchDataIngestion
+from embedding_cache import EmbeddingCache
+
+load_dotenv()
+
+DEFAULT_QUERIES = [
+    "authentication tools identity access",
+    "pub sub publish subscribe messaging event streaming",
+    "devops ci/cd pipeline automation",
+    "security compliance governance",
+    "monitoring observability",
+    "data engineering ETL",
+    "cloud platform infrastructure",
+    "data processing analytics insights",
+    "backup recovery",
+    "machine learning ML",
+    "Kubernetes container orchestration",
+    "message queue",
+    "vector database",
+    "networking private endpoint",
+    "PII data protection",
+]
+
+
+def embed_texts(client: AzureOpenAI, model: str, texts: List[str], cache: Optional[EmbeddingCache]) -> np.ndarray:
+    """Full-dimension embeddings for texts, served from the cache where possible"""
+    vectors = cache.get_many(texts) if cache else [None] * len(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    for start in range(0, len(missing), 256):
+        batch = missing[start:start + 256]
+        response = client.embeddings.create(input=[texts[i] for i in batch], model=model)
+        for item in response.data:
+            vectors[batch[item.index]] = item.embedding
+        if cache:
+            cache.put_many([texts[i] for i in batch], [vectors[i] for i in batch])
+
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores per row, best first"""
+    k = min(k, scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def rescore(candidates: np.ndarray, queries: np.ndarray, documents: np.ndarray, k: int) -> np.ndarray:
+    """Re-rank candidate ids with uncompressed vectors and keep the best k"""
+    results = []
+    for query, ids in zip(queries, candidates):
+        scores = documents[ids] @ query
+        results.append(ids[np.argsort(-scores)[:k]])
+    return np.asarray(results)
+
+
+def compress(setting: str, documents: np.ndarray) -> Dict[str, np.ndarray]:
+    """Build the stored representation of documents for one storage/compression setting"""
+    if setting == "float32":
+        return {"vectors": documents}
+    if setting == "float16":
+        return {"vectors": documents.astype(np.float16)}
+    if setting == "int8":
+        low = documents.min(axis=0)
+        scale = np.maximum(documents.max(axis=0) - low, 1e-12) / 255.0
+        codes = np.round((documents - low) / scale).astype(np.uint8)
+        return {"codes": codes, "low": low, "scale": scale}
+    if setting == "binary":
+        return {"bits": np.packbits(documents > 0, axis=1)}
+    raise ValueError(f"Unknown setting '{setting}'")
+
+
+def search(setting: str,
+           stored: Dict[str, np.ndarray],
+           queries: np.ndarray,
+           documents: np.ndarray,
+           k: int,
+           oversampling: float) -> np.ndarray:
+    """Simulate retrieval against a compressed representation"""
+    if setting in ("float32", "float16"):
+        return top_k(queries @ stored["vectors"].T.astype(np.float32), k)
+
+    candidates_k = int(np.ceil(k * oversampling))
+
+    if setting == "int8":
+        # Score against the int8 codes: q.(c*scale + low) = (q*scale).c + q.low
+        scores = (queries * stored["scale"]) @ stored["codes"].T.astype(np.float32)
+        scores += (queries @ stored["low"])[:, None]
+        candidates = top_k(scores, candidates_k)
+    else:
+        query_bits = np.packbits(queries > 0, axis=1)
+        distances = np.array([
+            np.unpackbits(np.bitwise_xor(stored["bits"], bits), axis=1).sum(axis=1)
+            for bits in query_bits
+        ])
+        candidates = top_k(-distances.astype(np.float32), candidates_k)
+
+    return rescore(candidates, queries, documents, k)
+
+
+BYTES_PER_DIMENSION = {"float32": 4.0, "float16": 2.0, "int8": 1.0, "binary": 1 / 8}
+
+
+def run_benchmark(documents: np.ndarray,
+                  queries: np.ndarray,
+                  dimensions: List[int],
+                  k: int = 10,
+                  oversampling: float = 4.0,
+                  repeats: int = 20) -> List[Dict[str, Any]]:
+    """Recall@k, bytes per vector and latency for every (dimensions, setting) pair"""
+    full_documents = normalize(documents)
+    full_queries = normalize(queries)
+    ground_truth = top_k(full_queries @ full_documents.T, k)
+
+    rows = []
+    for dims in dimensions:
+        reduced_documents = normalize(documents[:, :dims])
+        reduced_queries = normalize(queries[:, :dims])
+
+        for setting in ("float32", "float16", "int8", "binary"):
+            stored = compress(setting, reduced_documents)
+            results = search(setting, stored, reduced_queries, reduced_documents, k, oversampling)
+            recall = np.mean([
+                len(set(found) & set(expected)) / len(expected)
+                for found, expected in zip(results, ground_truth)
+            ])
+
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                search(setting, stored, reduced_queries[:1], reduced_documents, k, oversampling)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            bytes_per_vector = int(np.ceil(dims * BYTES_PER_DIMENSION[setting]))
+            rows.append({
+                "dimensions": dims,
+                "setting": setting,
+                f"recall@{k}": round(float(recall), 4),
+                "bytes_per_vector": bytes_per_vector,
+                "index_vector_mb": round(bytes_per_vector * len(documents) / (1024 * 1024), 3),
+                "p50_latency_ms": round(float(np.median(timings)), 3),
+            })
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    headers = list(rows[0].keys())
+    widths = [max(len(str(header)), *(len(str(row[header])) for row in rows)) for header in headers]
+    print("  ".join(str(header).ljust(width) for header, width in zip(headers, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(row[header]).ljust(width) for header, width in zip(headers, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector compression settings on the catalog")
+    parser.add_argument("--csv", default="technology_standard_list.csv")
+    parser.add_argument("--queries-file", help="Text file with one query per line")
+    parser.add_argument("--dimensions", default="3072,1536,1024,768,512,256",
+                        help="Comma-separated dimensions to evaluate (capped at the model's size)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    client = AzureOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        api_version=os.getenv("OPENAI_API_VERSION", "2024-02-15-preview"),
+        azure_endpoint=os.getenv("OPENAI_ENDPOINT")
+    )
+    cache = EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3"), model)
+
+    documents = AzureSearchDataIngestion.build_documents_from_frame(pd.read_csv(args.csv), seen_ids=set())
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file, 'r') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    print(f"Embedding {len(documents)} documents and {len(queries)} queries with {model}...")
+    document_vectors = embed_texts(client, model, [doc["combined_text"] for doc in documents], cache)
+    query_vectors = embed_texts(client, model, queries, cache)
+
+    full_dimensions = document_vectors.shape[1]
+    dimensions = sorted({min(int(d), full_dimensions) for d in args.dimensions.split(",")}, reverse=True)
+
+    rows = run_benchmark(document_vectors, query_vectors, dimensions, k=args.k, oversampling=args.oversampling)
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"model": model, "documents": len(documents), "queries": len(queries), "results": rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
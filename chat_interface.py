@@ -51,6 +51,10 @@ class ChatInterface:
         filters = metadata.get('filters', 'None')
         print(f"Filters Applied: {filters}")
         print(f"Documents Retrieved: {metadata.get('documents_retrieved', 0)}")
+        cutoff = metadata.get('cutoff') or {}
+        if cutoff.get('applied'):
+            print(f"Documents Used: {metadata.get('documents_used', 0)} "
+                  f"(score cutoff: {cutoff['reason']} on {cutoff['score_field']})")
         print("=" * 80 + "\n")
     
     def run(self):
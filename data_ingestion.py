@@ -5,9 +5,11 @@ Processes CSV data and creates embeddings for hybrid search
 
 import pandas as pd
 import json
-import uuid
+import re
+import hashlib
+import argparse
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import openai
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
@@ -15,23 +17,106 @@ from azure.search.documents.indexes.models import SearchIndex
 from azure.core.credentials import AzureKeyCredential
 from azure.storage.blob import BlobServiceClient
 import os
+from openai import AzureOpenAI
+from embedding_pool import EmbeddingWorkerPool, print_embedding_report
+from embedding_cache import EmbeddingCache
+from vector_config import VectorSettings
+from ingestion_pipeline import StreamingIngestionPipeline
+from ingestion_journal import IngestionJournal, fingerprint_file
+from document_uploader import PayloadAwareUploader, print_upload_report
+from index_registry import (
+    IndexPointer,
+    AzureSearchIndexBackend,
+    BlueGreenIndexManager,
+    alias_mode_enabled,
+    resolve_serving_index
+)
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Azure OpenAI embedding request limits (per request)
+MAX_EMBEDDING_INPUTS_PER_REQUEST = 2048
+MAX_EMBEDDING_TOKENS_PER_INPUT = 8191
+# Longer inputs are truncated; 3 characters per token stays under the limit for dense text
+MAX_EMBEDDING_CHARS_PER_INPUT = MAX_EMBEDDING_TOKENS_PER_INPUT * 3
+
+# CSV columns copied into each search document
+DOCUMENT_FIELDS = (
+    "Capabilities", "SubCapability", "TEBStatus", "NameofTools", "Version",
+    "StandardsComments", "EANotes", "Manufacturer", "StandardCategory",
+    "EAReferenceID", "Description", "MetaTags", "MetaTagsDescription",
+    "CapabilityManager"
+)
+
+# (label, column) lines of the text that gets embedded
+COMBINED_TEXT_FIELDS = (
+    ("Tool", "NameofTools"),
+    ("Capability", "Capabilities"),
+    ("Sub-capability", "SubCapability"),
+    ("Manufacturer", "Manufacturer"),
+    ("TEB Status", "TEBStatus"),
+    ("Description", "Description"),
+    ("Meta Tags", "MetaTags"),
+    ("Meta Tags Description", "MetaTagsDescription"),
+    ("Standards Comments", "StandardsComments"),
+    ("EA Notes", "EANotes"),
+    ("Capability Manager", "CapabilityManager"),
+)
+
+# Line separator of combined_text: the newline and 16-space indent of the original
+# row-by-row template. Any change alters every text, so every cached embedding,
+# manifest hash and journal hash would be invalidated and every row re-embedded.
+COMBINED_TEXT_SEPARATOR = "\n" + " " * 16
+
 class AzureSearchDataIngestion:
     def __init__(self):
         # Azure AI Search configuration
         self.search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
         self.search_key = os.getenv("AZURE_SEARCH_KEY")
         self.search_index_name = "technology-tools-index"
+        self.index_pointer = IndexPointer()
+        self.serving_index_name = resolve_serving_index(self.search_index_name, self.index_pointer)
+        self.keep_index_generations = int(os.getenv("KEEP_INDEX_GENERATIONS", "2"))
         
         # Azure OpenAI configuration for embeddings
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_endpoint = os.getenv("OPENAI_ENDPOINT")
         self.openai_api_version = os.getenv("OPENAI_API_VERSION")
         self.embedding_model = os.getenv("EMBEDDING_MODEL")
+        self.vector_settings = VectorSettings.from_env()
+        self.embedding_kwargs = self.vector_settings.embedding_kwargs(self.embedding_model)
+        self.embedding_batch_size = min(
+            int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+            MAX_EMBEDDING_INPUTS_PER_REQUEST
+        )
+        self.embedding_batch_max_tokens = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "200000"))
+        self.embedding_max_concurrency = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
+        self.embedding_rpm_limit = int(os.getenv("EMBEDDING_RPM_LIMIT", "0")) or None
+        self.embedding_tpm_limit = int(os.getenv("EMBEDDING_TPM_LIMIT", "0")) or None
+        
+        # Persistent embedding cache configuration
+        self.embedding_cache_enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+        self.embedding_cache_max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+        self.embedding_cache_max_bytes = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+        
+        # Manifest of per-document content hashes used by incremental ingestion
+        self.manifest_path = os.getenv("INGESTION_MANIFEST_PATH", ".cache/ingestion_manifest.json")
+        
+        # Streaming pipeline configuration
+        self.csv_chunk_size = int(os.getenv("INGESTION_CHUNK_SIZE", "500"))
+        self.pipeline_queue_size = int(os.getenv("INGESTION_QUEUE_SIZE", "2"))
+        
+        # Journal of completed work so interrupted runs can resume
+        self.journal_enabled = os.getenv("INGESTION_JOURNAL_ENABLED", "true").lower() == "true"
+        self.journal_path = os.getenv("INGESTION_JOURNAL_PATH", ".cache/ingestion_journal.sqlite3")
+        
+        # Upload batching and parallelism
+        self.upload_batch_size = int(os.getenv("UPLOAD_MAX_BATCH_DOCUMENTS", "500"))
+        self.upload_max_batch_bytes = int(os.getenv("UPLOAD_MAX_BATCH_BYTES", str(8 * 1024 * 1024)))
+        self.upload_max_in_flight = int(os.getenv("UPLOAD_MAX_IN_FLIGHT", "4"))
         
         # Azure Blob Storage configuration
         self.blob_connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
@@ -51,11 +136,36 @@ class AzureSearchDataIngestion:
             )
             self.search_client = SearchClient(
                 endpoint=self.search_endpoint,
-                index_name=self.search_index_name,
+                index_name=self.serving_index_name,
                 credential=credential
             )
             
-            # OpenAI client will be initialized in create_embedding method
+            # Azure OpenAI client shared by every embedding request of a run.
+            # Retries are handled by the embedding pool, not by the SDK.
+            self.openai_client = AzureOpenAI(
+                api_key=self.openai_api_key,
+                api_version=self.openai_api_version,
+                azure_endpoint=self.openai_endpoint,
+                max_retries=0
+            )
+            self.embedding_pool = EmbeddingWorkerPool(
+                client=self.openai_client,
+                model=self.embedding_model,
+                max_concurrency=self.embedding_max_concurrency,
+                rpm_limit=self.embedding_rpm_limit,
+                tpm_limit=self.embedding_tpm_limit,
+                embedding_kwargs=self.embedding_kwargs
+            )
+            
+            self.embedding_cache = None
+            if self.embedding_cache_enabled:
+                self.embedding_cache = EmbeddingCache(
+                    path=self.embedding_cache_path,
+                    model=self.embedding_model,
+                    dimensions=self.vector_settings.dimensions,
+                    max_entries=self.embedding_cache_max_entries,
+                    max_bytes=self.embedding_cache_max_bytes
+                )
             
             # Azure Blob Storage client
             if self.blob_connection_string:
@@ -72,110 +182,351 @@ class AzureSearchDataIngestion:
     def create_embedding(self, text: str) -> List[float]:
         """Create embedding for text using Azure OpenAI"""
         try:
-            from openai import AzureOpenAI
-            
-            client = AzureOpenAI(
-                api_key=self.openai_api_key,
-                api_version=self.openai_api_version,
-                azure_endpoint=self.openai_endpoint
-            )
-            
-            response = client.embeddings.create(
-                input=text,
-                model=self.embedding_model
+            response = self.openai_client.embeddings.create(
+                input=self.truncate_for_embedding(text),
+                model=self.embedding_model,
+                **self.embedding_kwargs
             )
             return response.data[0].embedding
         except Exception as e:
             print(f"Error creating embedding: {str(e)}")
             return []
     
-    def process_csv_data(self, csv_file_path: str) -> List[Dict[str, Any]]:
-        """Process CSV data and prepare for indexing"""
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate for batching (~4 characters per token)"""
+        return max(1, len(text) // 4 + 1)
+    
+    @staticmethod
+    def truncate_for_embedding(text: str) -> str:
+        """Cut text to the per-input limit of the embedding deployment"""
+        return text[:MAX_EMBEDDING_CHARS_PER_INPUT]
+    
+    def build_embedding_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group text positions into batches that respect the per-request input
+        count and token limits of the embedding deployment
+        
+        Args:
+            texts: Texts to embed, in document order, already truncated
+                (truncate_for_embedding)
+            
+        Returns:
+            List of batches, each a list of positions into texts
+        """
+        batches = []
+        current_batch = []
+        current_tokens = 0
+        
+        for position, text in enumerate(texts):
+            tokens = min(self.estimate_tokens(text), MAX_EMBEDDING_TOKENS_PER_INPUT)
+            
+            if current_batch and (
+                len(current_batch) >= self.embedding_batch_size
+                or current_tokens + tokens > self.embedding_batch_max_tokens
+            ):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            
+            current_batch.append(position)
+            current_tokens += tokens
+        
+        if current_batch:
+            batches.append(current_batch)
+        
+        return batches
+    
+    def create_embeddings_batch(self, texts: List[str], row_ids: Optional[List[Any]] = None) -> List[List[float]]:
+        """
+        Create embeddings for many texts using batched, concurrent Azure OpenAI requests
+        
+        Texts already present in the embedding cache are served from disk and
+        only the remaining texts are sent to Azure OpenAI. Texts over the
+        per-input limit are truncated first.
+        
+        Args:
+            texts: Texts to embed
+            row_ids: Row reported for each text when it fails (its position in texts when omitted)
+            
+        Returns:
+            List of embeddings aligned with texts ([] where a row failed after retries)
+        """
+        if not texts:
+            return []
+        
+        truncated = sum(1 for text in texts if len(text) > MAX_EMBEDDING_CHARS_PER_INPUT)
+        if truncated:
+            print(f"Truncating {truncated} texts to {MAX_EMBEDDING_CHARS_PER_INPUT} characters for embedding")
+            texts = [self.truncate_for_embedding(text) for text in texts]
+        
+        embeddings: List[List[float]] = [[] for _ in texts]
+        if self.embedding_cache:
+            cached = self.embedding_cache.get_many(texts)
+            for position, vector in enumerate(cached):
+                if vector is not None:
+                    embeddings[position] = vector
+        
+        missing = [position for position, vector in enumerate(embeddings) if not vector]
+        if self.embedding_cache:
+            print(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        if not missing:
+            return embeddings
+        
+        missing_texts = [texts[position] for position in missing]
+        token_counts = [self.estimate_tokens(text) for text in missing_texts]
+        batches = self.build_embedding_batches(missing_texts)
+        print(f"Embedding {len(missing_texts)} texts in {len(batches)} batches "
+              f"(up to {self.embedding_max_concurrency} concurrent requests)")
+        
+        report = self.embedding_pool.embed(
+            missing_texts, batches, token_counts,
+            row_ids=[row_ids[position] for position in missing] if row_ids else missing
+        )
+        print_embedding_report(report)
+        self.last_embedding_report = report
+        
+        for position, vector in zip(missing, report["embeddings"]):
+            embeddings[position] = vector
+        
+        if self.embedding_cache:
+            self.embedding_cache.put_many(missing_texts, report["embeddings"])
+            print(f"Embedding cache stats: {self.embedding_cache.stats()}")
+        
+        return embeddings
+    
+    @staticmethod
+    def make_document_id(row) -> str:
+        """
+        Derive a deterministic document key for a CSV row
+        
+        Uses EAReferenceID when present, otherwise a hash of the tool's
+        name, manufacturer and version. Characters Azure AI Search does not
+        allow in keys are replaced with underscores.
+        """
+        def value(field):
+            cell = row.get(field, '')
+            return '' if pd.isna(cell) else str(cell).strip()
+        
+        reference_id = value('EAReferenceID')
+        if reference_id:
+            return re.sub(r'[^A-Za-z0-9_\-=]', '_', reference_id)
+        
+        stable_key = "|".join(value(field).lower() for field in ('NameofTools', 'Manufacturer', 'Version'))
+        return hashlib.sha1(stable_key.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def make_document_ids(columns: Dict[str, pd.Series]) -> List[str]:
+        """Column-wise make_document_id over null-filled text columns"""
+        reference_ids = columns["EAReferenceID"].str.strip()
+        ids = reference_ids.str.replace(r'[^A-Za-z0-9_\-=]', '_', regex=True)
+        
+        missing = reference_ids == ""
+        if missing.any():
+            stable_keys = (
+                columns["NameofTools"][missing].str.strip().str.lower() + "|"
+                + columns["Manufacturer"][missing].str.strip().str.lower() + "|"
+                + columns["Version"][missing].str.strip().str.lower()
+            )
+            ids[missing] = [hashlib.sha1(key.encode("utf-8")).hexdigest() for key in stable_keys]
+        
+        return ids.tolist()
+    
+    @staticmethod
+    def text_column(df: pd.DataFrame, field: str) -> pd.Series:
+        """Column as strings with missing columns and empty cells as "" (never "nan")"""
+        if field not in df.columns:
+            return pd.Series("", index=df.index, dtype=object)
+        column = df[field]
+        return column.where(column.notna(), "").astype(str).astype(object)
+    
+    @staticmethod
+    def compute_content_hash(doc: Dict[str, Any]) -> str:
+        """Hash of every indexed field except the key and the vector"""
+        content = {
+            key: value for key, value in doc.items()
+            if key not in ("id", "content_vector")
+        }
+        serialized = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+    
+    def build_documents(self, csv_file_path: str) -> List[Dict[str, Any]]:
+        """Read the CSV and build search documents without embeddings"""
         try:
             # Read CSV file
             df = pd.read_csv(csv_file_path)
             print(f"Loaded CSV with {len(df)} rows")
             
-            documents = []
-            
-            for index, row in df.iterrows():
-                # Create combined text for embedding
-                combined_text = f"""
-                Tool: {row.get('NameofTools', '')}
-                Capability: {row.get('Capabilities', '')}
-                Sub-capability: {row.get('SubCapability', '')}
-                Manufacturer: {row.get('Manufacturer', '')}
-                TEB Status: {row.get('TEBStatus', '')}
-                Description: {row.get('Description', '')}
-                Meta Tags: {row.get('MetaTags', '')}
-                Meta Tags Description: {row.get('MetaTagsDescription', '')}
-                Standards Comments: {row.get('StandardsComments', '')}
-                EA Notes: {row.get('EANotes', '')}
-                Capability Manager: {row.get('CapabilityManager', '')}
-                """.strip()
-                
-                # Create document for Azure AI Search
-                doc = {
-                    "id": str(uuid.uuid4()),
-                    "Capabilities": row.get('Capabilities', ''),
-                    "SubCapability": row.get('SubCapability', ''),
-                    "TEBStatus": row.get('TEBStatus', ''),
-                    "NameofTools": row.get('NameofTools', ''),
-                    "Version": row.get('Version', ''),
-                    "StandardsComments": row.get('StandardsComments', ''),
-                    "EANotes": row.get('EANotes', ''),
-                    "Manufacturer": row.get('Manufacturer', ''),
-                    "StandardCategory": row.get('StandardCategory', ''),
-                    "EAReferenceID": row.get('EAReferenceID', ''),
-                    "Description": row.get('Description', ''),
-                    "MetaTags": row.get('MetaTags', ''),
-                    "MetaTagsDescription": row.get('MetaTagsDescription', ''),
-                    "CapabilityManager": row.get('CapabilityManager', ''),
-                    "combined_text": combined_text
-                }
-                
-                # Create embedding for the combined text
-                print(f"Creating embedding for row {index + 1}/{len(df)}: {doc['NameofTools']}")
-                embedding = self.create_embedding(combined_text)
-                if embedding:
-                    doc["content_vector"] = embedding
-                
-                documents.append(doc)
-            
-            print(f"Processed {len(documents)} documents")
-            return documents
+            return self.build_documents_from_frame(df, seen_ids=set())
             
         except Exception as e:
             print(f"Error processing CSV data: {str(e)}")
             raise
     
-    def upload_documents_batch(self, documents: List[Dict[str, Any]], batch_size: int = 100):
-        """Upload documents to Azure AI Search in batches"""
+    @classmethod
+    def build_documents_from_frame(cls, df: pd.DataFrame, seen_ids: set) -> List[Dict[str, Any]]:
+        """
+        Build search documents for one DataFrame (or CSV chunk)
+        
+        Args:
+            df: Rows to convert
+            seen_ids: Keys already assigned earlier in the same run; updated in place
+        
+        combined_text is identical to the original row-by-row template's on the CSV:
+        
+        >>> df = pd.read_csv("technology_standard_list.csv")
+        >>> documents = AzureSearchDataIngestion.build_documents_from_frame(df, seen_ids=set())
+        >>> all(doc["combined_text"] == "\\n                ".join(
+        ...     f"{label}: {row.get(field, '')}" for label, field in COMBINED_TEXT_FIELDS)
+        ...     for doc, (_, row) in zip(documents, df.iterrows()))
+        True
+        >>> documents[0]["combined_text"].split("Capability:")[0]
+        'Tool: GitHub Actions\\n                '
+        """
+        columns = {field: cls.text_column(df, field) for field in DOCUMENT_FIELDS}
+        
+        # One template for the embedded text, filled from whole columns
+        template = COMBINED_TEXT_SEPARATOR.join(f"{label}: {{}}" for label, _ in COMBINED_TEXT_FIELDS)
+        text_columns = [columns[field].tolist() for _, field in COMBINED_TEXT_FIELDS]
+        combined_text = [template.format(*values).strip() for values in zip(*text_columns)]
+        
+        # Assemble documents from whole columns instead of walking rows
+        keys = ("id",) + DOCUMENT_FIELDS + ("combined_text",)
+        values = [cls.make_document_ids(columns)]
+        values += [columns[field].tolist() for field in DOCUMENT_FIELDS]
+        values.append(combined_text)
+        documents = [dict(zip(keys, row)) for row in zip(*values)]
+        
+        # Keep keys unique when EAReferenceID is repeated: later rows get a content suffix
+        for doc in documents:
+            if doc["id"] in seen_ids:
+                suffix = hashlib.sha1(cls.compute_content_hash(doc).encode("utf-8")).hexdigest()[:12]
+                doc["id"] = f"{doc['id']}-{suffix}"
+            seen_ids.add(doc["id"])
+        
+        return documents
+    
+    def embed_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Attach content_vector to each document
+        
+        Returns:
+            Documents that were embedded; rows that failed are reported and dropped
+        """
         try:
-            total_docs = len(documents)
-            print(f"Uploading {total_docs} documents in batches of {batch_size}")
+            # Create embeddings for all combined texts in batched requests
+            embeddings = self.create_embeddings_batch(
+                [doc["combined_text"] for doc in documents],
+                row_ids=[doc["id"] for doc in documents]
+            )
+            for doc, embedding in zip(documents, embeddings):
+                doc["content_vector"] = embedding
             
-            for i in range(0, total_docs, batch_size):
-                batch = documents[i:i + batch_size]
-                print(f"Uploading batch {i//batch_size + 1}/{(total_docs + batch_size - 1)//batch_size}")
-                
-                result = self.search_client.upload_documents(batch)
-                
-                # Check for errors
-                failed_docs = [doc for doc in result if not doc.succeeded]
-                if failed_docs:
-                    print(f"Warning: {len(failed_docs)} documents failed to upload")
-                    for doc in failed_docs:
-                        print(f"   Error: {doc.error_message}")
-                else:
-                    print(f"Batch uploaded successfully")
+            # Rows that could not be embedded are reported and not uploaded without a vector
+            failed = [doc for doc in documents if not doc["content_vector"]]
+            documents = [doc for doc in documents if doc["content_vector"]]
+            if failed:
+                print(f"Warning: skipping {len(failed)} documents without embeddings: "
+                      f"{', '.join(str(doc['NameofTools']) for doc in failed)}")
+            
+            return documents
+            
+        except Exception as e:
+            print(f"Error embedding documents: {str(e)}")
+            raise
+    
+    def process_csv_data(self, csv_file_path: str) -> List[Dict[str, Any]]:
+        """Process CSV data and prepare for indexing"""
+        documents = self.embed_documents(self.build_documents(csv_file_path))
+        print(f"Processed {len(documents)} documents")
+        return documents
+    
+    def create_uploader(self, search_client: SearchClient = None) -> PayloadAwareUploader:
+        """Payload-aware uploader for the serving index (or the given client)"""
+        return PayloadAwareUploader(
+            search_client or self.search_client,
+            max_batch_documents=self.upload_batch_size,
+            max_batch_bytes=self.upload_max_batch_bytes,
+            max_in_flight=self.upload_max_in_flight
+        )
+    
+    def upload_documents_batch(self,
+                               documents: List[Dict[str, Any]],
+                               action: str = "upload",
+                               search_client: SearchClient = None) -> List[str]:
+        """
+        Upload documents to Azure AI Search in size-bounded parallel batches
+        
+        Args:
+            documents: Documents to index
+            action: "upload" or "merge_or_upload"
+            search_client: Target index client (default: the serving index)
             
-            print(f"All documents uploaded to Azure AI Search")
+        Returns:
+            Keys of documents that failed to index after retries
+        """
+        try:
+            print(f"Uploading {len(documents)} documents")
+            report = self.create_uploader(search_client).upload(documents, action=action)
+            print_upload_report(report)
+            return report["failed_keys"]
             
         except Exception as e:
             print(f"Error uploading documents: {str(e)}")
             raise
     
+    def delete_documents_batch(self, document_ids: List[str]) -> List[str]:
+        """
+        Delete documents from Azure AI Search by key
+        
+        Returns:
+            Keys of documents that failed to delete
+        """
+        report = self.create_uploader().upload(
+            [{"id": document_id} for document_id in document_ids],
+            action="delete"
+        )
+        print(f"Deleted {report['succeeded']} documents")
+        if report["errors"]:
+            print_upload_report(report)
+        return report["failed_keys"]
+    
+    def load_manifest(self) -> Dict[str, Any]:
+        """Load the content-hash manifest written by the previous ingestion run"""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"documents": {}}
+        
+        # A different index or embedding model invalidates every stored hash
+        if (manifest.get("index_name") != self.search_index_name
+                or manifest.get("embedding_model") != self.embedding_model
+                or manifest.get("vector_settings", self.vector_settings.describe()) != self.vector_settings.describe()):
+            print("Manifest was written for a different index, embedding model or vector settings; ignoring it")
+            return {"documents": {}}
+        
+        return manifest
+    
+    def bump_content_version(self):
+        """Invalidate search result caches: the index's documents changed"""
+        version = self.index_pointer.bump_content_version(self.search_index_name)
+        print(f"Index content version is now {version}")
+    
+    def save_manifest(self, document_hashes: Dict[str, str]):
+        """Persist the content hash of every indexed document"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        manifest = {
+            "index_name": self.search_index_name,
+            "embedding_model": self.embedding_model,
+            "vector_settings": self.vector_settings.describe(),
+            "documents": document_hashes
+        }
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+    
     def download_csv_from_blob(self, blob_name: str, local_path: str = None) -> str:
         """Download CSV file from Azure Blob Storage"""
         try:
@@ -216,9 +567,10 @@ class AzureSearchDataIngestion:
             except:
                 pass
             
-            # Load index schema
+            # Load index schema and apply the configured vector compression
             with open('azure_search_index_schema.json', 'r') as f:
-                index_schema_dict = json.load(f)
+                index_schema_dict = self.vector_settings.apply_to_schema(json.load(f))
+            print(f"Vector settings: {self.vector_settings.describe()}")
             
             # Create index using the REST API approach
             
@@ -229,7 +581,7 @@ class AzureSearchDataIngestion:
             }
             
             # Create index using REST API
-            url = f"{self.search_endpoint}/indexes?api-version=2023-11-01"
+            url = f"{self.search_endpoint}/indexes?api-version={self.vector_settings.index_api_version}"
             response = requests.post(url, headers=headers, json=index_schema_dict)
             
             if response.status_code == 201:
@@ -244,49 +596,290 @@ class AzureSearchDataIngestion:
             print(f"Error creating index: {str(e)}")
             raise
     
-    def run_full_ingestion(self, csv_file_path: str = None, blob_name: str = None):
-        """Run the complete data ingestion process"""
+    def resolve_csv_path(self, csv_file_path: str = None, blob_name: str = None) -> str:
+        """Return a local CSV path, downloading from blob storage when requested"""
+        if blob_name:
+            print(f"Downloading CSV from blob: {blob_name}")
+            return self.download_csv_from_blob(blob_name)
+        return csv_file_path or "technology_standard_list.csv"
+    
+    def open_journal(self, mode: str, csv_file_path: str, resume: bool):
+        """
+        Open the ingestion journal for a run
+        
+        Returns:
+            (journal, resumable_run) where resumable_run is None for a fresh run
+            that still has to be started; journal is None when journaling is disabled
+        """
+        if not self.journal_enabled:
+            if resume:
+                print("Warning: --resume needs INGESTION_JOURNAL_ENABLED=true; starting a new run")
+            return None, None
+        
+        journal = IngestionJournal(self.journal_path)
+        self._journal_fingerprint = fingerprint_file(csv_file_path)
+        self._journal_settings = f"{self.embedding_model}|{self.vector_settings.describe()}"
+        
+        if resume:
+            run = journal.find_resumable_run(mode, self._journal_fingerprint, self._journal_settings)
+            if run:
+                print(f"Resuming {mode} run {run['run_id']} into '{run['target_index']}'")
+                return journal, run
+            print(f"No interrupted {mode} run found for this CSV; starting a new run")
+        
+        return journal, None
+    
+    def run_streaming_pipeline(self, csv_file_path: str, upload, journal: IngestionJournal = None) -> Dict[str, Any]:
+        """
+        Stream the CSV through the build, embed and upload stages
+        
+        Args:
+            csv_file_path: CSV to ingest
+            upload: Uploader(documents) -> failed keys
+            journal: Journal with an active run, making the pipeline resumable
+            
+        Returns:
+            Pipeline stats plus "document_hashes": content hash of every indexed
+            document, including those indexed before a resume
+        """
+        document_hashes = {}
+        
+        def record(documents):
+            for doc in documents:
+                document_hashes[doc["id"]] = self.compute_content_hash(doc)
+        
+        pipeline = StreamingIngestionPipeline(
+            self,
+            self.csv_chunk_size,
+            self.pipeline_queue_size,
+            journal=journal
+        )
+        stats = pipeline.run(csv_file_path, upload, on_uploaded=record)
+        stats["document_hashes"] = journal.uploaded_hashes() if journal else document_hashes
+        return stats
+    
+    def run_full_ingestion(self, csv_file_path: str = None, blob_name: str = None, resume: bool = False,
+                           migrate_legacy_index: bool = False):
+        """
+        Run the complete data ingestion process
+        
+        With resume, an interrupted run over the same CSV continues from its
+        journal: the index is not recreated and completed rows are skipped.
+        In alias mode, or once a generation is published, this is a
+        blue/green rebuild instead.
+        """
+        if alias_mode_enabled() or self.serving_index_name != self.search_index_name:
+            # Dropping the alias name would not affect the served generation
+            print(f"'{self.search_index_name}' is served through blue/green generations; using a blue/green rebuild")
+            return self.run_blue_green_ingestion(csv_file_path=csv_file_path, blob_name=blob_name, resume=resume,
+                                                 migrate_legacy_index=migrate_legacy_index)
+        
+        journal = None
         try:
             print("Starting Azure AI Search data ingestion...")
             
-            # Step 1: Delete and recreate index with correct dimensions
-            self.delete_index()
-            self.create_index()
+            # Step 1: Get CSV data
+            csv_file_path = self.resolve_csv_path(csv_file_path, blob_name)
+            journal, resumable_run = self.open_journal("full", csv_file_path, resume)
             
-            # Step 2: Get CSV data
-            if blob_name:
-                print(f"Downloading CSV from blob: {blob_name}")
-                csv_file_path = self.download_csv_from_blob(blob_name)
-            elif not csv_file_path:
-                csv_file_path = "technology_standard_list.csv"
+            # Step 2: Delete and recreate index with correct dimensions (unless resuming)
+            if resumable_run:
+                journal.resume_run(resumable_run["run_id"])
+            else:
+                self.delete_index()
+                self.create_index()
+                if journal:
+                    journal.start_run("full", self._journal_fingerprint, self._journal_settings,
+                                      self.search_index_name)
             
-            # Step 3: Process CSV data
-            documents = self.process_csv_data(csv_file_path)
+            # Step 3: Stream CSV chunks through embedding and upload
+            stats = self.run_streaming_pipeline(csv_file_path, self.upload_documents_batch, journal)
+            failed = stats["rows_failed_embedding"] + stats["rows_failed_upload"]
+            if failed:
+                # The index is incomplete: no manifest or version bump, and the run stays resumable
+                raise Exception(f"{failed} documents were not indexed into '{self.search_index_name}' "
+                                f"({stats['rows_failed_embedding']} failed to embed, "
+                                f"{stats['rows_failed_upload']} failed to upload)")
             
-            # Step 4: Upload documents
-            self.upload_documents_batch(documents)
+            # Step 4: Record content hashes so later runs can be incremental
+            self.save_manifest(stats["document_hashes"])
+            self.bump_content_version()
+            if journal:
+                journal.finish_run()
             
             print("Data ingestion completed successfully!")
             
-        except Exception as e:
+        except BaseException as e:
+            if journal and journal.run_id:
+                journal.finish_run("failed")
+                print("Progress was journaled; rerun with --resume to continue")
             print(f"Error in full ingestion: {str(e)}")
             raise
+    
+    def run_incremental_ingestion(self, csv_file_path: str = None, blob_name: str = None):
+        """
+        Apply only the differences between the CSV and the previous run
+        
+        Changed or new rows are embedded and merged into the existing index,
+        rows missing from the CSV are deleted, and unchanged rows are skipped.
+        """
+        try:
+            print("Starting incremental Azure AI Search data ingestion...")
+            
+            # Blue/green generations are created by the rebuild; only the legacy index is created here
+            if not alias_mode_enabled() and self.serving_index_name == self.search_index_name:
+                self.create_index()
+            csv_file_path = self.resolve_csv_path(csv_file_path, blob_name)
+            
+            documents = self.build_documents(csv_file_path)
+            previous_hashes = self.load_manifest().get("documents", {})
+            current_hashes = {doc["id"]: self.compute_content_hash(doc) for doc in documents}
+            
+            changed = [doc for doc in documents if previous_hashes.get(doc["id"]) != current_hashes[doc["id"]]]
+            removed = [doc_id for doc_id in previous_hashes if doc_id not in current_hashes]
+            unchanged = len(documents) - len(changed)
+            print(f"Delta: {len(changed)} new or changed, {len(removed)} removed, {unchanged} unchanged")
+            
+            next_hashes = {
+                doc_id: doc_hash for doc_id, doc_hash in previous_hashes.items()
+                if doc_id in current_hashes
+            }
+            
+            if changed:
+                embedded = self.embed_documents(changed)
+                failed_keys = set(self.upload_documents_batch(embedded, action="merge_or_upload"))
+                for doc in embedded:
+                    if doc["id"] not in failed_keys:
+                        next_hashes[doc["id"]] = current_hashes[doc["id"]]
+            
+            if removed:
+                failed_deletes = self.delete_documents_batch(removed)
+                # Keep failed deletions in the manifest so the next run retries them
+                for doc_id in failed_deletes:
+                    next_hashes[doc_id] = previous_hashes[doc_id]
+            
+            self.save_manifest(next_hashes)
+            if changed or removed:
+                self.bump_content_version()
+            print("Incremental ingestion completed successfully!")
+            
+        except Exception as e:
+            print(f"Error in incremental ingestion: {str(e)}")
+            raise
+    
+    def run_blue_green_ingestion(self, csv_file_path: str = None, blob_name: str = None, resume: bool = False,
+                                 migrate_legacy_index: bool = False):
+        """
+        Rebuild into a new index generation and flip the serving name to it
+        
+        The currently served index keeps answering queries until the new
+        generation has been validated. With resume, an interrupted rebuild
+        continues filling its generation from the journal. In alias mode a
+        legacy index named like the alias blocks the rebuild unless
+        migrate_legacy_index allows deleting it before the alias is created.
+        """
+        journal = None
+        try:
+            print("Starting blue/green Azure AI Search data ingestion...")
+            
+            csv_file_path = self.resolve_csv_path(csv_file_path, blob_name)
+            journal, resumable_run = self.open_journal("blue_green", csv_file_path, resume)
+            outcome = {}
+            
+            def populate(index_name: str) -> Dict[str, int]:
+                if journal:
+                    if resumable_run and resumable_run["target_index"] == index_name:
+                        journal.resume_run(resumable_run["run_id"])
+                    else:
+                        journal.start_run("blue_green", self._journal_fingerprint, self._journal_settings,
+                                          index_name)
+                
+                target_client = SearchClient(
+                    endpoint=self.search_endpoint,
+                    index_name=index_name,
+                    credential=AzureKeyCredential(self.search_key)
+                )
+                stats = self.run_streaming_pipeline(
+                    csv_file_path,
+                    lambda documents: self.upload_documents_batch(documents, search_client=target_client),
+                    journal
+                )
+                outcome["document_hashes"] = stats["document_hashes"]
+                # Rows dropped by embedding are not indexed either; either kind keeps the previous index serving
+                return {
+                    "rows": stats["rows_read"],
+                    "uploaded": len(stats["document_hashes"]),
+                    "failed": stats["rows_failed_upload"] + stats["rows_failed_embedding"]
+                }
+            
+            manager = BlueGreenIndexManager(
+                backend=AzureSearchIndexBackend(
+                    self.search_endpoint,
+                    self.search_key,
+                    api_version=self.vector_settings.index_api_version
+                ),
+                alias=self.search_index_name,
+                vector_settings=self.vector_settings,
+                pointer=self.index_pointer,
+                keep_generations=self.keep_index_generations
+            )
+            summary = manager.rebuild(
+                smoke_query="*",
+                populate=populate,
+                resume_index_name=resumable_run["target_index"] if resumable_run else None,
+                migrate_legacy_index=migrate_legacy_index
+            )
+            
+            self.serving_index_name = summary["index_name"]
+            self.search_client = SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=self.serving_index_name,
+                credential=AzureKeyCredential(self.search_key)
+            )
+            
+            self.save_manifest(outcome["document_hashes"])
+            self.bump_content_version()
+            if journal:
+                journal.finish_run()
+            print(f"Blue/green ingestion completed successfully: {summary}")
+            
+        except BaseException as e:
+            if journal and journal.run_id:
+                journal.finish_run("failed")
+                print("Progress was journaled; rerun with --resume to continue")
+            print(f"Error in blue/green ingestion: {str(e)}")
+            raise
 
 def main():
     """Main function to run the ingestion"""
+    parser = argparse.ArgumentParser(description="Ingest the technology standard list into Azure AI Search")
+    parser.add_argument("--csv", default="technology_standard_list.csv", help="Local CSV file to ingest")
+    parser.add_argument("--blob", default=None, help="Blob name to download and ingest instead of --csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only index rows that changed since the previous run")
+    parser.add_argument("--blue-green", action="store_true",
+                        help="Rebuild into a new index generation and flip to it without downtime")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted full or blue/green run from its journal")
+    parser.add_argument("--migrate-legacy-index", action="store_true",
+                        help="With INDEX_POINTER_MODE=alias, replace an index named like the alias with the alias")
+    args = parser.parse_args()
+    
     try:
         # Initialize ingestion class
         ingestion = AzureSearchDataIngestion()
         
-        # Run ingestion with local CSV file
-        ingestion.run_full_ingestion(csv_file_path="technology_standard_list.csv")
-        
-        # Alternative: Run ingestion with blob storage
-        # ingestion.run_full_ingestion(blob_name="technology_standard_list.csv")
+        if args.blue_green:
+            ingestion.run_blue_green_ingestion(csv_file_path=args.csv, blob_name=args.blob, resume=args.resume,
+                                               migrate_legacy_index=args.migrate_legacy_index)
+        elif args.incremental:
+            ingestion.run_incremental_ingestion(csv_file_path=args.csv, blob_name=args.blob)
+        else:
+            ingestion.run_full_ingestion(csv_file_path=args.csv, blob_name=args.blob, resume=args.resume,
+                                         migrate_legacy_index=args.migrate_legacy_index)
         
     except Exception as e:
         print(f"Main execution error: {str(e)}")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,191 @@
+"""
+Payload-aware Document Uploader
+Sizes Azure AI Search indexing batches by serialized bytes as well as
+document count, keeps several batches in flight and retries only failed keys
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Tuple
+
+from azure.core.exceptions import HttpResponseError
+
+from ingestion_pipeline import to_upload_payload
+
+# Azure AI Search accepts at most 1000 documents and 16 MB per indexing request
+MAX_DOCUMENTS_PER_REQUEST = 1000
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Per-document status codes worth retrying (conflict, transient failure, throttling)
+RETRYABLE_STATUS_CODES = {409, 422, 429, 503}
+
+
+class PayloadAwareUploader:
+    """
+    Parallel uploader for one search client
+
+    Batches close when either max_batch_documents or max_batch_bytes would be
+    exceeded. Up to max_in_flight batches are sent concurrently. Documents
+    whose IndexingResult failed with a retryable status are resent on their
+    own with exponential backoff; everything else is reported as failed.
+    """
+
+    def __init__(self,
+                 search_client,
+                 max_batch_documents: int = 500,
+                 max_batch_bytes: int = 8 * 1024 * 1024,
+                 max_in_flight: int = 4,
+                 max_retries: int = 5,
+                 base_backoff: float = 1.0):
+        """
+        Args:
+            search_client: azure.search.documents.SearchClient for the target index
+            max_batch_documents: Documents per request (capped at 1000)
+            max_batch_bytes: Serialized bytes per request (capped at 16 MB)
+            max_in_flight: Concurrent indexing requests
+            max_retries: Retry rounds for failed keys
+            base_backoff: Initial backoff in seconds between retry rounds
+        """
+        self.search_client = search_client
+        self.max_batch_documents = min(max_batch_documents, MAX_DOCUMENTS_PER_REQUEST)
+        self.max_batch_bytes = min(max_batch_bytes, MAX_REQUEST_BYTES)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._stats_lock = threading.Lock()
+
+    def build_batches(self, documents: List[Dict[str, Any]]) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+        """Yield (batch, serialized_bytes) pairs within the count and byte limits"""
+        batch = []
+        batch_bytes = 0
+        for doc in to_upload_payload(documents):
+            # Rough per-document overhead for the @search.action wrapper and separators
+            doc_bytes = len(json.dumps(doc, default=str).encode("utf-8")) + 32
+            if batch and (len(batch) >= self.max_batch_documents
+                          or batch_bytes + doc_bytes > self.max_batch_bytes):
+                yield batch, batch_bytes
+                batch = []
+                batch_bytes = 0
+            batch.append(doc)
+            batch_bytes += doc_bytes
+        if batch:
+            yield batch, batch_bytes
+
+    def _send(self, batch: List[Dict[str, Any]], action: str):
+        if action == "merge_or_upload":
+            return self.search_client.merge_or_upload_documents(batch)
+        if action == "delete":
+            return self.search_client.delete_documents(batch)
+        return self.search_client.upload_documents(batch)
+
+    def _upload_batch(self, batch: List[Dict[str, Any]], batch_bytes: int, action: str) -> Dict[str, Any]:
+        """Upload one batch, resending only the keys that failed with a retryable status"""
+        pending = {doc["id"]: doc for doc in batch}
+        errors: Dict[str, str] = {}
+        sent_bytes = 0
+        retried = 0
+
+        for attempt in range(self.max_retries + 1):
+            documents = list(pending.values())
+            try:
+                results = self._send(documents, action)
+                sent_bytes += batch_bytes if attempt == 0 else int(batch_bytes * len(documents) / len(batch))
+            except HttpResponseError as e:
+                # Whole request throttled or unavailable: retry everything still pending
+                if e.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    retried += len(documents)
+                    time.sleep(self.base_backoff * (2 ** attempt) * (0.5 + random.random()))
+                    continue
+                for key in pending:
+                    errors[key] = str(e)
+                pending = {}
+                break
+
+            retry = {}
+            for result in results:
+                if result.succeeded:
+                    errors.pop(result.key, None)
+                elif result.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    retry[result.key] = pending[result.key]
+                else:
+                    errors[result.key] = f"{result.status_code}: {result.error_message}"
+            pending = retry
+
+            if not pending:
+                break
+            retried += len(pending)
+            time.sleep(self.base_backoff * (2 ** attempt) * (0.5 + random.random()))
+
+        return {
+            "documents": len(batch),
+            "bytes": sent_bytes,
+            "retried": retried,
+            "errors": errors,
+        }
+
+    def upload(self, documents: List[Dict[str, Any]], action: str = "upload") -> Dict[str, Any]:
+        """
+        Index documents with bounded parallelism
+
+        Args:
+            documents: Documents to send
+            action: "upload", "merge_or_upload" or "delete"
+
+        Returns:
+            Report with failed keys, their errors and achieved throughput
+        """
+        started = time.monotonic()
+        errors: Dict[str, str] = {}
+        totals = {"batches": 0, "bytes": 0, "retried": 0}
+
+        # Bound submitted-but-unfinished batches so large inputs are not all serialized up front
+        slots = threading.BoundedSemaphore(self.max_in_flight * 2)
+
+        def run(batch, batch_bytes):
+            try:
+                return self._upload_batch(batch, batch_bytes, action)
+            finally:
+                slots.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for batch, batch_bytes in self.build_batches(documents):
+                slots.acquire()
+                futures.append(executor.submit(run, batch, batch_bytes))
+
+            for future in futures:
+                outcome = future.result()
+                totals["batches"] += 1
+                totals["bytes"] += outcome["bytes"]
+                totals["retried"] += outcome["retried"]
+                errors.update(outcome["errors"])
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        succeeded = len(documents) - len(errors)
+        return {
+            "documents": len(documents),
+            "succeeded": succeeded,
+            "failed_keys": list(errors),
+            "errors": errors,
+            "batches": totals["batches"],
+            "retried_documents": totals["retried"],
+            "bytes_sent": totals["bytes"],
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_second": round(succeeded / elapsed, 2),
+            "bytes_per_second": round(totals["bytes"] / elapsed, 2),
+        }
+
+
+def print_upload_report(report: Dict[str, Any]):
+    """Print an upload run summary"""
+    megabytes = report["bytes_sent"] / (1024 * 1024)
+    print(f"Indexed {report['succeeded']}/{report['documents']} documents in {report['batches']} batches "
+          f"({report['docs_per_second']} docs/s, {report['bytes_per_second'] / (1024 * 1024):.2f} MB/s, "
+          f"{megabytes:.2f} MB sent, {report['retried_documents']} retried)")
+    if report["errors"]:
+        print(f"Warning: {len(report['errors'])} documents failed to index")
+        for key, error in report["errors"].items():
+            print(f"   {key}: {error}")
@@ -0,0 +1,183 @@
+"""
+Persistent Embedding Cache
+Content-addressed SQLite store of embeddings keyed by (model, dimensions, text)
+so re-ingestion only embeds rows whose text actually changed
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache with size-bounded LRU eviction
+
+    Vectors are stored as float32 blobs. Entries are evicted least recently
+    used first once either max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(self,
+                 path: str,
+                 model: str,
+                 dimensions: Optional[int] = None,
+                 max_entries: int = 200000,
+                 max_bytes: int = 2 * 1024 ** 3):
+        """
+        Args:
+            path: SQLite database file
+            model: Embedding model or deployment name (part of the key)
+            dimensions: Requested embedding dimensions (part of the key)
+            max_entries: Maximum number of cached vectors
+            max_bytes: Maximum total size of cached vectors in bytes
+        """
+        self.path = path
+        self.model = model or ""
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._connection.commit()
+
+    def make_key(self, text: str) -> str:
+        """Hash of (model, dimensions, text)"""
+        material = f"{self.model}\x1f{self.dimensions or 'default'}\x1f{text}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for texts
+
+        Returns:
+            List aligned with texts holding a vector or None on a miss
+        """
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._connection.commit()
+
+        results = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+        return results
+
+    def put_many(self, texts: List[str], embeddings: List[List[float]]):
+        """Store embeddings for texts, skipping empty vectors, then enforce size bounds"""
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            if embedding is None or len(embedding) == 0:
+                continue
+            blob = np.asarray(embedding, dtype=np.float32).tobytes()
+            rows.append((self.make_key(text), blob, len(blob), now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._connection.commit()
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until within max_entries and max_bytes"""
+        count, total_bytes = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()
+
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        excess_entries = max(0, count - self.max_entries)
+        excess_bytes = max(0, total_bytes - self.max_bytes)
+
+        victims = []
+        freed_bytes = 0
+        cursor = self._connection.execute(
+            "SELECT key, size FROM embeddings ORDER BY last_used ASC"
+        )
+        for key, size in cursor:
+            if len(victims) >= excess_entries and freed_bytes >= excess_bytes:
+                break
+            victims.append((key,))
+            freed_bytes += size
+
+        self._connection.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._connection.commit()
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics and current cache size"""
+        with self._lock:
+            count, total_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total_bytes,
+        }
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,311 @@
+"""
+Quota-aware Embedding Worker Pool
+Runs batched Azure OpenAI embedding requests concurrently while adapting
+the number of in-flight requests to the deployment's TPM/RPM limits
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import openai
+
+
+class RateWindow:
+    """Sliding one-minute window of request and token usage"""
+
+    def __init__(self, rpm_limit: Optional[int] = None, tpm_limit: Optional[int] = None):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self._events = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._events and now - self._events[0][0] >= 60:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve capacity for one request
+
+        Returns:
+            0 if the request was admitted, otherwise seconds to wait before retrying
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+
+            over_rpm = self.rpm_limit and len(self._events) >= self.rpm_limit
+            over_tpm = (
+                self.tpm_limit
+                and self._events
+                and self._tokens_in_window + tokens > self.tpm_limit
+            )
+            if over_rpm or over_tpm:
+                return max(0.05, 60 - (now - self._events[0][0]))
+
+            self._events.append((now, tokens))
+            self._tokens_in_window += tokens
+            return 0
+
+
+class EmbeddingWorkerPool:
+    """
+    Bounded, adaptive pool of embedding workers
+
+    Concurrency follows additive-increase / multiplicative-decrease: every 429
+    halves the in-flight limit and pauses all workers for the Retry-After
+    period, and a run of successful calls raises the limit by one again.
+    """
+
+    RETRYABLE_ERRORS = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+    def __init__(self,
+                 client,
+                 model: str,
+                 max_concurrency: int = 8,
+                 min_concurrency: int = 1,
+                 rpm_limit: Optional[int] = None,
+                 tpm_limit: Optional[int] = None,
+                 max_retries: int = 6,
+                 base_backoff: float = 1.0,
+                 embedding_kwargs: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            client: AzureOpenAI client (its own retries should be disabled)
+            model: Embedding deployment name
+            max_concurrency: Upper bound on in-flight requests
+            min_concurrency: Lower bound the limit can shrink to on throttling
+            rpm_limit: Requests-per-minute quota of the deployment
+            tpm_limit: Tokens-per-minute quota of the deployment
+            max_retries: Attempts per batch before it is reported as failed
+            base_backoff: Initial backoff in seconds for transient errors
+            embedding_kwargs: Extra embeddings.create arguments (e.g. dimensions)
+        """
+        self.client = client
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.embedding_kwargs = embedding_kwargs or {}
+        self.rate_window = RateWindow(rpm_limit=rpm_limit, tpm_limit=tpm_limit)
+
+        self._condition = threading.Condition()
+        self._limit = self.max_concurrency
+        self._in_flight = 0
+        self._success_streak = 0
+        self._resume_at = 0.0
+        self._throttled_until = 0.0
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttle_events": 0,
+            "throttled_seconds": 0.0,
+            "tokens": 0,
+        }
+        self._throttled_until = 0.0
+
+    def _add_stat(self, name: str, value):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _throttle_until(self, until: float):
+        """
+        Extend the shared throttled window to until
+
+        throttled_seconds counts wall-clock time covered by the window, so
+        workers waiting out the same quota or Retry-After period add it once.
+        """
+        with self._stats_lock:
+            if until > self._throttled_until:
+                self._stats["throttled_seconds"] += until - max(time.monotonic(), self._throttled_until)
+                self._throttled_until = until
+
+    def _acquire_slot(self):
+        with self._condition:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                if self._in_flight < self._limit:
+                    self._in_flight += 1
+                    return
+                self._condition.wait()
+
+    def _release_slot(self, succeeded: bool, throttled: bool = False, retry_after: float = 0.0):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(self.min_concurrency, self._limit // 2)
+                self._success_streak = 0
+                self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+            elif succeeded:
+                self._success_streak += 1
+                if self._limit < self.max_concurrency and self._success_streak >= self._limit:
+                    self._limit += 1
+                    self._success_streak = 0
+            self._condition.notify_all()
+
+    @staticmethod
+    def _retry_after_seconds(error: Exception, default: float) -> float:
+        """Read Retry-After (seconds) or retry-after-ms from a throttling response"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass
+        return default
+
+    def _wait_for_quota(self, tokens: int):
+        while True:
+            wait = self.rate_window.reserve(tokens)
+            if not wait:
+                return
+            self._throttle_until(time.monotonic() + wait)
+            time.sleep(wait)
+
+    def _embed_batch(self, texts: List[str], estimated_tokens: int) -> Dict[str, Any]:
+        """Embed one batch, retrying throttled and transient failures"""
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_quota(estimated_tokens)
+            self._acquire_slot()
+            succeeded = False
+            throttled = False
+            retry_after = 0.0
+
+            try:
+                self._add_stat("requests", 1)
+                response = self.client.embeddings.create(
+                    input=texts,
+                    model=self.model,
+                    **self.embedding_kwargs
+                )
+                usage = getattr(response, "usage", None)
+                self._add_stat("tokens", getattr(usage, "total_tokens", 0) or estimated_tokens)
+
+                embeddings = [[] for _ in texts]
+                for item in response.data:
+                    embeddings[item.index] = item.embedding
+                succeeded = True
+                return {"embeddings": embeddings, "error": None}
+
+            except self.RETRYABLE_ERRORS as e:
+                last_error = e
+                backoff = self.base_backoff * (2 ** attempt) * (0.5 + random.random())
+                if isinstance(e, openai.RateLimitError):
+                    throttled = True
+                    retry_after = self._retry_after_seconds(e, backoff)
+                    self._add_stat("throttle_events", 1)
+                    self._throttle_until(time.monotonic() + retry_after)
+                else:
+                    retry_after = backoff
+
+            except Exception as e:
+                return {"embeddings": [[] for _ in texts], "error": str(e)}
+
+            finally:
+                self._release_slot(succeeded, throttled, retry_after)
+
+            if attempt < self.max_retries:
+                self._add_stat("retries", 1)
+                if not throttled:
+                    time.sleep(retry_after)
+
+        return {"embeddings": [[] for _ in texts], "error": f"Retries exhausted: {last_error}"}
+
+    def embed(self,
+              texts: List[str],
+              batches: List[List[int]],
+              token_counts: Optional[List[int]] = None,
+              row_ids: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """
+        Embed texts concurrently, one request per batch
+
+        Args:
+            texts: Texts to embed
+            batches: Batches of positions into texts (see build_embedding_batches)
+            token_counts: Estimated tokens per text, used for TPM pacing
+            row_ids: Row reported for each text in failures (its position when omitted)
+
+        Returns:
+            Report with embeddings aligned to texts, per-row failures and throughput
+        """
+        self._reset_stats()
+        token_counts = token_counts or [max(1, len(text) // 4) for text in texts]
+        embeddings: List[List[float]] = [[] for _ in texts]
+        failures = []
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [
+                (batch, executor.submit(
+                    self._embed_batch,
+                    [texts[position] for position in batch],
+                    sum(token_counts[position] for position in batch)
+                ))
+                for batch in batches
+            ]
+
+            for batch, future in futures:
+                outcome = future.result()
+                for position, embedding in zip(batch, outcome["embeddings"]):
+                    embeddings[position] = embedding
+                    if not embedding:
+                        failures.append({
+                            "row": row_ids[position] if row_ids else position,
+                            "error": outcome["error"] or "No embedding returned"
+                        })
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        embedded_rows = len(texts) - len(failures)
+
+        return {
+            "embeddings": embeddings,
+            "failures": failures,
+            "rows_embedded": embedded_rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(embedded_rows / elapsed, 2),
+            "tokens_per_second": round(self._stats["tokens"] / elapsed, 2),
+            "requests": self._stats["requests"],
+            "retries": self._stats["retries"],
+            "throttle_events": self._stats["throttle_events"],
+            "throttled_seconds": round(self._stats["throttled_seconds"], 3),
+            "final_concurrency": self._limit,
+        }
+
+
+def print_embedding_report(report: Dict[str, Any]):
+    """Print an embedding run summary"""
+    print(f"Embedded {report['rows_embedded']} rows in {report['elapsed_seconds']}s "
+          f"({report['rows_per_second']} rows/s, {report['tokens_per_second']} tokens/s)")
+    print(f"Requests: {report['requests']}, retries: {report['retries']}, "
+          f"throttle events: {report['throttle_events']}, "
+          f"throttled time: {report['throttled_seconds']}s")
+    if report["failures"]:
+        print(f"Warning: {len(report['failures'])} rows could not be embedded")
+        for failure in report["failures"]:
+            row = failure["row"]
+            label = f"Row {row + 1}" if isinstance(row, int) else f"Document {row}"
+            print(f"   {label}: {failure['error']}")
@@ -0,0 +1,300 @@
+"""
+Facet Vocabulary and Rule-based Query Analysis
+Token-trie matchers over the index's facet values, and a deterministic
+analyzer that answers questions made only of known facet values without an
+LLM call
+"""
+
+import os
+import re
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from index_registry import DEFAULT_INDEX_ALIAS, IndexPointer, resolve_serving_index
+from odata_filter import format_literal
+
+load_dotenv()
+
+FACET_FIELDS = ("TEBStatus", "Manufacturer", "Capabilities", "SubCapability")
+
+# Phrasings of TEB statuses that differ from the stored values' token order
+TEB_STATUS_ALIASES = {
+    "TEB Approved": ["teb approved"],
+    "TEB Not Approved": ["not teb approved", "teb not approved", "not approved", "unapproved"],
+}
+
+# Words that carry no search intent in list-style questions
+STRUCTURAL_WORDS = frozenset("""
+    a about all an and any are available by can catalog category do does every find for from get give have i in
+    is list me made of on or our please provided s shown show standard standards tell that the their there
+    these this those tool tools technologies technology to used use we what which with
+    manufacturer manufacturers vendor vendors status capability capabilities subcapability
+""".split())
+
+# Topic fields whose one-word values ("security") are searched for unless one of
+# these words asks for a filter on the field
+TOPIC_CUE_WORDS = {
+    "Capabilities": frozenset(["capability", "capabilities", "category"]),
+    "SubCapability": frozenset(["subcapability", "subcapabilities"]),
+}
+
+# Words that change the meaning of a filter in ways the rules do not model
+NEGATION_WORDS = frozenset(["not", "no", "except", "excluding", "exclude", "without", "other", "besides", "non"])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens; punctuation such as &, / and - separates tokens"""
+    return re.findall(r"[a-z0-9]+", text.lower()) if text else []
+
+
+class TokenTrie:
+    """
+    Multi-pattern phrase matcher over token sequences
+
+    Each phrase is inserted as its token sequence; find_all scans a token
+    list once and returns leftmost-longest, non-overlapping matches, so
+    "endpoint security" wins over "security" and every phrase is found in
+    a single pass over the question.
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self.size = 0
+
+    def add(self, phrase: str, payload: Tuple[str, str]):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        payloads = node.setdefault(None, [])
+        if payload not in payloads:
+            payloads.append(payload)
+            self.size += 1
+
+    def find_all(self, tokens: List[str]) -> List[Tuple[int, int, List[Tuple[str, str]]]]:
+        """(start, end, payloads) for each match; end is exclusive"""
+        matches = []
+        position = 0
+        while position < len(tokens):
+            node = self._root
+            longest = None
+            for end in range(position, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node:
+                    longest = (end + 1, node[None])
+            if longest:
+                matches.append((position, longest[0], longest[1]))
+                position = longest[0]
+            else:
+                position += 1
+        return matches
+
+
+class FacetVocabulary:
+    """
+    Current facet values of the index, rebuilt when the index changes
+
+    Values come from load_facets (a get_facet_counts call). Whenever
+    version() changes (blue/green flip or completed ingestion), or after
+    max_age_seconds, the vocabulary is reloaded on next use. version() is
+    checked at most every check_interval_seconds so lookups stay cheap. A
+    failed reload keeps the previous vocabulary.
+    """
+
+    def __init__(self,
+                 load_facets: Callable[[], Dict[str, Any]],
+                 version: Callable[[], Any] = lambda: None,
+                 check_interval_seconds: float = 30,
+                 max_age_seconds: float = 3600):
+        """
+        Args:
+            load_facets: Returns a get_facet_counts result
+            version: Returns a value that changes when the index content changes
+            check_interval_seconds: Minimum time between version checks
+            max_age_seconds: Reload after this long even without a version change
+        """
+        self._load_facets = load_facets
+        self._version = version
+        self.check_interval_seconds = check_interval_seconds
+        self.max_age_seconds = max_age_seconds
+
+        self.values: Dict[str, List[str]] = {}
+        self.trie: Optional[TokenTrie] = None
+        self.loaded_version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @classmethod
+    def for_search_client(cls, search_client, alias: str = DEFAULT_INDEX_ALIAS) -> "FacetVocabulary":
+        """
+        Vocabulary loaded through a search client's get_facet_counts
+
+        Environment variables:
+            FACET_VOCABULARY_MAX_VALUES: Facet values fetched per field
+            FACET_VOCABULARY_CHECK_INTERVAL_SECONDS: Minimum time between index version checks
+            FACET_VOCABULARY_MAX_AGE_SECONDS: Reload interval without a version change
+        """
+        max_values = int(os.getenv("FACET_VOCABULARY_MAX_VALUES", "1000"))
+        pointer = IndexPointer()
+        return cls(
+            load_facets=lambda: search_client.get_facet_counts(
+                "*", [f"{field},count:{max_values}" for field in FACET_FIELDS]
+            ),
+            version=lambda: (resolve_serving_index(alias, pointer), pointer.content_version(alias)),
+            check_interval_seconds=float(os.getenv("FACET_VOCABULARY_CHECK_INTERVAL_SECONDS", "30")),
+            max_age_seconds=float(os.getenv("FACET_VOCABULARY_MAX_AGE_SECONDS", "3600"))
+        )
+
+    def current(self) -> Optional[TokenTrie]:
+        """Matcher for the current index content, or None when no facets could be loaded"""
+        now = time.monotonic()
+        if self.trie is not None and now - self._checked_at < self.check_interval_seconds:
+            return self.trie
+
+        with self._lock:
+            if self.trie is not None and now - self._checked_at < self.check_interval_seconds:
+                return self.trie
+            self._checked_at = now
+            try:
+                version = self._version()
+            except Exception as e:
+                print(f"Error reading index version for facet vocabulary: {str(e)}")
+                version = self.loaded_version
+            if self.trie is None or version != self.loaded_version or now - self._loaded_at >= self.max_age_seconds:
+                self._reload(version, now)
+            return self.trie
+
+    def _reload(self, version: Any, now: float):
+        result = self._load_facets()
+        if "error" in result:
+            print(f"Error loading facet vocabulary: {result['error']}")
+            return
+
+        values = {
+            field: [str(facet["value"]) for facet in result.get("facet_counts", {}).get(field, [])
+                    if facet.get("value") not in (None, "")]
+            for field in FACET_FIELDS
+        }
+        trie = TokenTrie()
+        for field, field_values in values.items():
+            for value in field_values:
+                trie.add(value, (field, value))
+        for value in values.get("TEBStatus", []):
+            for alias in TEB_STATUS_ALIASES.get(value, []):
+                trie.add(alias, ("TEBStatus", value))
+
+        self.values = values
+        self.trie = trie
+        self.loaded_version = version
+        self._loaded_at = now
+        self.reloads += 1
+        print(f"Facet vocabulary loaded: {sum(len(v) for v in values.values())} values")
+
+
+class RuleBasedAnalyzer:
+    """
+    Deterministic QueryAnalyzer fast path
+
+    A question is answered without the LLM when every token is either part
+    of a facet value match or a structural word ("list", "all", "tools",
+    ...). TEBStatus and Manufacturer matches always become filters, as in
+    the analysis prompt. A Capabilities or SubCapability value is a topic
+    as much as a category, so a one-word match ("What security tools can I
+    use?") is searched for instead of filtered on, as the LLM would, unless
+    the question names the field ("capability", see TOPIC_CUE_WORDS); values
+    of several tokens ("Identity & Access Mgmt") are filtered on. Filtered
+    values of the same field are OR-ed, different fields AND-ed, and the
+    search query is "*" when the filters carry the whole question.
+    Negations, phrases matching values of more than one field and any
+    leftover content word lower the confidence, and questions below
+    min_confidence are left to the LLM.
+    """
+
+    def __init__(self, vocabulary: FacetVocabulary, min_confidence: float = 1.0):
+        self.vocabulary = vocabulary
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {"questions": 0, "answered": 0, "deferred": 0, "seconds": 0.0}
+
+    def analyze(self, question: str) -> Optional[Dict[str, Any]]:
+        """search_query, filters and intent, or None when the LLM should decide"""
+        started = time.perf_counter()
+        analysis = self._analyze(question)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["answered" if analysis else "deferred"] += 1
+            self._stats["seconds"] += elapsed
+        return analysis
+
+    def _analyze(self, question: str) -> Optional[Dict[str, Any]]:
+        trie = self.vocabulary.current()
+        tokens = tokenize(question)
+        if trie is None or not tokens:
+            return None
+
+        matches = trie.find_all(tokens)
+        token_set = set(tokens)
+        covered = set()
+        selected: Dict[str, List[str]] = {}
+        searched: List[str] = []
+        for start, end, payloads in matches:
+            if len({field for field, _ in payloads}) > 1:
+                # The same phrase names values of different fields
+                return None
+            covered.update(range(start, end))
+            field = payloads[0][0]
+            if end - start == 1 and field in TOPIC_CUE_WORDS and not TOPIC_CUE_WORDS[field] & token_set:
+                # "security" alone is a topic, not a request for Capabilities eq 'Security'
+                searched.append(tokens[start])
+                continue
+            for _, value in payloads:
+                if value not in selected.setdefault(field, []):
+                    selected[field].append(value)
+
+        leftover = [token for i, token in enumerate(tokens) if i not in covered]
+        if any(token in NEGATION_WORDS for token in leftover):
+            return None
+        explained = len(tokens) - sum(1 for token in leftover if token not in STRUCTURAL_WORDS)
+        if explained / len(tokens) < self.min_confidence:
+            return None
+
+        clauses = []
+        for field in FACET_FIELDS:
+            field_values = selected.get(field, [])
+            if field_values:
+                alternatives = [f"{field} eq {format_literal(value)}" for value in field_values]
+                clauses.append(alternatives[0] if len(alternatives) == 1 else f"({' or '.join(alternatives)})")
+        filters = " and ".join(clauses)
+
+        described = [f"{field} {' or '.join(selected[field])}" for field in FACET_FIELDS if field in selected]
+        if searched:
+            intent = f"Search tools for {' '.join(searched)}"
+            if described:
+                intent += f" by {', '.join(described)}"
+        else:
+            intent = f"List tools by {', '.join(described)}" if described else "List all tools"
+        return {
+            "search_query": " ".join(searched) or "*",
+            "filters": filters,
+            "intent": intent,
+            "source": "rules"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["answer_rate"] = round(stats["answered"] / stats["questions"], 4) if stats["questions"] else 0.0
+        stats["mean_microseconds"] = round(stats.pop("seconds") / stats["questions"] * 1e6, 1) if stats["questions"] else 0.0
+        stats["vocabulary_reloads"] = self.vocabulary.reloads
+        stats["vocabulary_size"] = self.vocabulary.trie.size if self.vocabulary.trie else 0
+        return stats
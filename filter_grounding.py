@@ -0,0 +1,315 @@
+"""
+Filter Value Grounding
+Snaps the facet values in analyzer filters to values that exist in the
+index, so a near-miss value ('Identity & Access Management' for 'Identity
+& Access Mgmt') does not turn into a zero-result search
+"""
+
+import os
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from facet_vocabulary import FACET_FIELDS, FacetVocabulary, TokenTrie
+from odata_filter import ODataFilterError, canonicalize_filter, parse_filter, to_filter_string
+
+load_dotenv()
+
+# Outcomes of a clause whose value cannot be grounded (see FilterGrounder)
+_MATCHES_ALL = "matches_all"
+_MATCHES_NONE = "matches_none"
+
+
+def normalize_value(value: str) -> str:
+    """Case-folded value with "&" spelled "and" and punctuation reduced to single spaces"""
+    text = value.casefold().replace("&", " and ")
+    return re.sub(r"[^0-9a-z]+", " ", text).strip()
+
+
+def trigrams(normalized: str) -> set:
+    """Character trigrams of a normalized value with spaces removed ("dev ops" matches "devops")"""
+    padded = f"##{normalized.replace(' ', '')}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for i, a in enumerate(first, 1):
+        current = [i]
+        for j, b in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def tokens_match(first: str, second: str) -> bool:
+    """
+    Whether two tokens name the same thing: equal, a prefix of at least
+    three characters ("dev" / "devops"), an abbreviation keeping the first
+    and last letters ("mgmt" / "management") or a typo (edit distance 1,
+    2 for tokens of eight characters or more)
+    """
+    if first == second:
+        return True
+    short, long = sorted((first, second), key=len)
+    if len(short) >= 3 and long.startswith(short):
+        return True
+    if len(short) >= 3 and short[0] == long[0] and short[-1] == long[-1]:
+        remaining = iter(long)
+        if all(char in remaining for char in short):
+            return True
+    if len(short) >= 4:
+        limit = 2 if len(short) >= 8 else 1
+        return edit_distance(first, second, limit) <= limit
+    return False
+
+
+def matched_tokens(first: List[str], second: List[str]) -> int:
+    """Number of tokens of first greedily paired with a matching token of second"""
+    unmatched = list(second)
+    matched = 0
+    for token in first:
+        for i, other in enumerate(unmatched):
+            if tokens_match(token, other):
+                matched += 1
+                del unmatched[i]
+                break
+    return matched
+
+
+def token_similarity(first: List[str], second: List[str]) -> float:
+    """Dice coefficient over greedily paired matching tokens"""
+    if not first or not second:
+        return 0.0
+    return 2 * matched_tokens(first, second) / (len(first) + len(second))
+
+
+class FacetValueIndex:
+    """
+    Fuzzy lookup of one facet field's values
+
+    Built once per vocabulary: normalized value -> value for exact lookups,
+    and a trigram inverted index for candidates. A candidate's similarity is
+    the higher of trigram Dice (spacing and typos) and token Dice
+    (abbreviations and reworded tokens). When no candidate is similar
+    enough, a value whose tokens all appear in a facet value, or that
+    contains every token of one, is grounded to the facet value with the
+    fewest extra tokens ('AI' -> 'AI/ML', 'Amazon Web Services' -> 'Amazon',
+    'Approved' -> 'TEB Approved' rather than 'TEB Not Approved'). A tie
+    ('Google' against 'Google Cloud' and 'Google Workspace') grounds nothing.
+    """
+
+    def __init__(self, values: List[str]):
+        self.values = values
+        self._exact: Dict[str, str] = {}
+        self._normalized: List[Tuple[List[str], set]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for index, value in enumerate(values):
+            normalized = normalize_value(value)
+            self._exact.setdefault(normalized, value)
+            grams = trigrams(normalized)
+            self._normalized.append((normalized.split(), grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(index)
+
+    def lookup(self, value: str, min_similarity: float) -> Tuple[Optional[str], float]:
+        """(closest value, similarity), or (None, best similarity) when nothing unambiguous reaches min_similarity"""
+        normalized = normalize_value(value)
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            return exact, 1.0
+
+        tokens, grams = normalized.split(), trigrams(normalized)
+        candidates = {index for gram in grams for index in self._postings.get(gram, [])}
+        scored = []
+        containing = []
+        for index in candidates:
+            candidate_tokens, candidate_grams = self._normalized[index]
+            trigram_dice = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            score = max(trigram_dice, token_similarity(tokens, candidate_tokens))
+            scored.append((score, self.values[index]))
+            shorter, longer = sorted((tokens, candidate_tokens), key=len)
+            if shorter and matched_tokens(shorter, longer) == len(shorter):
+                containing.append((len(longer) - len(shorter), score, self.values[index]))
+        if not scored:
+            return None, 0.0
+
+        scored.sort(key=lambda item: -item[0])
+        best_score, best_value = scored[0]
+        if best_score < min_similarity:
+            containing.sort(key=lambda item: item[0])
+            if containing and (len(containing) == 1 or containing[1][0] > containing[0][0]):
+                return containing[0][2], containing[0][1]
+            return None, best_score
+        if len(scored) > 1 and scored[1][0] == best_score:
+            # 'Google' against 'Google Cloud' and 'Google Workspace': no single grounding
+            return None, best_score
+        return best_value, best_score
+
+
+class FilterGrounder:
+    """
+    Grounds facet values in analyzer filters before searching
+
+    Every eq/ne literal (and search.in value) on a facet field is replaced
+    by the closest value currently in the index. A value that cannot be
+    grounded is not in the index, so an eq clause (or search.in value) on it
+    matches no document and an ne clause matches every document. The filter
+    is only ever widened, never narrowed:
+        - an eq alternative inside an "or" (or a search.in value) is removed,
+          since it could never match
+        - an ne clause inside an "or" makes the whole group match everything,
+          so the group is dropped
+        - inside an "and", or at the top, the clause is dropped
+        - a "not" with anything dropped beneath it is dropped as a whole
+    Other fields and operators pass through unchanged.
+
+    Environment variables:
+        FILTER_GROUNDING_ENABLED: Ground filter values (default true)
+        FILTER_GROUNDING_MIN_SIMILARITY: Minimum similarity to snap a value to a facet value
+    """
+
+    def __init__(self, vocabulary: FacetVocabulary, enabled: bool = True, min_similarity: float = 0.8):
+        self.vocabulary = vocabulary
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+        self._fields = {field.lower(): field for field in FACET_FIELDS}
+        self._indexes: Dict[str, FacetValueIndex] = {}
+        self._indexed_trie: Optional[TokenTrie] = None
+        self._lock = threading.Lock()
+        self._stats = {"filters": 0, "values": 0, "exact": 0, "snapped": 0, "dropped": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, vocabulary: FacetVocabulary) -> "FilterGrounder":
+        return cls(
+            vocabulary,
+            enabled=os.getenv("FILTER_GROUNDING_ENABLED", "true").lower() == "true",
+            min_similarity=float(os.getenv("FILTER_GROUNDING_MIN_SIMILARITY", "0.8"))
+        )
+
+    def _current_indexes(self) -> Optional[Dict[str, FacetValueIndex]]:
+        trie = self.vocabulary.current()
+        if trie is None:
+            return None
+        with self._lock:
+            # Rebuilt whenever the vocabulary reloads (new trie object)
+            if trie is not self._indexed_trie:
+                self._indexes = {field: FacetValueIndex(values) for field, values in self.vocabulary.values.items()}
+                self._indexed_trie = trie
+            return self._indexes
+
+    def ground(self, filters: Optional[str]) -> Dict[str, Any]:
+        """
+        Ground a filter
+
+        Returns:
+            {"filter": grounded filter ("" when every clause was dropped),
+             "snapped": ["field: value -> facet value", ...], "dropped": [clause, ...]}
+            The filter is returned unchanged when grounding is disabled, the
+            vocabulary is unavailable or the filter does not parse (the
+            search client's validation reports it).
+        """
+        report = {"filter": filters or "", "snapped": [], "dropped": []}
+        if not self.enabled or not filters or not filters.strip():
+            return report
+        indexes = self._current_indexes()
+        if indexes is None:
+            return report
+        try:
+            node = parse_filter(filters)
+        except ODataFilterError:
+            with self._lock:
+                self._stats["errors"] += 1
+            return report
+
+        counts = {"values": 0, "exact": 0}
+        node = self._ground_node(node, indexes, report, counts)
+        changed = report["snapped"] or report["dropped"]
+        if changed:
+            report["filter"] = "" if node in (_MATCHES_ALL, _MATCHES_NONE) \
+                else canonicalize_filter(to_filter_string(node))
+            print(f"Grounded filter {filters!r} -> {report['filter']!r}")
+        with self._lock:
+            self._stats["filters"] += 1
+            self._stats["values"] += counts["values"]
+            self._stats["exact"] += counts["exact"]
+            self._stats["snapped"] += len(report["snapped"])
+            self._stats["dropped"] += len(report["dropped"])
+        return report
+
+    def _ground_value(self, field: str, value: str, indexes: Dict[str, FacetValueIndex],
+                      report: Dict[str, Any], counts: Dict[str, int]) -> Optional[str]:
+        counts["values"] += 1
+        index = indexes.get(field)
+        if index is None or not index.values:
+            return value
+        grounded, similarity = index.lookup(value, self.min_similarity)
+        if grounded == value:
+            counts["exact"] += 1
+        elif grounded is not None:
+            report["snapped"].append(f"{field}: {value!r} -> {grounded!r} ({similarity:.2f})")
+        return grounded
+
+    def _ground_node(self, node, indexes: Dict[str, FacetValueIndex], report: Dict[str, Any],
+                     counts: Dict[str, int]):
+        """Grounded node, _MATCHES_ALL or _MATCHES_NONE"""
+        kind = node[0]
+        if kind == "and":
+            # Either outcome drops the clause: _MATCHES_NONE is widened rather than emptying the results
+            children = [child for child in (self._ground_node(child, indexes, report, counts) for child in node[1])
+                        if child not in (_MATCHES_ALL, _MATCHES_NONE)]
+            if not children:
+                return _MATCHES_ALL
+            return children[0] if len(children) == 1 else ("and", children)
+        if kind == "or":
+            children = [self._ground_node(child, indexes, report, counts) for child in node[1]]
+            if _MATCHES_ALL in children:
+                report["dropped"].append(f"({to_filter_string(node)}) with an alternative matching everything")
+                return _MATCHES_ALL
+            children = [child for child in children if child != _MATCHES_NONE]
+            if not children:
+                return _MATCHES_NONE
+            return children[0] if len(children) == 1 else ("or", children)
+        if kind == "not":
+            already_dropped = len(report["dropped"])
+            child = self._ground_node(node[1], indexes, report, counts)
+            if child in (_MATCHES_ALL, _MATCHES_NONE) or len(report["dropped"]) > already_dropped:
+                report["dropped"].append(to_filter_string(node))
+                return _MATCHES_ALL
+            return ("not", child)
+
+        field = self._fields.get(node[1].lower())
+        if field is None:
+            return node
+        if kind == "in":
+            values = []
+            for value in node[2]:
+                grounded = self._ground_value(field, value, indexes, report, counts)
+                if grounded is None:
+                    report["dropped"].append(f"{node[1]} value {value!r}")
+                elif grounded not in values:
+                    values.append(grounded)
+            return ("in", node[1], values) if values else _MATCHES_NONE
+
+        _, name, operator, value = node
+        if operator not in ("eq", "ne") or not isinstance(value, str):
+            return node
+        grounded = self._ground_value(field, value, indexes, report, counts)
+        if grounded is None:
+            report["dropped"].append(to_filter_string(node))
+            return _MATCHES_NONE if operator == "eq" else _MATCHES_ALL
+        return ("cmp", name, operator, grounded)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = self.enabled
+        stats["min_similarity"] = self.min_similarity
+        return stats
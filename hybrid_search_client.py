@@ -5,6 +5,8 @@ Supports vector search, keyword search, semantic search, and filtering
 
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from openai import AzureOpenAI
 from azure.search.documents import SearchClient
@@ -15,6 +17,13 @@ from azure.search.documents.models import (
     QueryAnswerType
 )
 from azure.core.credentials import AzureKeyCredential
+from index_registry import IndexPointer, resolve_serving_index
+from vector_config import VectorSettings, VECTOR_FIELD_NAME
+from query_embedding_cache import QueryEmbeddingCache
+from search_result_cache import SearchResultCache, make_result_key
+from single_flight import SingleFlight
+from search_records import SearchResultStream
+from odata_filter import FilterValidator, ODataFilterError
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,6 +35,8 @@ class HybridSearchClient:
         self.search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
         self.search_key = os.getenv("AZURE_SEARCH_KEY")
         self.search_index_name = "technology-tools-index"
+        self.index_pointer = IndexPointer()
+        self.serving_index_name = resolve_serving_index(self.search_index_name, self.index_pointer)
         
         # Azure OpenAI configuration for embeddings
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -33,18 +44,52 @@ class HybridSearchClient:
         self.openai_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
         
+        # Must match the settings used at ingestion so queries share the document vector space
+        self.vector_settings = VectorSettings.from_env()
+        self.embedding_kwargs = self.vector_settings.embedding_kwargs(self.embedding_model)
+        
+        # Query embedding cache (in-process LRU, optionally shared through Redis)
+        self.query_embedding_cache_enabled = os.getenv("QUERY_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.query_embedding_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+        self.query_embedding_cache_ttl = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+        self.query_embedding_cache_redis_url = os.getenv("QUERY_EMBEDDING_CACHE_REDIS_URL")
+        self.query_embedding_cache_redis_ttl = int(os.getenv("QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS", "86400"))
+        
+        # Result cache for keyword, filter and facet queries, invalidated by ingestion
+        self.result_cache = None
+        if os.getenv("SEARCH_RESULT_CACHE_ENABLED", "true").lower() == "true":
+            self.result_cache = SearchResultCache(
+                max_bytes=int(os.getenv("SEARCH_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("SEARCH_RESULT_CACHE_TTL_SECONDS", "300")),
+                stale_seconds=float(os.getenv("SEARCH_RESULT_CACHE_STALE_SECONDS", "600"))
+            )
+        
+        # Identical concurrent embedding and hybrid calls share one upstream request
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        self.embedding_flight = SingleFlight("create_embedding")
+        self.hybrid_flight = SingleFlight("hybrid_search")
+        
+        # Filters are checked against the index schema and canonicalized before any request
+        self.filter_validator = FilterValidator.from_env()
+        
+        # Concurrent searches per multi_search call
+        self.multi_search_max_parallel = int(os.getenv("MULTI_SEARCH_MAX_PARALLEL", "8"))
+        
+        # Results requested per page by the lazy iter_* streams
+        self.stream_page_size = int(os.getenv("SEARCH_STREAM_PAGE_SIZE", "10"))
+        
         # Initialize clients
         self._initialize_clients()
     
     def _initialize_clients(self):
         """Initialize Azure clients"""
         try:
-            # Azure AI Search client
-            credential = AzureKeyCredential(self.search_key)
+            # Azure AI Search client for the currently served index generation
+            self.credential = AzureKeyCredential(self.search_key)
             self.search_client = SearchClient(
                 endpoint=self.search_endpoint,
-                index_name=self.search_index_name,
-                credential=credential
+                index_name=self.serving_index_name,
+                credential=self.credential
             )
             
             # Azure OpenAI client for embeddings
@@ -54,23 +99,139 @@ class HybridSearchClient:
                 azure_endpoint=self.openai_endpoint
             )
             
+            self.embedding_cache = None
+            if self.query_embedding_cache_enabled:
+                self.embedding_cache = QueryEmbeddingCache(
+                    model=self.embedding_model,
+                    dimensions=self.vector_settings.dimensions,
+                    max_entries=self.query_embedding_cache_size,
+                    ttl_seconds=self.query_embedding_cache_ttl,
+                    redis_url=self.query_embedding_cache_redis_url,
+                    redis_ttl_seconds=self.query_embedding_cache_redis_ttl
+                )
+            
             print("Hybrid Search Client initialized successfully")
             
         except Exception as e:
             print(f"Error initializing search client: {str(e)}")
             raise
     
+    def _get_search_client(self) -> SearchClient:
+        """Return a search client for the served index, following blue/green flips"""
+        serving_index_name = resolve_serving_index(self.search_index_name, self.index_pointer)
+        if serving_index_name != self.serving_index_name:
+            print(f"Index pointer moved: now querying '{serving_index_name}'")
+            self.serving_index_name = serving_index_name
+            self.search_client = SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=serving_index_name,
+                credential=self.credential
+            )
+        return self.search_client
+    
     def create_embedding(self, text: str) -> List[float]:
-        """Create embedding for text using Azure OpenAI"""
+        """Create embedding for text using Azure OpenAI, served from the query cache when possible"""
+        if self.embedding_cache:
+            cached = self.embedding_cache.get(text)
+            if cached is not None:
+                return cached
+        
+        if not self.single_flight_enabled:
+            return self._create_embedding(text)
+        return self.embedding_flight.do(text, lambda: self._create_embedding(text))
+    
+    def _create_embedding(self, text: str) -> List[float]:
         try:
             response = self.openai_client.embeddings.create(
                 input=text,
-                model=self.embedding_model
+                model=self.embedding_model,
+                **self.embedding_kwargs
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
         except Exception as e:
             print(f"Error creating embedding: {str(e)}")
             return []
+        
+        if self.embedding_cache:
+            self.embedding_cache.put(text, embedding)
+        return embedding
+    
+    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings for several texts with one embeddings request
+        
+        Cached texts are served from the query cache and duplicates are sent
+        once. Returns one embedding per text, in order; an empty list marks a
+        text whose embedding could not be created.
+        """
+        embeddings: Dict[str, List[float]] = {}
+        if self.embedding_cache:
+            for text in texts:
+                if text not in embeddings:
+                    cached = self.embedding_cache.get(text)
+                    if cached is not None:
+                        embeddings[text] = cached
+        
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if missing:
+            try:
+                response = self.openai_client.embeddings.create(
+                    input=missing,
+                    model=self.embedding_model,
+                    **self.embedding_kwargs
+                )
+                for item in response.data:
+                    text = missing[item.index]
+                    embeddings[text] = item.embedding
+                    if self.embedding_cache:
+                        self.embedding_cache.put(text, item.embedding)
+            except Exception as e:
+                print(f"Error creating embeddings: {str(e)}")
+        
+        return [embeddings.get(text, []) for text in texts]
+    
+    def close(self):
+        """Close the search and embedding clients' connection pools"""
+        if self.result_cache:
+            self.result_cache.close()
+        self.search_client.close()
+        self.openai_client.close()
+    
+    def _cached(self, key: str, compute) -> Dict[str, Any]:
+        """Serve a result from the result cache for the current index version"""
+        if not self.result_cache:
+            return compute()
+        # Any blue/green flip (new serving index) or completed ingestion moves the version
+        self._get_search_client()
+        version = (self.serving_index_name, self.index_pointer.content_version(self.search_index_name))
+        return self.result_cache.get_or_compute(key, version, compute)
+    
+    def get_result_cache_stats(self) -> Dict[str, Any]:
+        """Search result cache hit rates and size (empty when the cache is disabled)"""
+        return self.result_cache.stats() if self.result_cache else {}
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Query embedding cache hit rates (empty when the cache is disabled)"""
+        return self.embedding_cache.stats() if self.embedding_cache else {}
+    
+    def get_filter_validation_stats(self) -> Dict[str, Any]:
+        """Filters checked, repaired and rejected before reaching the service"""
+        return self.filter_validator.stats()
+    
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """Calls, upstream executions and coalesced requests per coalesced operation"""
+        return {
+            "create_embedding": self.embedding_flight.stats(),
+            "hybrid_search": self.hybrid_flight.stats()
+        }
+    
+    def _build_vector_query(self, query_embedding: List[float], top: int) -> VectorizedQuery:
+        """Vector query against content_vector; compressed indexes rescore with their default oversampling"""
+        return VectorizedQuery(
+            vector=query_embedding,
+            k_nearest_neighbors=top,
+            fields=VECTOR_FIELD_NAME
+        )
     
     def keyword_search(self, 
                       query: str, 
@@ -86,6 +247,16 @@ class HybridSearchClient:
             top: Number of results to return (default: 100 to retrieve all relevant documents)
             select_fields: Fields to return in results
         """
+        try:
+            filters = self.filter_validator.check(filters)
+        except ODataFilterError as e:
+            return {"error": f"Invalid filter: {str(e)}"}
+        return self._cached(
+            make_result_key("keyword", query, filters, select_fields, top),
+            lambda: self._keyword_search(query, filters, top, select_fields)
+        )
+    
+    def _keyword_search(self, query, filters, top, select_fields) -> Dict[str, Any]:
         try:
             search_params = {
                 "search_text": query,
@@ -99,7 +270,7 @@ class HybridSearchClient:
             if select_fields:
                 search_params["select"] = select_fields
             
-            results = self.search_client.search(**search_params)
+            results = self._get_search_client().search(**search_params)
             
             return {
                 "query_type": "keyword",
@@ -117,7 +288,8 @@ class HybridSearchClient:
                      query: str, 
                      filters: Optional[str] = None,
                      top: int = 100,
-                     select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+                     select_fields: Optional[List[str]] = None,
+                     query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         Perform vector search with optional filtering
         
@@ -126,19 +298,19 @@ class HybridSearchClient:
             filters: OData filter expression
             top: Number of results to return (default: 100 to retrieve all relevant documents)
             select_fields: Fields to return in results
+            query_embedding: Precomputed embedding of query (created when omitted)
         """
         try:
+            filters = self.filter_validator.check(filters)
+            
             # Create embedding for the query
-            query_embedding = self.create_embedding(query)
+            if query_embedding is None:
+                query_embedding = self.create_embedding(query)
             if not query_embedding:
                 return {"error": "Failed to create embedding for query"}
             
             # Create vectorized query
-            vector_query = VectorizedQuery(
-                vector=query_embedding,
-                k_nearest_neighbors=top,
-                fields="content_vector"
-            )
+            vector_query = self._build_vector_query(query_embedding, top)
             
             search_params = {
                 "vector_queries": [vector_query],
@@ -152,7 +324,7 @@ class HybridSearchClient:
             if select_fields:
                 search_params["select"] = select_fields
             
-            results = self.search_client.search(**search_params)
+            results = self._get_search_client().search(**search_params)
             
             return {
                 "query_type": "vector",
@@ -171,7 +343,8 @@ class HybridSearchClient:
                      filters: Optional[str] = None,
                      top: int = 100,
                      select_fields: Optional[List[str]] = None,
-                     semantic_configuration_name: str = "default-semantic-config") -> Dict[str, Any]:
+                     semantic_configuration_name: str = "default-semantic-config",
+                     query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         Perform hybrid search (vector + keyword + semantic) with optional filtering
         
@@ -181,19 +354,30 @@ class HybridSearchClient:
             top: Number of results to return (default: 100 to retrieve all relevant documents)
             select_fields: Fields to return in results
             semantic_configuration_name: Semantic search configuration name
+            query_embedding: Precomputed embedding of query (created when omitted)
         """
+        try:
+            filters = self.filter_validator.check(filters)
+        except ODataFilterError as e:
+            return {"error": f"Invalid filter: {str(e)}"}
+        compute = lambda: self._hybrid_search(query, filters, top, select_fields, semantic_configuration_name,
+                                              query_embedding)
+        if not self.single_flight_enabled:
+            return compute()
+        key = (make_result_key("hybrid", query, filters, select_fields, top), semantic_configuration_name)
+        return self.hybrid_flight.do(key, compute)
+    
+    def _hybrid_search(self, query, filters, top, select_fields, semantic_configuration_name,
+                       query_embedding=None) -> Dict[str, Any]:
         try:
             # Create embedding for the query
-            query_embedding = self.create_embedding(query)
+            if query_embedding is None:
+                query_embedding = self.create_embedding(query)
             if not query_embedding:
                 return {"error": "Failed to create embedding for query"}
             
             # Create vectorized query
-            vector_query = VectorizedQuery(
-                vector=query_embedding,
-                k_nearest_neighbors=top,
-                fields="content_vector"
-            )
+            vector_query = self._build_vector_query(query_embedding, top)
             
             search_params = {
                 "search_text": query,
@@ -212,7 +396,7 @@ class HybridSearchClient:
             if select_fields:
                 search_params["select"] = select_fields
             
-            results = self.search_client.search(**search_params)
+            results = self._get_search_client().search(**search_params)
             
             return {
                 "query_type": "hybrid",
@@ -238,18 +422,31 @@ class HybridSearchClient:
             top: Number of results to return (default: 100 to retrieve all relevant documents)
             select_fields: Fields to return in results
         """
+        try:
+            filters = self.filter_validator.check(filters)
+        except ODataFilterError as e:
+            return {"error": f"Invalid filter: {str(e)}"}
+        return self._cached(
+            make_result_key("filter", "*", filters, select_fields, top),
+            lambda: self._filter_search(filters, top, select_fields)
+        )
+    
+    def _filter_search(self, filters, top, select_fields) -> Dict[str, Any]:
         try:
             search_params = {
                 "search_text": "*",
-                "filter": filters,
                 "top": top,
                 "include_total_count": True
             }
             
+            # Empty when validation dropped every clause
+            if filters:
+                search_params["filter"] = filters
+            
             if select_fields:
                 search_params["select"] = select_fields
             
-            results = self.search_client.search(**search_params)
+            results = self._get_search_client().search(**search_params)
             
             return {
                 "query_type": "filter",
@@ -273,6 +470,12 @@ class HybridSearchClient:
             search_text: Search text (default: "*" for all)
             facets: List of fields to facet on
         """
+        return self._cached(
+            make_result_key("facets", search_text, facets=facets),
+            lambda: self._get_facet_counts(search_text, facets)
+        )
+    
+    def _get_facet_counts(self, search_text, facets) -> Dict[str, Any]:
         try:
             if not facets:
                 facets = ["TEBStatus", "Manufacturer", "Capabilities", "SubCapability"]
@@ -284,7 +487,7 @@ class HybridSearchClient:
                 "include_total_count": True
             }
             
-            results = self.search_client.search(**search_params)
+            results = self._get_search_client().search(**search_params)
             
             return {
                 "query_type": "facets",
@@ -298,6 +501,130 @@ class HybridSearchClient:
             print(f"Error getting facet counts: {str(e)}")
             return {"error": str(e)}
     
+    def _stream(self,
+                query_type: str,
+                query: Optional[str],
+                filters: Optional[str],
+                top: int,
+                select_fields: Optional[List[str]],
+                semantic_configuration_name: Optional[str] = None) -> SearchResultStream:
+        prepared = {}
+        
+        def open_page(skip: int, page_top: int):
+            # Filters are checked and the query embedded once, on the first page
+            if not prepared:
+                search_params = {"include_total_count": True}
+                checked_filters = self.filter_validator.check(filters)
+                if query_type in ("keyword", "hybrid", "filter"):
+                    search_params["search_text"] = query
+                if query_type in ("vector", "hybrid"):
+                    query_embedding = self.create_embedding(query)
+                    if not query_embedding:
+                        raise RuntimeError("Failed to create embedding for query")
+                    # k covers every page so skip walks the same fused ranking
+                    search_params["vector_queries"] = [self._build_vector_query(query_embedding, top)]
+                if query_type == "hybrid":
+                    search_params.update({
+                        "query_type": QueryType.SEMANTIC,
+                        "semantic_configuration_name": semantic_configuration_name,
+                        "query_caption": QueryCaptionType.EXTRACTIVE,
+                        "query_answer": QueryAnswerType.EXTRACTIVE
+                    })
+                if checked_filters:
+                    search_params["filter"] = checked_filters
+                if select_fields:
+                    search_params["select"] = select_fields
+                prepared.update(search_params)
+            return self._get_search_client().search(**prepared, top=page_top, skip=skip)
+        
+        return SearchResultStream(query_type, query, filters, open_page, top, self.stream_page_size)
+    
+    def iter_keyword_search(self,
+                            query: str,
+                            filters: Optional[str] = None,
+                            top: int = 100,
+                            select_fields: Optional[List[str]] = None) -> SearchResultStream:
+        """Lazy keyword_search: pages of SEARCH_STREAM_PAGE_SIZE are requested as the stream is iterated (not cached)"""
+        return self._stream("keyword", query, filters, top, select_fields)
+    
+    def iter_vector_search(self,
+                           query: str,
+                           filters: Optional[str] = None,
+                           top: int = 100,
+                           select_fields: Optional[List[str]] = None) -> SearchResultStream:
+        """Lazy vector_search: pages of SEARCH_STREAM_PAGE_SIZE are requested as the stream is iterated"""
+        return self._stream("vector", query, filters, top, select_fields)
+    
+    def iter_hybrid_search(self,
+                           query: str,
+                           filters: Optional[str] = None,
+                           top: int = 100,
+                           select_fields: Optional[List[str]] = None,
+                           semantic_configuration_name: str = "default-semantic-config") -> SearchResultStream:
+        """Lazy hybrid_search: pages of SEARCH_STREAM_PAGE_SIZE are requested as the stream is iterated"""
+        return self._stream("hybrid", query, filters, top, select_fields, semantic_configuration_name)
+    
+    def iter_filter_search(self,
+                           filters: str,
+                           top: int = 100,
+                           select_fields: Optional[List[str]] = None) -> SearchResultStream:
+        """Lazy filter_search: pages of SEARCH_STREAM_PAGE_SIZE are requested as the stream is iterated (not cached)"""
+        return self._stream("filter", "*", filters, top, select_fields)
+    
+    def multi_search(self,
+                     requests: List[Dict[str, Any]],
+                     max_parallel: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Run several searches as one fan-out
+        
+        Query texts of vector and hybrid requests are embedded with a single
+        batched embeddings call, then the searches run concurrently, so the
+        batch takes about as long as its slowest search.
+        
+        Args:
+            requests: One dict per search with "query_type" ("hybrid" (default),
+                "vector", "keyword" or "filter") and that method's keyword
+                arguments, e.g. {"query": "devops", "filters": "TEBStatus eq 'TEB Approved'"}
+            max_parallel: Searches in flight at once (default: MULTI_SEARCH_MAX_PARALLEL)
+            
+        Returns:
+            One result per request, in request order, each with "elapsed_seconds"
+        """
+        methods = {
+            "hybrid": self.hybrid_search,
+            "vector": self.vector_search,
+            "keyword": self.keyword_search,
+            "filter": self.filter_search
+        }
+        calls = []
+        for request in requests:
+            params = dict(request)
+            query_type = params.pop("query_type", "hybrid")
+            if query_type not in methods:
+                raise ValueError(f"Unsupported query_type '{query_type}', expected one of {list(methods)}")
+            calls.append((methods[query_type], params))
+        if not calls:
+            return []
+        
+        embedded = [params for method, params in calls
+                    if method in (self.hybrid_search, self.vector_search) and "query_embedding" not in params]
+        if embedded:
+            for params, embedding in zip(embedded, self.create_embeddings([params["query"] for params in embedded])):
+                params["query_embedding"] = embedding
+        
+        def run(call):
+            method, params = call
+            started = time.perf_counter()
+            result = method(**params)
+            result["elapsed_seconds"] = round(time.perf_counter() - started, 4)
+            return result
+        
+        workers = max(1, min(max_parallel or self.multi_search_max_parallel, len(calls)))
+        if workers == 1:
+            return [run(call) for call in calls]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="multi-search") as executor:
+            return list(executor.map(run, calls))
+    
     def search_with_examples(self):
         """Demonstrate various search capabilities with examples"""
         print("Azure AI Search Examples")
@@ -0,0 +1,402 @@
+"""
+Blue/Green Index Registry
+Builds versioned search indexes (technology-tools-index-vN), validates them
+and atomically repoints the serving name, so searches never hit a missing index
+"""
+
+import copy
+import json
+import os
+import re
+import time
+from typing import List, Dict, Any, Optional, Callable
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_INDEX_ALIAS = "technology-tools-index"
+ALIAS_API_VERSION = "2024-05-01-preview"
+
+
+class IndexPointer:
+    """
+    JSON file that maps the logical index name to the serving index generation
+
+    Writers replace the file atomically; readers re-read it only when its
+    modification time changes, so resolving on every query is cheap.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("INDEX_POINTER_PATH", ".cache/index_pointer.json")
+        self._cached_mtime = None
+        self._cached_state: Dict[str, Any] = {}
+
+    def read(self) -> Dict[str, Any]:
+        """Return the pointer state, or an empty dict when nothing has been published"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._cached_mtime = None
+            self._cached_state = {}
+            return {}
+
+        if mtime != self._cached_mtime:
+            try:
+                with open(self.path, 'r') as f:
+                    self._cached_state = json.load(f)
+                self._cached_mtime = mtime
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Error reading index pointer: {str(e)}")
+        return self._cached_state
+
+    def resolve(self, alias: str) -> str:
+        """Serving index name for alias (the alias itself if no generation was published)"""
+        entry = self.read().get("aliases", {}).get(alias)
+        return entry["index_name"] if entry else alias
+
+    def generation(self, alias: str) -> int:
+        """Generation number currently served for alias (0 if none)"""
+        entry = self.read().get("aliases", {}).get(alias)
+        return entry["generation"] if entry else 0
+
+    def publish(self, alias: str, index_name: str, generation: int):
+        """Atomically point alias at index_name"""
+        state = copy.deepcopy(self.read())
+        aliases = state.setdefault("aliases", {})
+        previous = aliases.get(alias)
+        aliases[alias] = {
+            "index_name": index_name,
+            "generation": generation,
+            "previous_index_name": previous["index_name"] if previous else None,
+            "updated_at": time.time()
+        }
+        self._write(state)
+
+    def content_version(self, alias: str) -> int:
+        """Counter bumped after every completed ingestion into alias (0 if none)"""
+        return self.read().get("content_versions", {}).get(alias, 0)
+
+    def bump_content_version(self, alias: str) -> int:
+        """Record that alias's documents changed; result caches keyed on the version go stale"""
+        state = copy.deepcopy(self.read())
+        versions = state.setdefault("content_versions", {})
+        versions[alias] = versions.get(alias, 0) + 1
+        self._write(state)
+        return versions[alias]
+
+    def _write(self, state: Dict[str, Any]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def alias_mode_enabled() -> bool:
+    """Whether INDEX_POINTER_MODE=alias, i.e. a service-side alias names the serving generation"""
+    return os.getenv("INDEX_POINTER_MODE", "file").lower() == "alias"
+
+
+def resolve_serving_index(alias: str = DEFAULT_INDEX_ALIAS, pointer: Optional[IndexPointer] = None) -> str:
+    """
+    Index name a search client should query for alias
+
+    With INDEX_POINTER_MODE=alias the service-side alias is queried directly;
+    otherwise the local pointer file is consulted. In alias mode the result
+    is the alias itself, so callers cannot tell from it whether blue/green
+    is in use; check alias_mode_enabled() for that.
+    """
+    if alias_mode_enabled():
+        return alias
+    return (pointer or IndexPointer()).resolve(alias)
+
+
+class AzureSearchIndexBackend:
+    """Index management operations against an Azure AI Search service"""
+
+    def __init__(self, endpoint: str, key: str, api_version: str = "2023-11-01"):
+        self.endpoint = endpoint.rstrip("/")
+        self.key = key
+        self.api_version = api_version
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {'Content-Type': 'application/json', 'api-key': self.key}
+
+    def _search_client(self, index_name: str):
+        from azure.search.documents import SearchClient
+        from azure.core.credentials import AzureKeyCredential
+        return SearchClient(
+            endpoint=self.endpoint,
+            index_name=index_name,
+            credential=AzureKeyCredential(self.key)
+        )
+
+    def list_index_names(self) -> List[str]:
+        url = f"{self.endpoint}/indexes?api-version={self.api_version}&$select=name"
+        response = requests.get(url, headers=self._headers)
+        response.raise_for_status()
+        return [index["name"] for index in response.json().get("value", [])]
+
+    def create_index(self, schema: Dict[str, Any]):
+        url = f"{self.endpoint}/indexes?api-version={self.api_version}"
+        response = requests.post(url, headers=self._headers, json=schema)
+        if response.status_code not in (201, 409):
+            raise Exception(f"Failed to create index '{schema['name']}': {response.text}")
+
+    def delete_index(self, index_name: str):
+        url = f"{self.endpoint}/indexes/{index_name}?api-version={self.api_version}"
+        response = requests.delete(url, headers=self._headers)
+        if response.status_code not in (204, 404):
+            raise Exception(f"Failed to delete index '{index_name}': {response.text}")
+
+    def upload_documents(self, index_name: str, documents: List[Dict[str, Any]]) -> List[str]:
+        from document_uploader import PayloadAwareUploader
+        report = PayloadAwareUploader(self._search_client(index_name)).upload(documents)
+        return report["failed_keys"]
+
+    def document_count(self, index_name: str) -> int:
+        return self._search_client(index_name).get_document_count()
+
+    def search(self, index_name: str, search_text: str, top: int = 1) -> List[Dict[str, Any]]:
+        results = self._search_client(index_name).search(search_text=search_text, top=top)
+        return [dict(result) for result in results]
+
+    def set_alias(self, alias: str, index_name: str):
+        """Create or repoint a service-side index alias"""
+        url = f"{self.endpoint}/aliases/{alias}?api-version={ALIAS_API_VERSION}"
+        response = requests.put(url, headers=self._headers, json={"name": alias, "indexes": [index_name]})
+        if response.status_code not in (200, 201):
+            raise Exception(f"Failed to point alias '{alias}' at '{index_name}': {response.text}")
+
+
+class InMemorySearchBackend:
+    """
+    Local stand-in for the search service used to exercise rebuild and flip
+    logic offline. Search is a plain case-insensitive substring match.
+    """
+
+    def __init__(self):
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self.aliases: Dict[str, str] = {}
+
+    def list_index_names(self) -> List[str]:
+        return list(self.indexes)
+
+    def create_index(self, schema: Dict[str, Any]):
+        self.indexes.setdefault(schema["name"], {"schema": schema, "documents": {}})
+
+    def delete_index(self, index_name: str):
+        self.indexes.pop(index_name, None)
+
+    def upload_documents(self, index_name: str, documents: List[Dict[str, Any]]) -> List[str]:
+        store = self.indexes[index_name]["documents"]
+        for doc in documents:
+            store[doc["id"]] = dict(doc)
+        return []
+
+    def document_count(self, index_name: str) -> int:
+        return len(self.indexes[index_name]["documents"])
+
+    def search(self, index_name: str, search_text: str, top: int = 1) -> List[Dict[str, Any]]:
+        index_name = self.aliases.get(index_name, index_name)
+        documents = list(self.indexes[index_name]["documents"].values())
+        if search_text and search_text != "*":
+            needle = search_text.lower()
+            documents = [
+                doc for doc in documents
+                if any(needle in str(value).lower() for value in doc.values() if isinstance(value, str))
+            ]
+        return documents[:top]
+
+    def set_alias(self, alias: str, index_name: str):
+        # As in the service, an alias cannot share its name with an index
+        if alias in self.indexes:
+            raise Exception(f"Failed to point alias '{alias}' at '{index_name}': an index named '{alias}' exists")
+        self.aliases[alias] = index_name
+
+
+class BlueGreenIndexManager:
+    """
+    Rebuilds an index into a new generation and flips the serving name to it
+
+    The flow is: create <alias>-v<N>, upload, wait for the document count
+    to reach the number of source documents, run a smoke query, publish the
+    pointer (and service alias when enabled), then delete generations beyond
+    keep_generations. A failed validation, including an empty generation,
+    deletes the new generation and leaves the serving index untouched.
+
+    A service alias cannot take the name of an existing index, so with
+    use_service_alias a rebuild refuses to start while a legacy index named
+    like the alias exists, unless migrate_legacy_index is passed: the
+    legacy index is then deleted right before the alias is created, after
+    the new generation has been validated.
+    """
+
+    def __init__(self,
+                 backend,
+                 alias: str = DEFAULT_INDEX_ALIAS,
+                 schema_path: str = "azure_search_index_schema.json",
+                 pointer: Optional[IndexPointer] = None,
+                 use_service_alias: Optional[bool] = None,
+                 keep_generations: int = 2,
+                 vector_settings=None,
+                 count_timeout: float = 120.0,
+                 poll_interval: float = 2.0):
+        """
+        Args:
+            backend: AzureSearchIndexBackend or InMemorySearchBackend
+            alias: Logical index name clients query
+            schema_path: Index schema used for every generation
+            pointer: Pointer file published on flip
+            use_service_alias: Also repoint a service-side alias (default: INDEX_POINTER_MODE=alias)
+            keep_generations: Generations to retain, including the serving one
+            vector_settings: VectorSettings applied to the schema of every generation
+            count_timeout: Seconds to wait for the document count to converge
+            poll_interval: Seconds between document count checks
+        """
+        self.backend = backend
+        self.alias = alias
+        self.schema_path = schema_path
+        self.pointer = pointer or IndexPointer()
+        if use_service_alias is None:
+            use_service_alias = alias_mode_enabled()
+        self.use_service_alias = use_service_alias
+        self.keep_generations = max(1, keep_generations)
+        self.vector_settings = vector_settings
+        self.count_timeout = count_timeout
+        self.poll_interval = poll_interval
+        self._generation_pattern = re.compile(rf"^{re.escape(alias)}-v(\d+)$")
+
+    def list_generations(self) -> Dict[int, str]:
+        """Existing generations of this alias, keyed by generation number"""
+        generations = {}
+        for name in self.backend.list_index_names():
+            match = self._generation_pattern.match(name)
+            if match:
+                generations[int(match.group(1))] = name
+        return generations
+
+    def load_schema(self, index_name: str) -> Dict[str, Any]:
+        with open(self.schema_path, 'r') as f:
+            schema = json.load(f)
+        if self.vector_settings:
+            schema = self.vector_settings.apply_to_schema(schema)
+        schema["name"] = index_name
+        return schema
+
+    def _wait_for_document_count(self, index_name: str, expected: int) -> int:
+        deadline = time.monotonic() + self.count_timeout
+        count = self.backend.document_count(index_name)
+        while count < expected and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            count = self.backend.document_count(index_name)
+        return count
+
+    def rebuild(self,
+                documents: Optional[List[Dict[str, Any]]] = None,
+                smoke_query: str = "*",
+                upload: Optional[Callable[[str, List[Dict[str, Any]]], List[str]]] = None,
+                populate: Optional[Callable[[str], Dict[str, int]]] = None,
+                resume_index_name: Optional[str] = None,
+                migrate_legacy_index: bool = False) -> Dict[str, Any]:
+        """
+        Build a new generation and make it the serving index
+
+        Args:
+            documents: Fully embedded documents to index
+            smoke_query: Query that must return at least one document
+            upload: Optional uploader(index_name, documents) -> failed keys
+            populate: Alternative to documents: fills the new index itself and
+                returns {"rows": source rows read, "failed": rows not indexed},
+                e.g. a streaming pipeline
+            resume_index_name: Continue filling a generation left by an interrupted rebuild
+            migrate_legacy_index: Delete an index named like the alias so the service alias can replace it
+
+        Returns:
+            Summary of the rebuild and flip
+        """
+        legacy_index = self.use_service_alias and self.alias in self.backend.list_index_names()
+        if legacy_index and not migrate_legacy_index:
+            raise Exception(f"An index named '{self.alias}' exists, so the service alias '{self.alias}' cannot be "
+                            f"created; rerun with migrate_legacy_index (data_ingestion.py --migrate-legacy-index) to replace it")
+
+        previous_index = self.pointer.resolve(self.alias)
+        resume_match = self._generation_pattern.match(resume_index_name or "")
+        if resume_match and resume_index_name in self.backend.list_index_names():
+            generation = int(resume_match.group(1))
+            index_name = resume_index_name
+            print(f"Resuming generation {generation} in '{index_name}'")
+        else:
+            generations = self.list_generations()
+            generation = max([self.pointer.generation(self.alias), *generations.keys()], default=0) + 1
+            index_name = f"{self.alias}-v{generation}"
+            print(f"Building generation {generation} into '{index_name}'")
+            self.backend.create_index(self.load_schema(index_name))
+
+        # An interrupted or partial upload keeps the generation so the rebuild can resume
+        if populate:
+            outcome = populate(index_name)
+            expected, failed = outcome["rows"], outcome["failed"]
+        else:
+            failed = len((upload or self.backend.upload_documents)(index_name, documents))
+            expected = len(documents)
+        if failed:
+            raise Exception(f"{failed} documents were not indexed into '{index_name}'; "
+                            f"'{previous_index}' is still serving")
+
+        try:
+            if not expected:
+                raise Exception("No source documents; an empty generation is never published")
+
+            count = self._wait_for_document_count(index_name, expected)
+            if count != expected:
+                raise Exception(f"'{index_name}' holds {count} documents, expected {expected}")
+
+            if not self.backend.search(index_name, smoke_query, top=1):
+                raise Exception(f"Smoke query '{smoke_query}' returned no results from '{index_name}'")
+
+        except Exception as e:
+            print(f"Validation of '{index_name}' failed, keeping '{previous_index}': {str(e)}")
+            self.backend.delete_index(index_name)
+            raise
+
+        if self.use_service_alias:
+            if legacy_index:
+                # Queries fail only between this delete and the alias creation
+                print(f"Deleting legacy index '{self.alias}' so the alias can take its name")
+                self.backend.delete_index(self.alias)
+                previous_index = f"{self.alias} (legacy index)"
+            self.backend.set_alias(self.alias, index_name)
+        self.pointer.publish(self.alias, index_name, generation)
+        print(f"'{self.alias}' now serves '{index_name}' (previously '{previous_index}')")
+
+        removed = self.garbage_collect()
+        return {
+            "alias": self.alias,
+            "index_name": index_name,
+            "generation": generation,
+            "previous_index_name": previous_index,
+            "document_count": count,
+            "deleted_generations": removed
+        }
+
+    def garbage_collect(self) -> List[str]:
+        """Delete old generations, never touching the serving one"""
+        serving = self.pointer.resolve(self.alias)
+        generations = self.list_generations()
+        keep = set(sorted(generations, reverse=True)[:self.keep_generations])
+
+        removed = []
+        for generation, name in generations.items():
+            if generation in keep or name == serving:
+                continue
+            try:
+                self.backend.delete_index(name)
+                removed.append(name)
+                print(f"Deleted old generation '{name}'")
+            except Exception as e:
+                print(f"Could not delete old generation '{name}': {str(e)}")
+        return removed
@@ -0,0 +1,200 @@
+"""
+Ingestion Journal
+Durable SQLite record of an ingestion run's embedded vectors and uploaded
+documents, so an interrupted run can resume without redoing finished work
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+def fingerprint_file(path: str) -> str:
+    """SHA-256 of a file's contents, used to match a resume to the same CSV"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionJournal:
+    """
+    Journal of ingestion runs
+
+    Each run records which documents were embedded (with their vectors) and
+    which were indexed. A run stays resumable until it is marked completed;
+    its document and batch rows are then deleted, so the journal only grows
+    with unfinished runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                mode TEXT NOT NULL,
+                csv_fingerprint TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                target_index TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                run_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector BLOB,
+                uploaded INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_id, doc_id)
+            );
+            CREATE TABLE IF NOT EXISTS batches (
+                run_id TEXT NOT NULL,
+                uploaded_at REAL NOT NULL,
+                documents INTEGER NOT NULL
+            );
+            """
+        )
+        self._connection.commit()
+        self.run_id: Optional[str] = None
+
+    def start_run(self, mode: str, csv_fingerprint: str, settings: str, target_index: str) -> str:
+        """Begin a new run; earlier unfinished runs of the same mode are abandoned"""
+        now = time.time()
+        run_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute(
+                "UPDATE runs SET status = 'abandoned', updated_at = ? WHERE mode = ? AND status != 'completed'",
+                (now, mode)
+            )
+            for table in ("documents", "batches"):
+                self._connection.execute(
+                    f"DELETE FROM {table} WHERE run_id IN (SELECT run_id FROM runs WHERE status = 'abandoned')"
+                )
+            self._connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+                (run_id, mode, csv_fingerprint, settings, target_index, now, now)
+            )
+            self._connection.commit()
+        self.run_id = run_id
+        return run_id
+
+    def find_resumable_run(self, mode: str, csv_fingerprint: str, settings: str) -> Optional[Dict[str, Any]]:
+        """Most recent unfinished run of mode for the same CSV contents and vector settings"""
+        with self._lock:
+            row = self._connection.execute(
+                """
+                SELECT run_id, target_index, started_at FROM runs
+                WHERE mode = ? AND csv_fingerprint = ? AND settings = ? AND status IN ('running', 'failed')
+                ORDER BY started_at DESC LIMIT 1
+                """,
+                (mode, csv_fingerprint, settings)
+            ).fetchone()
+        if not row:
+            return None
+        return {"run_id": row[0], "target_index": row[1], "started_at": row[2]}
+
+    def resume_run(self, run_id: str):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE runs SET status = 'running', updated_at = ? WHERE run_id = ?",
+                (time.time(), run_id)
+            )
+            self._connection.commit()
+        self.run_id = run_id
+
+    def finish_run(self, status: str = "completed"):
+        """Mark the current run completed (or failed, which keeps it resumable)"""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), self.run_id)
+            )
+            if status == "completed":
+                # Documents and batches are only needed while a run can still resume
+                self._connection.execute("DELETE FROM documents WHERE run_id = ?", (self.run_id,))
+                self._connection.execute("DELETE FROM batches WHERE run_id = ?", (self.run_id,))
+            self._connection.commit()
+
+    def uploaded_hashes(self) -> Dict[str, str]:
+        """Content hash of every document indexed by the current run"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT doc_id, content_hash FROM documents WHERE run_id = ? AND uploaded = 1",
+                (self.run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def get_vectors(self, documents: List[Dict[str, Any]], hashes: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """Journaled vectors for documents whose content is unchanged"""
+        ids = [doc["id"] for doc in documents]
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"""
+                    SELECT doc_id, content_hash, vector FROM documents
+                    WHERE run_id = ? AND vector IS NOT NULL AND doc_id IN ({placeholders})
+                    """,
+                    [self.run_id, *chunk]
+                ).fetchall()
+                for doc_id, content_hash, blob in rows:
+                    if hashes.get(doc_id) == content_hash:
+                        found[doc_id] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def record_embedded(self, documents: List[Dict[str, Any]], hashes: Dict[str, str]):
+        rows = [
+            (self.run_id, doc["id"], hashes[doc["id"]],
+             np.asarray(doc["content_vector"], dtype=np.float32).tobytes())
+            for doc in documents
+        ]
+        with self._lock:
+            self._connection.executemany(
+                """
+                INSERT INTO documents (run_id, doc_id, content_hash, vector, uploaded)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT (run_id, doc_id) DO UPDATE SET
+                    content_hash = excluded.content_hash, vector = excluded.vector
+                """,
+                rows
+            )
+            self._connection.commit()
+
+    def record_uploaded(self, documents: List[Dict[str, Any]], hashes: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                """
+                INSERT INTO documents (run_id, doc_id, content_hash, uploaded)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT (run_id, doc_id) DO UPDATE SET uploaded = 1
+                """,
+                [(self.run_id, doc["id"], hashes[doc["id"]]) for doc in documents]
+            )
+            self._connection.execute(
+                "INSERT INTO batches VALUES (?, ?, ?)", (self.run_id, now, len(documents))
+            )
+            self._connection.execute(
+                "UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, self.run_id)
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
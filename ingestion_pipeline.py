@@ -0,0 +1,216 @@
+"""
+Streaming Ingestion Pipeline
+Reads the CSV in chunks and overlaps document building, embedding and
+uploading through bounded queues so memory stays flat regardless of file size
+"""
+
+import queue
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Marks the end of a stage's output
+_END_OF_STREAM = object()
+
+
+class StreamingIngestionPipeline:
+    """
+    Three-stage CSV -> embedding -> upload pipeline
+
+    Each stage runs in its own thread and hands chunks of documents to the
+    next stage through a queue of at most queue_size chunks, so at any time
+    only a few chunks are held in memory. Vectors are kept as float32 arrays
+    and only converted to lists for the upload request being sent.
+    """
+
+    def __init__(self,
+                 ingestion,
+                 chunk_size: int = 500,
+                 queue_size: int = 2,
+                 journal=None):
+        """
+        Args:
+            ingestion: AzureSearchDataIngestion providing build, embed and upload steps
+            chunk_size: CSV rows per chunk
+            queue_size: Maximum chunks buffered between two stages
+            journal: Optional IngestionJournal with an active run; documents it
+                records as uploaded are skipped and journaled vectors are reused
+        """
+        self.ingestion = ingestion
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.journal = journal
+
+        self._stop = threading.Event()
+        self._errors: List[Exception] = []
+        self._stats_lock = threading.Lock()
+
+    def _record_error(self, stage: str, error: Exception):
+        print(f"Error in {stage} stage: {str(error)}")
+        with self._stats_lock:
+            self._errors.append(error)
+        self._stop.set()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Put with periodic checks so a failed stage does not deadlock its producer"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        while True:
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _END_OF_STREAM
+
+    def _read_stage(self, csv_file_path: str, output: queue.Queue):
+        try:
+            seen_ids = set()
+            for chunk in pd.read_csv(csv_file_path, chunksize=self.chunk_size):
+                if self._stop.is_set():
+                    break
+                documents = self.ingestion.build_documents_from_frame(chunk, seen_ids=seen_ids)
+                hashes = {doc["id"]: self.ingestion.compute_content_hash(doc) for doc in documents}
+
+                # Skip documents a resumed run already indexed with the same content
+                pending = [
+                    doc for doc in documents
+                    if self._already_uploaded.get(doc["id"]) != hashes[doc["id"]]
+                ]
+                with self._stats_lock:
+                    self.stats["rows_read"] += len(chunk)
+                    self.stats["rows_skipped"] += len(documents) - len(pending)
+                if pending and not self._put(output, (pending, hashes)):
+                    break
+        except Exception as e:
+            self._record_error("read", e)
+        finally:
+            self._put(output, _END_OF_STREAM)
+
+    def _embed_stage(self, source: queue.Queue, output: queue.Queue):
+        try:
+            while True:
+                item = self._get(source)
+                if item is _END_OF_STREAM or self._stop.is_set():
+                    break
+                documents, hashes = item
+
+                journaled = self.journal.get_vectors(documents, hashes) if self.journal else {}
+                resumed = []
+                for doc in documents:
+                    if doc["id"] in journaled:
+                        doc["content_vector"] = journaled[doc["id"]]
+                        resumed.append(doc)
+
+                embedded = self.ingestion.embed_documents(
+                    [doc for doc in documents if doc["id"] not in journaled]
+                )
+                for doc in embedded:
+                    doc["content_vector"] = np.asarray(doc["content_vector"], dtype=np.float32)
+                if self.journal and embedded:
+                    self.journal.record_embedded(embedded, hashes)
+
+                with self._stats_lock:
+                    self.stats["rows_embedded"] += len(embedded)
+                    self.stats["rows_reused_vectors"] += len(resumed)
+                    self.stats["rows_failed_embedding"] += len(documents) - len(embedded) - len(resumed)
+
+                if not self._put(output, (resumed + embedded, hashes)):
+                    break
+        except Exception as e:
+            self._record_error("embed", e)
+        finally:
+            self._put(output, _END_OF_STREAM)
+
+    def run(self,
+            csv_file_path: str,
+            upload: Callable[[List[Dict[str, Any]]], List[str]],
+            on_uploaded: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
+        """
+        Stream a CSV file into the index
+
+        Args:
+            csv_file_path: CSV to ingest
+            upload: Uploader(documents) -> keys that failed to index
+            on_uploaded: Called with the successfully indexed documents of each chunk
+
+        Returns:
+            Pipeline statistics
+        """
+        self._stop.clear()
+        self._errors = []
+        self.stats = {
+            "rows_read": 0,
+            "rows_skipped": 0,
+            "rows_embedded": 0,
+            "rows_reused_vectors": 0,
+            "rows_failed_embedding": 0,
+            "rows_uploaded": 0,
+            "rows_failed_upload": 0,
+        }
+        started = time.monotonic()
+        self._already_uploaded = self.journal.uploaded_hashes() if self.journal else {}
+
+        documents_queue = queue.Queue(maxsize=self.queue_size)
+        embedded_queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._read_stage, args=(csv_file_path, documents_queue),
+                             name="ingestion-read", daemon=True),
+            threading.Thread(target=self._embed_stage, args=(documents_queue, embedded_queue),
+                             name="ingestion-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Upload stage runs on the calling thread
+        try:
+            while True:
+                item = self._get(embedded_queue)
+                if item is _END_OF_STREAM or self._stop.is_set():
+                    break
+                documents, hashes = item
+                if not documents:
+                    continue
+
+                failed_keys = set(upload(documents))
+                uploaded = [doc for doc in documents if doc["id"] not in failed_keys]
+                if self.journal and uploaded:
+                    self.journal.record_uploaded(uploaded, hashes)
+                self.stats["rows_uploaded"] += len(uploaded)
+                self.stats["rows_failed_upload"] += len(failed_keys)
+                if on_uploaded:
+                    on_uploaded(uploaded)
+        except Exception as e:
+            self._record_error("upload", e)
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stats["elapsed_seconds"] = round(elapsed, 3)
+        self.stats["rows_per_second"] = round(self.stats["rows_uploaded"] / elapsed, 2)
+        print(f"Streaming ingestion stats: {self.stats}")
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+
+def to_upload_payload(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shallow copies of documents with float32 vectors converted to JSON-serializable lists"""
+    payload = []
+    for doc in documents:
+        vector = doc.get("content_vector")
+        if isinstance(vector, np.ndarray):
+            doc = {**doc, "content_vector": vector.tolist()}
+        payload.append(doc)
+    return payload
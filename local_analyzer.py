@@ -0,0 +1,563 @@
+"""
+Local Query Analysis Model
+CPU-only analyzer distilled from logged LLM analyses: a hashed n-gram
+linear classifier picks the shape of the analysis, facet values of the
+question fill its filter slots, and questions it is unsure about are left
+to the LLM
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import threading
+import time
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from analysis_cache import AnalysisCache
+from facet_vocabulary import FACET_FIELDS, STRUCTURAL_WORDS, FacetVocabulary, TokenTrie, tokenize
+from odata_filter import ODataFilterError, canonicalize_filter, format_literal, parse_filter
+from speculative_search import query_similarity
+
+load_dotenv()
+
+DEFAULT_MODEL_PATH = ".cache/local_analyzer.npz"
+
+# Label of questions whose LLM analysis the local model cannot reproduce
+DEFER_LABEL = "llm"
+
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def hashed_features(text: str, dimensions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    L2-normalized counts of the word unigrams, word bigrams and character
+    trigrams of text, hashed into dimensions buckets (crc32, so the buckets
+    are stable across processes)
+    """
+    tokens = tokenize(text)
+    grams = [f"w {token}" for token in tokens]
+    grams += [f"b {first} {second}" for first, second in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        grams += [f"c {padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % dimensions
+        counts[index] = counts.get(index, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    if values.size:
+        values /= np.linalg.norm(values)
+    return indices, values
+
+
+def filter_slots(filters: Optional[str]) -> Optional[Dict[str, List[str]]]:
+    """
+    Facet field -> values of a filter made of equality groups, e.g.
+    "TEBStatus eq 'TEB Approved' and (Manufacturer eq 'Google' or
+    Manufacturer eq 'Microsoft')"; {} for no filter and None for any other
+    shape (ne, not, ranges, several groups on one field)
+    """
+    if not filters or not filters.strip():
+        return {}
+    try:
+        node = parse_filter(filters)
+    except ODataFilterError:
+        return None
+
+    slots: Dict[str, List[str]] = {}
+    for group in node[1] if node[0] == "and" else [node]:
+        field = None
+        values = []
+        for alternative in group[1] if group[0] == "or" else [group]:
+            if alternative[0] == "cmp" and alternative[2] == "eq" and isinstance(alternative[3], str):
+                name, alternative_values = alternative[1], [alternative[3]]
+            elif alternative[0] == "in":
+                name, alternative_values = alternative[1], alternative[2]
+            else:
+                return None
+            if name not in FACET_FIELDS or field not in (None, name):
+                return None
+            field = name
+            values.extend(alternative_values)
+        if field in slots:
+            return None
+        slots[field] = values
+    return slots
+
+
+def fill_slots(trie: TokenTrie, tokens: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, set]]:
+    """Facet values named in the question per field, and the token positions each field's matches cover"""
+    values: Dict[str, List[str]] = {}
+    positions: Dict[str, set] = {}
+    for start, end, payloads in trie.find_all(tokens):
+        for field, value in payloads:
+            if value not in values.setdefault(field, []):
+                values[field].append(value)
+            positions.setdefault(field, set()).update(range(start, end))
+    return values, positions
+
+
+def analysis_label(question: str, analysis: Dict[str, Any], trie: TokenTrie) -> str:
+    """
+    Class of an LLM analysis: "list" ("*" query) or "search", and the facet
+    fields it filters on, e.g. "search:Manufacturer". Analyses whose filter
+    values are not exactly the facet values named in the question are
+    DEFER_LABEL, since slot filling could not reproduce them.
+    """
+    slots = filter_slots(analysis.get("filters"))
+    if slots is None:
+        return DEFER_LABEL
+    named, _ = fill_slots(trie, tokenize(question))
+    for field, values in slots.items():
+        if {value.casefold() for value in values} != {value.casefold() for value in named.get(field, [])}:
+            return DEFER_LABEL
+    mode = "list" if (analysis.get("search_query") or "").strip() in ("", "*") else "search"
+    fields = [field for field in FACET_FIELDS if field in slots]
+    return f"{mode}:{'+'.join(fields) or 'none'}"
+
+
+def learn_expansions(pairs: List[Tuple[str, str]],
+                     min_count: int = 2,
+                     min_ratio: float = 0.5,
+                     max_terms: int = 4) -> Dict[str, List[str]]:
+    """
+    Query terms the LLM adds for a question term ("pub" -> "publish",
+    "subscribe"): terms absent from the question that appear in at least
+    min_ratio of the search queries of questions containing the term
+    """
+    term_counts: Dict[str, int] = {}
+    added_counts: Dict[str, Dict[str, int]] = {}
+    for question, search_query in pairs:
+        question_terms = set(tokenize(question)) - STRUCTURAL_WORDS
+        added = set(tokenize(search_query)) - set(tokenize(question)) - STRUCTURAL_WORDS
+        for term in question_terms:
+            term_counts[term] = term_counts.get(term, 0) + 1
+            for other in added:
+                added_counts.setdefault(term, {})
+                added_counts[term][other] = added_counts[term].get(other, 0) + 1
+
+    expansions = {}
+    for term, count in term_counts.items():
+        if count < min_count:
+            continue
+        frequent = sorted(((n, other) for other, n in added_counts.get(term, {}).items() if n / count >= min_ratio),
+                          key=lambda item: (-item[0], item[1]))
+        if frequent:
+            expansions[term] = [other for _, other in frequent[:max_terms]]
+    return expansions
+
+
+def same_filters(first: Optional[str], second: Optional[str]) -> bool:
+    """Whether two filters are equivalent up to clause order, spacing and case"""
+    try:
+        return canonicalize_filter(first).casefold() == canonicalize_filter(second).casefold()
+    except ODataFilterError:
+        return False
+
+
+class LocalAnalysisModel:
+    """
+    Multinomial logistic regression over hashed n-gram features
+
+    Classes are analysis labels (see analysis_label). The model also keeps
+    the query expansions learned from the LLM's search queries. It is saved
+    as one .npz file and needs only numpy to train and serve.
+    """
+
+    def __init__(self,
+                 weights: np.ndarray,
+                 bias: np.ndarray,
+                 classes: List[str],
+                 expansions: Dict[str, List[str]],
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights
+        self.bias = bias
+        self.classes = classes
+        self.expansions = expansions
+        self.metadata = metadata or {}
+        self.dimensions = weights.shape[0]
+
+    @classmethod
+    def train(cls,
+              samples: List[Dict[str, Any]],
+              trie: TokenTrie,
+              dimensions: int = 2 ** 16,
+              epochs: int = 300,
+              learning_rate: float = 0.5,
+              l2: float = 1e-4) -> "LocalAnalysisModel":
+        """
+        Fit the classifier on logged analyses
+
+        Args:
+            samples: Dicts with question, search_query, filters and intent
+            trie: Facet value matcher used to label the samples
+            dimensions: Hash buckets
+            epochs: Full-batch Adagrad steps
+            learning_rate: Adagrad step size
+            l2: Weight decay
+        """
+        labels = [analysis_label(sample["question"], sample, trie) for sample in samples]
+        classes = sorted(set(labels))
+        targets = np.array([classes.index(label) for label in labels])
+
+        rows, columns, values = [], [], []
+        for row, sample in enumerate(samples):
+            indices, features = hashed_features(sample["question"], dimensions)
+            rows.append(np.full(indices.size, row))
+            columns.append(indices)
+            values.append(features)
+        rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+        # Only buckets that occur are trained; the others stay zero
+        used, compact = np.unique(columns, return_inverse=True)
+
+        n, k = len(samples), len(classes)
+        one_hot = np.zeros((n, k), dtype=np.float32)
+        one_hot[np.arange(n), targets] = 1.0
+        weights = np.zeros((used.size, k), dtype=np.float32)
+        bias = np.zeros(k, dtype=np.float32)
+        weight_history = np.zeros_like(weights)
+        bias_history = np.zeros_like(bias)
+        for _ in range(epochs):
+            logits = np.zeros((n, k), dtype=np.float32)
+            np.add.at(logits, rows, weights[compact] * values[:, None])
+            logits += bias
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            error = (probabilities - one_hot) / n
+
+            weight_gradient = np.zeros_like(weights)
+            np.add.at(weight_gradient, compact, error[rows] * values[:, None])
+            weight_gradient += l2 * weights
+            bias_gradient = error.sum(axis=0)
+            weight_history += weight_gradient ** 2
+            bias_history += bias_gradient ** 2
+            weights -= learning_rate * weight_gradient / (np.sqrt(weight_history) + 1e-8)
+            bias -= learning_rate * bias_gradient / (np.sqrt(bias_history) + 1e-8)
+
+        full_weights = np.zeros((dimensions, k), dtype=np.float32)
+        full_weights[used] = weights
+        search_pairs = [(sample["question"], sample["search_query"]) for sample, label in zip(samples, labels)
+                        if label.startswith("search:")]
+        metadata = {
+            "trained_at": time.time(),
+            "samples": n,
+            "label_counts": {label: labels.count(label) for label in classes},
+            "epochs": epochs
+        }
+        return cls(full_weights, bias, classes, learn_expansions(search_pairs), metadata)
+
+    def predict(self, question: str) -> Tuple[str, float]:
+        """Most likely label and its probability"""
+        indices, values = hashed_features(question, self.dimensions)
+        logits = values @ self.weights[indices] + self.bias
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+    def build_analysis(self, question: str, label: str, trie: TokenTrie) -> Optional[Dict[str, Any]]:
+        """search_query, filters and intent for a predicted label, or None when its slots cannot be filled"""
+        if label == DEFER_LABEL:
+            return None
+        mode, fields = label.split(":", 1)
+        fields = [] if fields == "none" else fields.split("+")
+
+        tokens = tokenize(question)
+        named, positions = fill_slots(trie, tokens)
+        clauses = []
+        consumed = set()
+        for field in fields:
+            values = named.get(field)
+            if not values:
+                return None
+            alternatives = [f"{field} eq {format_literal(value)}" for value in values]
+            clauses.append(alternatives[0] if len(alternatives) == 1 else f"({' or '.join(alternatives)})")
+            consumed |= positions[field]
+
+        if mode == "list":
+            search_query = "*"
+        else:
+            terms = []
+            for i, token in enumerate(tokens):
+                if i not in consumed and token not in STRUCTURAL_WORDS and token not in terms:
+                    terms.append(token)
+            if not terms:
+                return None
+            for term in list(terms):
+                terms += [other for other in self.expansions.get(term, []) if other not in terms]
+            search_query = " ".join(terms)
+
+        described = [f"{field} {' or '.join(named[field])}" for field in fields]
+        subject = "all tools" if mode == "list" else f"tools matching {search_query}"
+        return {
+            "search_query": search_query,
+            "filters": " and ".join(clauses),
+            "intent": f"List {subject}" + (f" by {', '.join(described)}" if described else "")
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            temporary_path,
+            weights=self.weights,
+            bias=self.bias,
+            classes=np.array(json.dumps(self.classes)),
+            expansions=np.array(json.dumps(self.expansions)),
+            metadata=np.array(json.dumps(self.metadata))
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalAnalysisModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["weights"],
+                data["bias"],
+                json.loads(str(data["classes"])),
+                json.loads(str(data["expansions"])),
+                json.loads(str(data["metadata"]))
+            )
+
+
+class LocalAnalyzer:
+    """
+    QueryAnalyzer stage serving the local model in-process
+
+    A question is answered locally when the predicted label is not
+    DEFER_LABEL, its probability reaches min_confidence and every filter
+    slot of the label is filled by a facet value named in the question;
+    otherwise it goes on to the LLM.
+    """
+
+    def __init__(self, model: LocalAnalysisModel, vocabulary: FacetVocabulary, min_confidence: float = 0.8):
+        self.model = model
+        self.vocabulary = vocabulary
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {"questions": 0, "answered": 0, "deferred": 0, "seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, vocabulary: FacetVocabulary) -> Optional["LocalAnalyzer"]:
+        """
+        Analyzer for the trained model, or None when disabled or not trained yet
+
+        Environment variables:
+            LOCAL_ANALYZER_ENABLED: Serve the local model when one is trained (default true)
+            LOCAL_ANALYZER_MODEL_PATH: Model file written by local_analyzer.py --train
+            LOCAL_ANALYZER_MIN_CONFIDENCE: Minimum class probability to skip the LLM
+        """
+        if os.getenv("LOCAL_ANALYZER_ENABLED", "true").lower() != "true":
+            return None
+        path = os.getenv("LOCAL_ANALYZER_MODEL_PATH", DEFAULT_MODEL_PATH)
+        if not os.path.exists(path):
+            return None
+        try:
+            model = LocalAnalysisModel.load(path)
+        except Exception as e:
+            print(f"Error loading local analysis model from {path}: {str(e)}")
+            return None
+        return cls(model, vocabulary, float(os.getenv("LOCAL_ANALYZER_MIN_CONFIDENCE", "0.8")))
+
+    def analyze(self, question: str) -> Optional[Dict[str, Any]]:
+        """search_query, filters, intent and confidence, or None when the LLM should decide"""
+        started = time.perf_counter()
+        analysis = self._analyze(question)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["answered" if analysis else "deferred"] += 1
+            self._stats["seconds"] += elapsed
+        return analysis
+
+    def _analyze(self, question: str) -> Optional[Dict[str, Any]]:
+        trie = self.vocabulary.current()
+        if trie is None or not tokenize(question):
+            return None
+        label, confidence = self.model.predict(question)
+        if label == DEFER_LABEL or confidence < self.min_confidence:
+            return None
+        analysis = self.model.build_analysis(question, label, trie)
+        if analysis is None:
+            return None
+        analysis.update({"source": "local", "confidence": round(confidence, 4)})
+        return analysis
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["answer_rate"] = round(stats["answered"] / stats["questions"], 4) if stats["questions"] else 0.0
+        stats["mean_microseconds"] = round(stats.pop("seconds") / stats["questions"] * 1e6, 1) if stats["questions"] else 0.0
+        stats["min_confidence"] = self.min_confidence
+        stats["trained_samples"] = self.model.metadata.get("samples")
+        stats["trained_at"] = self.model.metadata.get("trained_at")
+        return stats
+
+
+def load_logged_analyses(cache_path: Optional[str], log_paths: List[str]) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """
+    LLM analyses from the analysis cache (every prompt namespace) and JSONL
+    analysis logs, one per normalized question with later entries winning,
+    and the LLM latencies recorded in the logs
+    """
+    samples: Dict[str, Dict[str, Any]] = {}
+    latencies = []
+
+    if cache_path and os.path.exists(cache_path):
+        connection = sqlite3.connect(cache_path)
+        try:
+            rows = connection.execute("SELECT question, analysis FROM analyses ORDER BY created_at").fetchall()
+        finally:
+            connection.close()
+        for question, analysis in rows:
+            samples[AnalysisCache.normalize(question)] = dict(json.loads(analysis), question=question)
+
+    for path in log_paths:
+        if not os.path.exists(path):
+            print(f"Analysis log {path} not found, skipped")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("latency_seconds") is not None:
+                    latencies.append(float(record["latency_seconds"]))
+                samples[AnalysisCache.normalize(record["question"])] = record
+
+    return [sample for sample in samples.values() if sample.get("question") and "search_query" in sample], latencies
+
+
+def facet_counts_from_csv(csv_path: str) -> Dict[str, Any]:
+    """get_facet_counts-shaped facet values of the catalog CSV, for training without the search service"""
+    frame = pd.read_csv(csv_path)
+    return {
+        "facet_counts": {
+            field: [{"value": value, "count": int(count)} for value, count in frame[field].value_counts().items()]
+            for field in FACET_FIELDS if field in frame.columns
+        }
+    }
+
+
+def evaluate(model: LocalAnalysisModel,
+             samples: List[Dict[str, Any]],
+             trie: TokenTrie,
+             llm_seconds: float,
+             thresholds=REPORT_THRESHOLDS) -> List[Dict[str, Any]]:
+    """
+    Accuracy against the LLM analyses and expected latency per confidence threshold
+
+    Questions below the threshold count as answered by the LLM, so
+    overall_filter_accuracy treats them as correct and their latency as
+    llm_seconds on top of the local prediction.
+    """
+    predictions = []
+    local_seconds = 0.0
+    for sample in samples:
+        started = time.perf_counter()
+        label, confidence = model.predict(sample["question"])
+        analysis = model.build_analysis(sample["question"], label, trie)
+        local_seconds += time.perf_counter() - started
+        predictions.append((label, confidence, analysis))
+    local_ms = local_seconds / len(samples) * 1000 if samples else 0.0
+
+    rows = []
+    for threshold in thresholds:
+        answered = correct_filters = correct_labels = 0
+        similarities = []
+        for sample, (label, confidence, analysis) in zip(samples, predictions):
+            if analysis is None or confidence < threshold:
+                continue
+            answered += 1
+            correct_filters += same_filters(analysis["filters"], sample.get("filters"))
+            correct_labels += label == analysis_label(sample["question"], sample, trie)
+            if analysis["search_query"] != "*":
+                similarities.append(query_similarity(analysis["search_query"], sample.get("search_query") or ""))
+        coverage = answered / len(samples) if samples else 0.0
+        rows.append({
+            "threshold": threshold,
+            "coverage": coverage,
+            "filter_accuracy": correct_filters / answered if answered else 0.0,
+            "label_accuracy": correct_labels / answered if answered else 0.0,
+            "query_similarity": statistics.mean(similarities) if similarities else 0.0,
+            "overall_filter_accuracy": (correct_filters + len(samples) - answered) / len(samples) if samples else 0.0,
+            "mean_latency_ms": local_ms + (1 - coverage) * llm_seconds * 1000
+        })
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]], samples: int, llm_seconds: float, min_confidence: float):
+    print(f"\n{samples} questions, LLM latency {llm_seconds * 1000:.0f} ms")
+    print(f"{'threshold':>9} {'coverage':>8} {'filters':>8} {'label':>8} {'query':>8} {'overall':>8} {'latency ms':>10}")
+    for row in rows:
+        marker = "  <- LOCAL_ANALYZER_MIN_CONFIDENCE" if row["threshold"] == min_confidence else ""
+        print(f"{row['threshold']:>9.2f} {row['coverage']:>8.1%} {row['filter_accuracy']:>8.1%} "
+              f"{row['label_accuracy']:>8.1%} {row['query_similarity']:>8.2f} "
+              f"{row['overall_filter_accuracy']:>8.1%} {row['mean_latency_ms']:>10.1f}{marker}")
+
+
+def main():
+    """Retrain the local analysis model from logged LLM analyses, or report on a trained one"""
+    parser = argparse.ArgumentParser(description="Train or evaluate the local query analysis model")
+    parser.add_argument("--model", default=os.getenv("LOCAL_ANALYZER_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--analysis-cache", default=os.getenv("ANALYSIS_CACHE_PATH", ".cache/analysis_cache.sqlite3"),
+                        help="Analysis cache database to read LLM analyses from")
+    parser.add_argument("--log", action="append", default=[],
+                        help="JSONL analysis log (ANALYSIS_LOG_PATH); may be repeated")
+    parser.add_argument("--csv", default="technology_standard_list.csv", help="Catalog CSV providing facet values")
+    parser.add_argument("--train", action="store_true", help="Train, report on a holdout split and save the model")
+    parser.add_argument("--report", action="store_true", help="Report on the saved model over all logged analyses")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of questions held out for the report")
+    parser.add_argument("--llm-seconds", type=float, help="LLM analysis latency (default: median of the logs, else 1.0)")
+    parser.add_argument("--dimensions", type=int, default=2 ** 16)
+    parser.add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args()
+
+    log_paths = args.log or ([os.getenv("ANALYSIS_LOG_PATH")] if os.getenv("ANALYSIS_LOG_PATH") else [])
+    samples, latencies = load_logged_analyses(args.analysis_cache, log_paths)
+    if not samples:
+        print("No logged analyses found; run the analyzer with the analysis cache or ANALYSIS_LOG_PATH first")
+        return
+    llm_seconds = args.llm_seconds or (statistics.median(latencies) if latencies else 1.0)
+    min_confidence = float(os.getenv("LOCAL_ANALYZER_MIN_CONFIDENCE", "0.8"))
+
+    vocabulary = FacetVocabulary(load_facets=lambda: facet_counts_from_csv(args.csv))
+    trie = vocabulary.current()
+    if trie is None:
+        print(f"No facet values could be read from {args.csv}")
+        return
+
+    if args.train:
+        shuffled = list(samples)
+        random.Random(0).shuffle(shuffled)
+        held_out = int(len(shuffled) * args.holdout)
+        if held_out:
+            started = time.perf_counter()
+            model = LocalAnalysisModel.train(shuffled[held_out:], trie, args.dimensions, args.epochs)
+            print(f"Trained on {len(shuffled) - held_out} questions in {time.perf_counter() - started:.1f}s, "
+                  f"holdout report:")
+            print_report(evaluate(model, shuffled[:held_out], trie, llm_seconds), held_out, llm_seconds, min_confidence)
+
+        model = LocalAnalysisModel.train(samples, trie, args.dimensions, args.epochs)
+        model.save(args.model)
+        print(f"\nSaved model trained on all {len(samples)} questions to {args.model}")
+        print(f"Labels: {model.metadata['label_counts']}")
+
+    if args.report:
+        model = LocalAnalysisModel.load(args.model)
+        print(f"Report on all logged questions ({model.metadata.get('samples')} were used for training):")
+        print_report(evaluate(model, samples, trie, llm_seconds), len(samples), llm_seconds, min_confidence)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""
+Local Hybrid Search Engine
+In-memory counterpart of HybridSearchClient over an exported snapshot of the
+index: BM25 keyword scoring, NumPy cosine vector search, reciprocal rank
+fusion and local evaluation of OData filters, with the same methods and
+result shapes as the Azure-backed client
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+import numpy as np
+from openai import AzureOpenAI
+from dotenv import load_dotenv
+
+from odata_filter import FilterValidator, compile_filter
+from query_embedding_cache import QueryEmbeddingCache
+from vector_config import VectorSettings, VECTOR_FIELD_NAME
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_SNAPSHOT_PATH = ".cache/search_snapshot.npz"
+DEFAULT_SCHEMA_PATH = "azure_search_index_schema.json"
+
+# Azure AI Search defaults: BM25 parameters, RRF constant and facet buckets
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+DEFAULT_FACET_COUNT = 10
+
+# Characters of the simple query syntax that are operators, not terms
+_QUERY_OPERATORS = re.compile(r'[+\-|"()*~^\\]')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, roughly what the standard Lucene analyzer produces"""
+    return re.findall(r"\w+", text.lower()) if text else []
+
+
+def load_schema_fields(schema_path: str = DEFAULT_SCHEMA_PATH) -> Dict[str, List[str]]:
+    """Searchable, facetable and retrievable field names from the index schema"""
+    with open(schema_path, 'r') as f:
+        schema = json.load(f)
+    fields = [field for field in schema["fields"] if field["name"] != VECTOR_FIELD_NAME]
+    return {
+        "searchable": [field["name"] for field in fields if field.get("searchable")],
+        "facetable": [field["name"] for field in fields if field.get("facetable")],
+        "retrievable": [field["name"] for field in fields if field.get("retrievable", True)],
+    }
+
+
+class BM25Index:
+    """
+    Per-field BM25 over a fixed set of documents
+
+    Each searchable field is scored independently with its own length
+    normalization and the field scores are summed, which approximates how
+    the service combines matches across fields.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]], fields: List[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.document_count = len(documents)
+        self.k1 = k1
+        self.b = b
+        # field -> term -> (document indices, term frequencies)
+        self.postings: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {}
+        self.lengths: Dict[str, np.ndarray] = {}
+
+        for field in fields:
+            terms: Dict[str, Tuple[List[int], List[int]]] = {}
+            lengths = np.zeros(self.document_count, dtype=np.float32)
+            for index, doc in enumerate(documents):
+                tokens = tokenize(str(doc.get(field) or ""))
+                lengths[index] = len(tokens)
+                for term, count in Counter(tokens).items():
+                    entry = terms.setdefault(term, ([], []))
+                    entry[0].append(index)
+                    entry[1].append(count)
+            self.postings[field] = {
+                term: (np.asarray(ids, dtype=np.int32), np.asarray(counts, dtype=np.float32))
+                for term, (ids, counts) in terms.items()
+            }
+            self.lengths[field] = lengths
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query terms (0 where nothing matched)"""
+        scores = np.zeros(self.document_count, dtype=np.float32)
+        terms = set(tokenize(_QUERY_OPERATORS.sub(" ", query)))
+        for field, postings in self.postings.items():
+            lengths = self.lengths[field]
+            average_length = max(float(lengths.mean()) if self.document_count else 0.0, 1e-9)
+            for term in terms:
+                if term not in postings:
+                    continue
+                ids, counts = postings[term]
+                idf = np.log(1 + (self.document_count - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[ids] / average_length)
+                scores[ids] += idf * counts * (self.k1 + 1) / (counts + norm)
+        return scores
+
+
+class VectorIndex:
+    """Exact cosine similarity over a normalized float32 matrix"""
+
+    def __init__(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True) if vectors.size else np.ones((0, 1))
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+
+    def similarity(self, query_vector: List[float]) -> np.ndarray:
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != self.vectors.shape[1]:
+            raise ValueError(f"Query has {query.shape[0]} dimensions, snapshot has {self.vectors.shape[1]}")
+        return self.vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> Dict[int, float]:
+    """Fused score per document index: sum of 1 / (k + rank) over the rankings it appears in"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking, 1):
+            scores[index] = scores.get(index, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def save_snapshot(path: str, documents: List[Dict[str, Any]], vectors: np.ndarray, metadata: Dict[str, Any]):
+    """Write documents (without vectors), the float32 vector matrix and metadata to one .npz file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f"{path}.tmp.npz"
+    np.savez(
+        temporary_path,
+        vectors=np.asarray(vectors, dtype=np.float32),
+        documents=np.array(json.dumps(documents)),
+        metadata=np.array(json.dumps(metadata))
+    )
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path: str) -> Tuple[List[Dict[str, Any]], np.ndarray, Dict[str, Any]]:
+    with np.load(path, allow_pickle=False) as data:
+        return (
+            json.loads(str(data["documents"])),
+            data["vectors"],
+            json.loads(str(data["metadata"]))
+        )
+
+
+def snapshot_from_index(search_client) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Read every document and its content_vector from a (sync) SearchClient"""
+    documents = []
+    vectors = []
+    for result in search_client.search(search_text="*", include_total_count=True):
+        doc = {key: value for key, value in dict(result).items() if not key.startswith("@search.")}
+        vector = doc.pop(VECTOR_FIELD_NAME, None)
+        if not vector:
+            continue
+        documents.append(doc)
+        vectors.append(vector)
+    return documents, np.asarray(vectors, dtype=np.float32)
+
+
+class LocalHybridSearchEngine:
+    """
+    Local search over an index snapshot with HybridSearchClient's interface
+
+    The snapshot is reloaded whenever its file changes. Query embeddings come
+    from embed when given (e.g. HybridSearchClient.create_embedding),
+    otherwise from Azure OpenAI with a short timeout. Without an embedding,
+    hybrid_search degrades to keyword ranking instead of failing. Semantic
+    ranking, captions and answers are service features and are not
+    reproduced; reranker fields are returned as None.
+    """
+
+    def __init__(self,
+                 snapshot_path: Optional[str] = None,
+                 schema_path: str = DEFAULT_SCHEMA_PATH,
+                 embed: Optional[Callable[[str], List[float]]] = None):
+        self.snapshot_path = snapshot_path or os.getenv("LOCAL_SEARCH_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+        self.fields = load_schema_fields(schema_path)
+        self.filter_validator = FilterValidator(schema_path, os.getenv("FILTER_VALIDATION_MODE", "repair").lower())
+        self._embed = embed
+
+        # Azure OpenAI configuration for query embeddings (used when embed is not given)
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_endpoint = os.getenv("OPENAI_ENDPOINT")
+        self.openai_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        self.vector_settings = VectorSettings.from_env()
+        self.embedding_kwargs = self.vector_settings.embedding_kwargs(self.embedding_model)
+        self.embedding_timeout = float(os.getenv("LOCAL_SEARCH_EMBEDDING_TIMEOUT_SECONDS", "2"))
+        self.openai_client = None
+        self.embedding_cache = None
+
+        self._loaded_mtime_ns = None
+        self.documents: List[Dict[str, Any]] = []
+        self.metadata: Dict[str, Any] = {}
+        self._ensure_loaded()
+        print(f"Local search engine loaded {len(self.documents)} documents from {self.snapshot_path}")
+
+    def _ensure_loaded(self):
+        """(Re)build the indexes when the snapshot file changed"""
+        mtime_ns = os.stat(self.snapshot_path).st_mtime_ns
+        if mtime_ns == self._loaded_mtime_ns:
+            return
+        documents, vectors, metadata = load_snapshot(self.snapshot_path)
+        self.keyword_index = BM25Index(documents, self.fields["searchable"])
+        self.vector_index = VectorIndex(vectors)
+        self.documents = documents
+        self.metadata = metadata
+        self._loaded_mtime_ns = mtime_ns
+
+    def create_embedding(self, text: str) -> List[float]:
+        """Create embedding for text, via embed if configured, otherwise Azure OpenAI"""
+        if self._embed is not None:
+            return self._embed(text)
+
+        if self.embedding_cache is None:
+            self.embedding_cache = QueryEmbeddingCache(
+                model=self.embedding_model,
+                dimensions=self.vector_settings.dimensions,
+                redis_url=os.getenv("QUERY_EMBEDDING_CACHE_REDIS_URL")
+            )
+        cached = self.embedding_cache.get(text)
+        if cached is not None:
+            return cached
+
+        try:
+            if self.openai_client is None:
+                self.openai_client = AzureOpenAI(
+                    api_key=self.openai_api_key,
+                    api_version=self.openai_api_version,
+                    azure_endpoint=self.openai_endpoint,
+                    timeout=self.embedding_timeout,
+                    max_retries=0
+                )
+            response = self.openai_client.embeddings.create(
+                input=text,
+                model=self.embedding_model,
+                **self.embedding_kwargs
+            )
+            embedding = response.data[0].embedding
+        except Exception as e:
+            print(f"Error creating embedding: {str(e)}")
+            return []
+
+        self.embedding_cache.put(text, embedding)
+        return embedding
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Query embedding cache hit rates (empty when embeddings come from embed)"""
+        return self.embedding_cache.stats() if self.embedding_cache else {}
+
+    def close(self):
+        if self.openai_client is not None:
+            self.openai_client.close()
+
+    def _filter_mask(self, filters: Optional[str]) -> np.ndarray:
+        predicate = compile_filter(self.filter_validator.check(filters))
+        return np.fromiter((predicate(doc) for doc in self.documents), dtype=bool, count=len(self.documents))
+
+    def _keyword_ranking(self, query: str, mask: np.ndarray) -> Tuple[List[int], np.ndarray]:
+        """Matching document indices best first, and the score array"""
+        if not query or not query.strip() or query.strip() == "*":
+            scores = np.ones(len(self.documents), dtype=np.float32)
+            return [int(i) for i in np.flatnonzero(mask)], scores
+        scores = self.keyword_index.score(query)
+        matches = np.flatnonzero(mask & (scores > 0))
+        return [int(i) for i in matches[np.argsort(-scores[matches], kind="stable")]], scores
+
+    def _vector_ranking(self, embedding: List[float], mask: np.ndarray, k: int) -> Tuple[List[int], np.ndarray]:
+        """k nearest filtered documents best first, and the service-style similarity scores"""
+        similarity = self.vector_index.similarity(embedding)
+        candidates = np.flatnonzero(mask)
+        nearest = candidates[np.argsort(-similarity[candidates], kind="stable")[:k]]
+        # Cosine similarity as the service reports it: 1 / (1 + cosine distance)
+        return [int(i) for i in nearest], 1.0 / (2.0 - similarity)
+
+    def _project(self, index: int, score: float, select_fields: Optional[List[str]]) -> Dict[str, Any]:
+        doc = self.documents[index]
+        fields = select_fields or self.fields["retrievable"]
+        result = {field: doc.get(field) for field in fields if field != VECTOR_FIELD_NAME}
+        if select_fields and VECTOR_FIELD_NAME in select_fields:
+            result[VECTOR_FIELD_NAME] = self.vector_index.vectors[index].tolist()
+        result["@search.score"] = float(score)
+        return result
+
+    def keyword_search(self,
+                       query: str,
+                       filters: Optional[str] = None,
+                       top: int = 100,
+                       select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Keyword search with optional filtering (see HybridSearchClient.keyword_search)"""
+        try:
+            self._ensure_loaded()
+            ranking, scores = self._keyword_ranking(query, self._filter_mask(filters))
+            return {
+                "query_type": "keyword",
+                "query": query,
+                "filters": filters,
+                "total_count": len(ranking),
+                "results": [self._project(i, scores[i], select_fields) for i in ranking[:top]]
+            }
+        except Exception as e:
+            print(f"Error in keyword search: {str(e)}")
+            return {"error": str(e)}
+
+    def vector_search(self,
+                      query: str,
+                      filters: Optional[str] = None,
+                      top: int = 100,
+                      select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Vector search with optional filtering (see HybridSearchClient.vector_search)"""
+        try:
+            query_embedding = self.create_embedding(query)
+            if not query_embedding:
+                return {"error": "Failed to create embedding for query"}
+
+            self._ensure_loaded()
+            ranking, scores = self._vector_ranking(query_embedding, self._filter_mask(filters), top)
+            return {
+                "query_type": "vector",
+                "query": query,
+                "filters": filters,
+                "total_count": len(ranking),
+                "results": [self._project(i, scores[i], select_fields) for i in ranking]
+            }
+        except Exception as e:
+            print(f"Error in vector search: {str(e)}")
+            return {"error": str(e)}
+
+    def hybrid_search(self,
+                      query: str,
+                      filters: Optional[str] = None,
+                      top: int = 100,
+                      select_fields: Optional[List[str]] = None,
+                      semantic_configuration_name: str = "default-semantic-config") -> Dict[str, Any]:
+        """
+        Keyword and vector rankings fused with reciprocal rank fusion
+
+        semantic_configuration_name is accepted for interface compatibility;
+        there is no local semantic reranker.
+        """
+        try:
+            self._ensure_loaded()
+            mask = self._filter_mask(filters)
+            rankings = [self._keyword_ranking(query, mask)[0]]
+
+            query_embedding = self.create_embedding(query)
+            if query_embedding:
+                rankings.append(self._vector_ranking(query_embedding, mask, top)[0])
+            else:
+                print("Warning: no query embedding; local hybrid search is using keyword ranking only")
+
+            fused = reciprocal_rank_fusion(rankings)
+            ranking = sorted(fused, key=lambda index: -fused[index])
+            results = []
+            for index in ranking[:top]:
+                result = self._project(index, fused[index], select_fields)
+                result.update({
+                    "@search.reranker_score": None,
+                    "@search.highlights": None,
+                    "@search.captions": None
+                })
+                results.append(result)
+
+            return {
+                "query_type": "hybrid",
+                "query": query,
+                "filters": filters,
+                "total_count": len(fused),
+                "results": results
+            }
+        except Exception as e:
+            print(f"Error in hybrid search: {str(e)}")
+            return {"error": str(e)}
+
+    def filter_search(self,
+                      filters: str,
+                      top: int = 100,
+                      select_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Filtered search without text query (see HybridSearchClient.filter_search)"""
+        result = self.keyword_search("*", filters=filters, top=top, select_fields=select_fields)
+        if "error" not in result:
+            result["query_type"] = "filter"
+        return result
+
+    def get_facet_counts(self,
+                         search_text: str = "*",
+                         facets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Facet counts over documents matching search_text (top 10 values per field, like the service)"""
+        try:
+            if not facets:
+                facets = ["TEBStatus", "Manufacturer", "Capabilities", "SubCapability"]
+
+            self._ensure_loaded()
+            ranking, _ = self._keyword_ranking(search_text, np.ones(len(self.documents), dtype=bool))
+
+            facet_counts = {}
+            for facet in facets:
+                # Facet expressions may carry options ("Manufacturer,count:20")
+                field, _, options = facet.partition(",")
+                count = DEFAULT_FACET_COUNT
+                match = re.search(r"count:(\d+)", options)
+                if match:
+                    count = int(match.group(1))
+                counter = Counter(self.documents[i].get(field) for i in ranking)
+                counter.pop(None, None)
+                counter.pop("", None)
+                ordered = sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+                facet_counts[field] = [{"value": value, "count": n} for value, n in ordered[:count]]
+
+            return {
+                "query_type": "facets",
+                "search_text": search_text,
+                "facets": facets,
+                "total_count": len(ranking),
+                "facet_counts": facet_counts
+            }
+        except Exception as e:
+            print(f"Error getting facet counts: {str(e)}")
+            return {"error": str(e)}
+
+
+def main():
+    """Export a snapshot of the served index, or query an existing snapshot"""
+    parser = argparse.ArgumentParser(description="Export or query the local search snapshot")
+    parser.add_argument("--snapshot", default=os.getenv("LOCAL_SEARCH_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH))
+    parser.add_argument("--export", action="store_true", help="Export the served index to the snapshot")
+    parser.add_argument("--query", help="Run a local hybrid search against the snapshot")
+    parser.add_argument("--filters", help="OData filter for --query")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.export:
+        from hybrid_search_client import HybridSearchClient
+
+        client = HybridSearchClient()
+        documents, vectors = snapshot_from_index(client._get_search_client())
+        metadata = {
+            "index_name": client.serving_index_name,
+            "generation": client.index_pointer.generation(client.search_index_name),
+            "embedding_model": client.embedding_model,
+            "vector_settings": client.vector_settings.describe(),
+            "exported_at": time.time(),
+        }
+        save_snapshot(args.snapshot, documents, vectors, metadata)
+        print(f"Exported {len(documents)} documents from '{client.serving_index_name}' to {args.snapshot}")
+
+    if args.query:
+        engine = LocalHybridSearchEngine(snapshot_path=args.snapshot)
+        started = time.perf_counter()
+        result = engine.hybrid_search(args.query, filters=args.filters, top=args.top)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if "error" in result:
+            print(f"Error: {result['error']}")
+            return
+        print(f"{result['total_count']} matches in {elapsed_ms:.2f} ms")
+        for i, doc in enumerate(result["results"], 1):
+            print(f"  {i}. {doc.get('NameofTools')} - {doc.get('Manufacturer')} ({doc['@search.score']:.4f})")
+
+
+if __name__ == "__main__":
+    main()
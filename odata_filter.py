@@ -0,0 +1,533 @@
+"""
+OData Filter Expressions
+Parser and evaluator for the subset of Azure AI Search $filter syntax the
+query analyzer produces, so filters can be applied to documents locally and
+validated, repaired and canonicalized against the index schema before a
+search is sent
+"""
+
+import json
+import os
+import re
+import threading
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Default search.in delimiters: whitespace and comma
+DEFAULT_SEARCH_IN_DELIMITERS = " ,"
+
+COMPARISON_OPERATORS = ("eq", "ne", "gt", "ge", "lt", "le")
+
+DEFAULT_SCHEMA_PATH = "azure_search_index_schema.json"
+
+FILTER_VALIDATION_MODES = ("repair", "reject", "off")
+
+# Operators LLMs tend to emit instead of OData keywords
+_SYMBOL_OPERATORS = [("==", " eq "), ("!=", " ne "), (">=", " ge "), ("<=", " le "),
+                     ("&&", " and "), ("||", " or "), (">", " gt "), ("<", " lt ")]
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<comma>,)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:[./][A-Za-z_][A-Za-z0-9_]*)*)
+    """,
+    re.VERBOSE
+)
+
+
+class ODataFilterError(ValueError):
+    """A filter that cannot be parsed or evaluated; position is the offending character offset"""
+
+    def __init__(self, message: str, position: Optional[int] = None):
+        super().__init__(message if position is None else f"{message} at position {position}")
+        self.position = position
+
+
+def tokenize(text: str) -> List[Tuple[str, Any, int]]:
+    """Split a filter into (kind, value, position) tokens"""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ODataFilterError(f"Unexpected character {text[position]!r}", position)
+        kind = match.lastgroup
+        raw = match.group()
+        if kind == "string":
+            tokens.append(("literal", raw[1:-1].replace("''", "'"), position))
+        elif kind == "number":
+            tokens.append(("literal", float(raw) if any(c in raw for c in ".eE") else int(raw), position))
+        elif kind == "name":
+            lowered = raw.lower()
+            if lowered in ("true", "false"):
+                tokens.append(("literal", lowered == "true", position))
+            elif lowered == "null":
+                tokens.append(("literal", None, position))
+            elif lowered in ("and", "or", "not") + COMPARISON_OPERATORS or lowered == "search.in":
+                tokens.append(("keyword", lowered, position))
+            else:
+                tokens.append(("name", raw, position))
+        elif kind != "space":
+            tokens.append((kind, raw, position))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser producing a tuple AST:
+
+        ("or", [node, ...]) | ("and", [node, ...]) | ("not", node)
+        ("cmp", field, operator, value) | ("in", field, [value, ...])
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.index = 0
+
+    def peek(self) -> Optional[Tuple[str, Any, int]]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def advance(self) -> Tuple[str, Any, int]:
+        token = self.peek()
+        if token is None:
+            raise ODataFilterError("Unexpected end of filter", len(self.text))
+        self.index += 1
+        return token
+
+    def expect(self, kind: str, value: Any = None) -> Tuple[str, Any, int]:
+        token = self.advance()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ODataFilterError(f"Expected {value or kind}, found {token[1]!r}", token[2])
+        return token
+
+    def accept_keyword(self, value: str) -> bool:
+        token = self.peek()
+        if token and token[0] == "keyword" and token[1] == value:
+            self.index += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise ODataFilterError("Empty filter", 0)
+        node = self.parse_or()
+        token = self.peek()
+        if token is not None:
+            raise ODataFilterError(f"Unexpected {token[1]!r}", token[2])
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.accept_keyword("or"):
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.accept_keyword("and"):
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_not(self):
+        if self.accept_keyword("not"):
+            return ("not", self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.advance()
+        kind, value, position = token
+
+        if kind == "lparen":
+            node = self.parse_or()
+            self.expect("rparen")
+            return node
+
+        if kind == "keyword" and value == "search.in":
+            return self.parse_search_in()
+
+        if kind != "name":
+            raise ODataFilterError(f"Expected a field name, found {value!r}", position)
+
+        operator = self.advance()
+        if operator[0] != "keyword" or operator[1] not in COMPARISON_OPERATORS:
+            raise ODataFilterError(f"Expected a comparison operator after {value}, found {operator[1]!r}",
+                                   operator[2])
+        literal = self.advance()
+        if literal[0] != "literal":
+            raise ODataFilterError(f"Expected a literal value, found {literal[1]!r}", literal[2])
+        return ("cmp", value, operator[1], literal[1])
+
+    def parse_search_in(self):
+        self.expect("lparen")
+        field = self.expect("name")[1]
+        self.expect("comma")
+        values = self.expect("literal")
+        delimiters = DEFAULT_SEARCH_IN_DELIMITERS
+        if self.peek() and self.peek()[0] == "comma":
+            self.advance()
+            delimiters = self.expect("literal")[1]
+        self.expect("rparen")
+
+        if not isinstance(values[1], str) or not isinstance(delimiters, str) or not delimiters:
+            raise ODataFilterError("search.in expects string values and delimiters", values[2])
+        pattern = "[" + re.escape(delimiters) + "]"
+        return ("in", field, [value for value in re.split(pattern, values[1]) if value])
+
+
+def parse_filter(text: str):
+    """Parse a filter expression into its tuple AST (see _Parser)"""
+    return _Parser(text).parse()
+
+
+def _compare(actual: Any, operator: str, expected: Any) -> bool:
+    if operator == "eq":
+        return actual == expected
+    if operator == "ne":
+        return actual != expected
+    # Range comparisons never match null, as in the service
+    if actual is None or expected is None:
+        return False
+    try:
+        if operator == "gt":
+            return actual > expected
+        if operator == "ge":
+            return actual >= expected
+        if operator == "lt":
+            return actual < expected
+        return actual <= expected
+    except TypeError:
+        return False
+
+
+def evaluate(node, document: Dict[str, Any]) -> bool:
+    """Whether document satisfies a parsed filter"""
+    kind = node[0]
+    if kind == "or":
+        return any(evaluate(child, document) for child in node[1])
+    if kind == "and":
+        return all(evaluate(child, document) for child in node[1])
+    if kind == "not":
+        return not evaluate(node[1], document)
+    if kind == "in":
+        return document.get(node[1]) in node[2]
+    _, field, operator, value = node
+    return _compare(document.get(field), operator, value)
+
+
+def compile_filter(text: Optional[str]) -> Callable[[Dict[str, Any]], bool]:
+    """Predicate for a filter expression; an empty filter matches everything"""
+    if not text or not text.strip():
+        return lambda document: True
+    node = parse_filter(text)
+    return lambda document: evaluate(node, document)
+
+
+def filter_fields(node) -> List[str]:
+    """Field names referenced by a parsed filter, in order of appearance"""
+    kind = node[0]
+    if kind in ("or", "and"):
+        return [field for child in node[1] for field in filter_fields(child)]
+    if kind == "not":
+        return filter_fields(node[1])
+    return [node[1]]
+
+
+def _literals(node) -> List[Any]:
+    """Literal values of a parsed filter, in order of appearance"""
+    kind = node[0]
+    if kind in ("or", "and"):
+        return [value for child in node[1] for value in _literals(child)]
+    if kind == "not":
+        return _literals(node[1])
+    if kind == "in":
+        return list(node[2])
+    return [node[3]]
+
+
+def format_literal(value: Any) -> str:
+    """OData literal syntax for a Python value"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def to_filter_string(node, parent: Optional[str] = None) -> str:
+    """Serialize a parsed filter, adding parentheses only where precedence needs them"""
+    kind = node[0]
+    if kind in ("or", "and"):
+        text = f" {kind} ".join(to_filter_string(child, kind) for child in node[1])
+        # "or" binds looser than "and", and anything under "not" needs grouping
+        return f"({text})" if parent == "not" or (kind == "or" and parent == "and") else text
+    if kind == "not":
+        return f"not {to_filter_string(node[1], 'not')}"
+    if kind == "in":
+        delimiter = "|" if any("," in value for value in node[2]) else ","
+        return f"search.in({node[1]}, {format_literal(delimiter.join(node[2]))}, '{delimiter}')"
+    _, field, operator, value = node
+    text = f"{field} {operator} {format_literal(value)}"
+    return f"({text})" if parent == "not" else text
+
+
+def _canonical_node(node):
+    kind = node[0]
+    if kind in ("or", "and"):
+        children = []
+        for child in (_canonical_node(child) for child in node[1]):
+            # Flatten nested groups of the same operator: (a and b) and c -> a and b and c
+            children.extend(child[1] if child[0] == kind else [child])
+        unique = {to_filter_string(child): child for child in children}
+        ordered = [unique[text] for text in sorted(unique)]
+        return ordered[0] if len(ordered) == 1 else (kind, ordered)
+    if kind == "not":
+        return ("not", _canonical_node(node[1]))
+    if kind == "in":
+        return ("in", node[1], sorted(set(node[2])))
+    return node
+
+
+def canonicalize_filter(text: Optional[str]) -> str:
+    """
+    Canonical form of a filter: normalized spacing and literals, nested
+    and/or groups flattened, duplicate clauses dropped and clauses sorted,
+    so equivalent filters compare (and cache) equal
+    """
+    if not text or not text.strip():
+        return ""
+    return to_filter_string(_canonical_node(parse_filter(text)))
+
+
+def load_filterable_fields(schema_path: str = DEFAULT_SCHEMA_PATH) -> Dict[str, Dict[str, Any]]:
+    """Field name -> {"type", "filterable"} for every field in the index schema"""
+    with open(schema_path, 'r') as f:
+        schema = json.load(f)
+    return {
+        field["name"]: {"type": field["type"], "filterable": bool(field.get("filterable"))}
+        for field in schema["fields"]
+    }
+
+
+def _field_lookup_key(name: str) -> str:
+    return re.sub(r"[_\s]", "", name).lower()
+
+
+def _repair_text(text: str) -> str:
+    """
+    Textual repairs for filters that do not parse: symbolic operators
+    become OData keywords, double-quoted strings become single-quoted
+    literals and parentheses are balanced. Quoted text is left untouched.
+    """
+    text = text.strip()
+    if len(text) > 1 and text[0] == text[-1] == '"' and "'" in text:
+        # A whole filter wrapped in double quotes
+        text = text[1:-1].strip()
+
+    parts = []
+    for segment in re.split(r"""('(?:[^']|'')*'|"[^"]*")""", text):
+        if segment.startswith("'"):
+            parts.append(segment)
+        elif segment.startswith('"'):
+            parts.append("'" + segment[1:-1].replace("'", "''") + "'")
+        else:
+            for symbol, keyword in _SYMBOL_OPERATORS:
+                segment = segment.replace(symbol, keyword)
+            parts.append(segment)
+    text = "".join(parts)
+
+    depth = 0
+    balanced = []
+    for segment in re.split(r"('(?:[^']|'')*')", text):
+        if segment.startswith("'"):
+            balanced.append(segment)
+            continue
+        for char in segment:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    continue
+                depth -= 1
+            balanced.append(char)
+    return "".join(balanced) + ")" * depth
+
+
+class FilterValidator:
+    """
+    Checks filters against the index schema before they are sent
+
+    Field names are matched case- and underscore-insensitively
+    (teb_status -> TEBStatus) and literals are coerced to the field type.
+    In "repair" mode, clauses on unknown or non-filterable fields are
+    dropped, which only ever widens the filter: a dropped clause inside an
+    "or" drops that whole group, and a "not" is dropped whenever anything
+    beneath it was dropped or repaired. Filters that do not parse are
+    retried after textual repairs. In "reject" mode any problem raises
+    ODataFilterError instead. Either way the result is canonical (see
+    canonicalize_filter), and nothing needs a network call.
+    """
+
+    def __init__(self, schema_path: str = DEFAULT_SCHEMA_PATH, mode: str = "repair"):
+        """
+        Args:
+            schema_path: Index schema JSON with field types and filterability
+            mode: repair, reject or off (filters pass through unchanged)
+        """
+        if mode not in FILTER_VALIDATION_MODES:
+            raise ValueError(f"Filter validation mode must be one of {FILTER_VALIDATION_MODES}, got '{mode}'")
+        self.mode = mode
+        self.fields = load_filterable_fields(schema_path) if mode != "off" else {}
+        self._lookup = {_field_lookup_key(name): name for name in self.fields}
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "valid": 0, "repaired": 0, "rejected": 0, "dropped_clauses": 0}
+
+    @classmethod
+    def from_env(cls) -> "FilterValidator":
+        """
+        Environment variables:
+            FILTER_VALIDATION_MODE: repair (default), reject or off
+            INDEX_SCHEMA_PATH: Index schema JSON
+        """
+        return cls(
+            schema_path=os.getenv("INDEX_SCHEMA_PATH", DEFAULT_SCHEMA_PATH),
+            mode=os.getenv("FILTER_VALIDATION_MODE", "repair").lower()
+        )
+
+    def validate(self, text: Optional[str]) -> Dict[str, Any]:
+        """
+        Validate and repair a filter
+
+        Returns:
+            {"filter": canonical filter ("" when nothing is left),
+             "repairs": [description, ...], "dropped": [clause, ...]}
+
+        Raises:
+            ODataFilterError: The filter cannot be parsed even after repairs
+
+        Dropping under "not" must drop the negation too, or the filter narrows:
+
+        >>> FilterValidator().validate("not (TEBStatus eq 'TEB Approved' and Bogus eq 'x')")["filter"]
+        ''
+        >>> FilterValidator().validate("TEBStatus eq 'TEB Approved' and not (Bogus eq 'x')")["filter"]
+        "TEBStatus eq 'TEB Approved'"
+
+        A field name that only differs in spelling keeps the negation:
+
+        >>> FilterValidator().validate("not (teb_status eq 'TEB Approved')")["filter"]
+        "not (TEBStatus eq 'TEB Approved')"
+        """
+        if not text or not text.strip():
+            return {"filter": "", "repairs": [], "dropped": []}
+
+        repairs, dropped = [], []
+        try:
+            node = parse_filter(text)
+        except ODataFilterError as e:
+            repaired_text = _repair_text(text)
+            node = parse_filter(repaired_text)
+            repairs.append(f"rewrote unparseable filter ({e}) as {repaired_text!r}")
+
+        node = self._repair_node(node, repairs, dropped)
+        canonical = to_filter_string(_canonical_node(node)) if node is not None else ""
+        return {"filter": canonical, "repairs": repairs, "dropped": dropped}
+
+    def check(self, text: Optional[str]) -> Optional[str]:
+        """
+        Filter to send: canonical and schema-valid
+
+        Raises:
+            ODataFilterError: Unparseable filter, or any problem in reject mode
+        """
+        if self.mode == "off" or not text or not text.strip():
+            return text
+
+        with self._lock:
+            self._stats["checked"] += 1
+        try:
+            report = self.validate(text)
+            problems = report["repairs"] + [f"dropped {clause}" for clause in report["dropped"]]
+            if problems and self.mode == "reject":
+                raise ODataFilterError("; ".join(problems))
+        except ODataFilterError:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise
+
+        with self._lock:
+            self._stats["repaired" if problems else "valid"] += 1
+            self._stats["dropped_clauses"] += len(report["dropped"])
+        if problems:
+            print(f"Repaired filter {text!r} -> {report['filter']!r}: {'; '.join(problems)}")
+        return report["filter"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mode"] = self.mode
+        return stats
+
+    def _resolve_field(self, name: str, repairs: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """(schema field name, None) or (None, reason it cannot be filtered)"""
+        field = name if name in self.fields else self._lookup.get(_field_lookup_key(name))
+        if field is None:
+            return None, "unknown field"
+        if not self.fields[field]["filterable"]:
+            return None, "field is not filterable"
+        if field != name:
+            repairs.append(f"field {name} -> {field}")
+        return field, None
+
+    def _coerce(self, field: str, value: Any, repairs: List[str]) -> Any:
+        if value is None or self.fields[field]["type"] != "Edm.String" or isinstance(value, str):
+            return value
+        coerced = format_literal(value) if isinstance(value, bool) else str(value)
+        repairs.append(f"{field} literal {value!r} -> {coerced!r}")
+        return coerced
+
+    def _repair_node(self, node, repairs: List[str], dropped: List[str]):
+        """Repaired node, or None when the node must be dropped (matches everything)"""
+        kind = node[0]
+        if kind == "and":
+            children = [child for child in (self._repair_node(child, repairs, dropped) for child in node[1])
+                        if child is not None]
+            if not children:
+                return None
+            return children[0] if len(children) == 1 else ("and", children)
+        if kind == "or":
+            already_dropped = len(dropped)
+            children = [self._repair_node(child, repairs, dropped) for child in node[1]]
+            if any(child is None for child in children):
+                # Report the whole group once rather than each invalid alternative
+                del dropped[already_dropped:]
+                dropped.append(f"({to_filter_string(node)}) with an invalid alternative")
+                return None
+            return ("or", children)
+        if kind == "not":
+            already_repaired, already_dropped = len(repairs), len(dropped)
+            child = self._repair_node(node[1], repairs, dropped)
+            if child is None or len(dropped) > already_dropped or _literals(child) != _literals(node[1]):
+                # Negating a widened clause or a coerced literal would narrow the filter; a field
+                # name resolved to its schema spelling names the same field and is kept
+                del repairs[already_repaired:]
+                del dropped[already_dropped:]
+                dropped.append(f"{to_filter_string(node)} with an invalid or coerced clause")
+                return None
+            return ("not", child)
+
+        field, reason = self._resolve_field(node[1], repairs)
+        if field is None:
+            dropped.append(f"{to_filter_string(node)} ({reason})")
+            return None
+        if kind == "in":
+            values = [self._coerce(field, value, repairs) for value in node[2]]
+            return ("in", field, values) if values else None
+        _, _, operator, value = node
+        return ("cmp", field, operator, self._coerce(field, value, repairs))
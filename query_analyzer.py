@@ -5,45 +5,19 @@ Uses LLM to analyze user questions and extract search parameters
 
 import os
 import json
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional
 from openai import AzureOpenAI
 from dotenv import load_dotenv
+from single_flight import SingleFlight
+from facet_vocabulary import FacetVocabulary, RuleBasedAnalyzer, NEGATION_WORDS, tokenize
+from analysis_cache import AnalysisCache, make_namespace
+from local_analyzer import LocalAnalyzer
 
 load_dotenv()
 
-class QueryAnalyzer:
-    def __init__(self):
-        # Azure AI Foundry configuration (primary for query analysis)
-        foundry_endpoint = os.getenv("AZURE_AI_FOUNDRY_ENDPOINT")
-        foundry_key = os.getenv("AZURE_AI_FOUNDRY_KEY")
-        foundry_api_version = os.getenv("AZURE_AI_FOUNDRY_API_VERSION", "2024-02-15-preview")
-        self.analysis_model = os.getenv("ANALYSIS_MODEL", "gpt-5-mini")
-        
-        # Fallback to OpenAI if Foundry not configured
-        if not foundry_endpoint or not foundry_key:
-            print("Warning: Azure AI Foundry not configured. Falling back to OpenAI.")
-            foundry_endpoint = os.getenv("OPENAI_ENDPOINT")
-            foundry_key = os.getenv("OPENAI_API_KEY")
-            foundry_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
-        
-        self.openai_client = AzureOpenAI(
-            api_key=foundry_key,
-            api_version=foundry_api_version,
-            azure_endpoint=foundry_endpoint
-        )
-    
-    def analyze_question(self, question: str) -> Dict[str, Any]:
-        """
-        Analyze user question and extract search parameters
-        
-        Args:
-            question: User's natural language question
-            
-        Returns:
-            Dictionary with search_query, filters, and intent
-        """
-        
-        analysis_prompt = """You are an expert at analyzing questions about technology tools and extracting search parameters.
+ANALYSIS_PROMPT = """You are an expert at analyzing questions about technology tools and extracting search parameters.
 
 Your task is to analyze the user's question and extract:
 1. Search keywords for hybrid search (extract key terms for semantic/vector search)
@@ -100,9 +74,176 @@ Return ONLY a JSON object with this exact format:
 
 Do not include any explanations or additional text."""
 
+class QueryAnalyzer:
+    def __init__(self,
+                 vocabulary: Optional[FacetVocabulary] = None,
+                 embed: Optional[Callable[[str], List[float]]] = None):
+        """
+        Args:
+            vocabulary: Facet values of the index; enables the rule-based fast path
+            embed: Question embedding function; enables semantic analysis cache lookups
+        """
+        # Azure AI Foundry configuration (primary for query analysis)
+        foundry_endpoint = os.getenv("AZURE_AI_FOUNDRY_ENDPOINT")
+        foundry_key = os.getenv("AZURE_AI_FOUNDRY_KEY")
+        foundry_api_version = os.getenv("AZURE_AI_FOUNDRY_API_VERSION", "2024-02-15-preview")
+        self.analysis_model = os.getenv("ANALYSIS_MODEL", "gpt-5-mini")
+        
+        # Fallback to OpenAI if Foundry not configured
+        if not foundry_endpoint or not foundry_key:
+            print("Warning: Azure AI Foundry not configured. Falling back to OpenAI.")
+            foundry_endpoint = os.getenv("OPENAI_ENDPOINT")
+            foundry_key = os.getenv("OPENAI_API_KEY")
+            foundry_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
+        
+        self.openai_client = AzureOpenAI(
+            api_key=foundry_key,
+            api_version=foundry_api_version,
+            azure_endpoint=foundry_endpoint
+        )
+        
+        # Identical questions analyzed concurrently share one LLM call
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        self.analysis_flight = SingleFlight("analyze_question")
+        
+        # Questions made only of known facet values are analyzed without the LLM
+        self.fast_path = None
+        if vocabulary is not None and os.getenv("QUERY_FAST_PATH_ENABLED", "true").lower() == "true":
+            self.fast_path = RuleBasedAnalyzer(
+                vocabulary,
+                min_confidence=float(os.getenv("QUERY_FAST_PATH_MIN_CONFIDENCE", "1.0"))
+            )
+        
+        # LLM analyses cached by question (exact, then by embedding similarity), keyed by prompt and model
+        self.vocabulary = vocabulary
+        self.analysis_cache = None
+        if os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true":
+            self.analysis_cache = AnalysisCache(
+                path=os.getenv("ANALYSIS_CACHE_PATH", ".cache/analysis_cache.sqlite3"),
+                namespace=make_namespace(ANALYSIS_PROMPT, self.analysis_model),
+                embed=embed,
+                similarity_threshold=float(os.getenv("ANALYSIS_CACHE_SIMILARITY_THRESHOLD", "0.97")),
+                guard=self._same_facet_values,
+                max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000")),
+                ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+            )
+        
+        # Model distilled from logged LLM analyses (local_analyzer.py --train); unsure questions go to the LLM
+        self.local_analyzer = LocalAnalyzer.from_env(vocabulary) if vocabulary is not None else None
+        
+        # LLM analyses appended as JSONL training data for the local model (off when unset)
+        self.analysis_log_path = os.getenv("ANALYSIS_LOG_PATH", "")
+        self._analysis_log_lock = threading.Lock()
+    
+    def close(self):
+        """Close the analysis client's connection pool and the analysis cache"""
+        self.openai_client.close()
+        if self.analysis_cache:
+            self.analysis_cache.close()
+    
+    def _same_facet_values(self, question: str, cached_question: str) -> bool:
+        """
+        Whether two similar questions name the same facet values and negations
+        
+        Embeddings of "TEB approved Google tools" and "TEB approved Microsoft
+        tools" are close, but their analyses differ, so a semantic cache hit
+        also requires matching filter vocabulary.
+        """
+        def signature(text: str):
+            tokens = tokenize(text)
+            negations = frozenset(token for token in tokens if token in NEGATION_WORDS)
+            trie = self.vocabulary.current() if self.vocabulary else None
+            if trie is None:
+                return negations, None
+            return negations, frozenset(payload for _, _, payloads in trie.find_all(tokens) for payload in payloads)
+        return signature(question) == signature(cached_question)
+    
+    def analyze_question(self, question: str) -> Dict[str, Any]:
+        """
+        Analyze user question and extract search parameters
+        
+        Args:
+            question: User's natural language question
+            
+        Returns:
+            Dictionary with search_query, filters, and intent
+        """
+        return self.analyze_without_llm(question) or self.analyze_with_llm(question)
+    
+    def analyze_without_llm(self, question: str) -> Optional[Dict[str, Any]]:
+        """Analysis from the rule fast path, the analysis cache or the local model, or None when the LLM is needed"""
+        if self.fast_path:
+            analysis = self.fast_path.analyze(question)
+            if analysis:
+                return analysis
+        
+        if self.analysis_cache:
+            cached = self.analysis_cache.get(question)
+            if cached:
+                return cached
+        
+        if self.local_analyzer:
+            analysis = self.local_analyzer.analyze(question)
+            if analysis:
+                return analysis
+        return None
+    
+    def analyze_with_llm(self, question: str) -> Dict[str, Any]:
+        """LLM analysis of the question, shared by identical concurrent questions and cached"""
+        if not self.single_flight_enabled:
+            return self._analyze_and_cache(question)
+        return self.analysis_flight.do((self.analysis_model, question.strip()),
+                                       lambda: self._analyze_and_cache(question))
+    
+    def _analyze_and_cache(self, question: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        analysis = self._analyze_question(question)
+        # Fallback analyses (LLM errors) are not worth keeping
+        if analysis.get("source") == "llm":
+            if self.analysis_cache:
+                self.analysis_cache.put(question, analysis)
+            if self.analysis_log_path:
+                self._log_analysis(question, analysis, time.perf_counter() - started)
+        return analysis
+    
+    def _log_analysis(self, question: str, analysis: Dict[str, Any], latency_seconds: float):
+        record = {
+            "question": question,
+            "search_query": analysis["search_query"],
+            "filters": analysis["filters"],
+            "intent": analysis["intent"],
+            "model": self.analysis_model,
+            "latency_seconds": round(latency_seconds, 3),
+            "logged_at": time.time()
+        }
+        try:
+            with self._analysis_log_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.analysis_log_path)), exist_ok=True)
+                with open(self.analysis_log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Error writing analysis log: {str(e)}")
+    
+    def get_analysis_cache_stats(self) -> Dict[str, Any]:
+        """Exact and semantic analysis cache hits (empty when the cache is disabled)"""
+        return self.analysis_cache.stats() if self.analysis_cache else {}
+    
+    def get_local_analyzer_stats(self) -> Dict[str, Any]:
+        """Questions answered by the local model (empty when no model is trained or it is disabled)"""
+        return self.local_analyzer.stats() if self.local_analyzer else {}
+    
+    def get_fast_path_stats(self) -> Dict[str, Any]:
+        """Questions answered by the rule-based fast path (empty when it is disabled)"""
+        return self.fast_path.stats() if self.fast_path else {}
+    
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """Calls, LLM executions and coalesced requests for analyze_question"""
+        return self.analysis_flight.stats()
+    
+    def _analyze_question(self, question: str) -> Dict[str, Any]:
         try:
             messages = [
-                {"role": "system", "content": analysis_prompt.format(question=question)},
+                {"role": "system", "content": ANALYSIS_PROMPT.format(question=question)},
                 {"role": "user", "content": f"Analyze this question: {question}"}
             ]
             
@@ -125,7 +266,8 @@ Do not include any explanations or additional text."""
             return {
                 "search_query": result.get("search_query", question),
                 "filters": result.get("filters", ""),
-                "intent": result.get("intent", "General query")
+                "intent": result.get("intent", "General query"),
+                "source": "llm"
             }
             
         except json.JSONDecodeError as e:
@@ -134,13 +276,15 @@ Do not include any explanations or additional text."""
             return {
                 "search_query": question,
                 "filters": "",
-                "intent": "General query"
+                "intent": "General query",
+                "source": "fallback"
             }
         except Exception as e:
             print(f"Error analyzing question: {str(e)}")
             return {
                 "search_query": question,
                 "filters": "",
-                "intent": "Error in analysis"
+                "intent": "Error in analysis",
+                "source": "fallback"
             }
 
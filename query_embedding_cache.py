@@ -0,0 +1,164 @@
+"""
+Query Embedding Cache
+Two-level cache of query embeddings: an in-process LRU with TTL, backed by an
+optional shared Redis tier, so repeated search strings skip the embeddings call
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    Query embedding cache keyed by (model, dimensions, normalized text)
+
+    Level 1 is a per-process OrderedDict evicted least recently used first
+    once max_entries is exceeded; entries expire after ttl_seconds. Level 2
+    is Redis (when redis_url is set), shared by every worker and expiring
+    after redis_ttl_seconds. Both store vectors as float32 bytes. A Redis
+    failure is counted and treated as a miss, never as a search error.
+    """
+
+    def __init__(self,
+                 model: str,
+                 dimensions: Optional[int] = None,
+                 max_entries: int = 10000,
+                 ttl_seconds: float = 3600,
+                 redis_url: Optional[str] = None,
+                 redis_ttl_seconds: int = 86400,
+                 redis_prefix: str = "query_embedding"):
+        """
+        Args:
+            model: Embedding model or deployment name (part of the key)
+            dimensions: Requested embedding dimensions (part of the key)
+            max_entries: Maximum vectors held in process
+            ttl_seconds: Lifetime of an in-process entry
+            redis_url: Redis connection URL for the shared tier (None = process only)
+            redis_ttl_seconds: Lifetime of a Redis entry
+            redis_prefix: Namespace for Redis keys
+        """
+        self.model = model or ""
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.redis_prefix = redis_prefix
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "redis_errors": 0,
+        }
+
+        self._redis = None
+        if redis_url:
+            # redis is only needed for the shared tier
+            import redis
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    @property
+    def redis_enabled(self) -> bool:
+        """Whether lookups may block on the shared Redis tier"""
+        return self._redis is not None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case- and whitespace-insensitive form of a query"""
+        return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+    def make_key(self, text: str) -> str:
+        """Hash of (model, dimensions, normalized text)"""
+        material = f"{self.model}\x1f{self.dimensions or 'default'}\x1f{self.normalize(text)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Cached embedding for text, or None on a miss"""
+        key = self.make_key(text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["l1_hits"] += 1
+                    return np.frombuffer(vector, dtype=np.float32).tolist()
+                del self._entries[key]
+                self._stats["expired"] += 1
+
+        vector = self._redis_get(key)
+        if vector is not None:
+            self._store(key, vector, now)
+            with self._lock:
+                self._stats["l2_hits"] += 1
+            return np.frombuffer(vector, dtype=np.float32).tolist()
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, text: str, embedding: List[float]):
+        """Cache an embedding in both tiers"""
+        if not embedding:
+            return
+        key = self.make_key(text)
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        self._store(key, vector, time.monotonic())
+
+        if self._redis is not None:
+            try:
+                self._redis.set(self._redis_key(key), vector, ex=self.redis_ttl_seconds)
+            except Exception:
+                with self._lock:
+                    self._stats["redis_errors"] += 1
+
+    def _store(self, key: str, vector: bytes, now: float):
+        with self._lock:
+            self._entries[key] = (vector, now + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.redis_prefix}:{key}"
+
+    def _redis_get(self, key: str) -> Optional[bytes]:
+        if self._redis is None:
+            return None
+        try:
+            return self._redis.get(self._redis_key(key))
+        except Exception:
+            with self._lock:
+                self._stats["redis_errors"] += 1
+            return None
+
+    def clear(self):
+        """Drop the in-process tier (Redis entries expire on their own)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts and rates per tier"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["l1_entries"] = len(self._entries)
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["l1_hit_rate"] = round(stats["l1_hits"] / lookups, 4) if lookups else 0.0
+        stats["l2_hit_rate"] = round(stats["l2_hits"] / lookups, 4) if lookups else 0.0
+        stats["hit_rate"] = round((stats["l1_hits"] + stats["l2_hits"]) / lookups, 4) if lookups else 0.0
+        stats["redis_enabled"] = self.redis_enabled
+        return stats
@@ -0,0 +1,160 @@
+"""
+Adaptive Score Cutoff
+Trims a ranked result list where relevance falls off, so fewer
+low-relevance documents are sent to the LLM
+"""
+
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANKER_SCORE_FIELD = "@search.reranker_score"
+SEARCH_SCORE_FIELD = "@search.score"
+
+
+def find_knee(scores: List[float], sensitivity: float) -> Optional[int]:
+    """
+    Index of the knee of a descending score curve (Kneedle), or None
+
+    Ranks and scores are normalized to [0, 1]; the knee is the point
+    furthest below the straight line from the first to the last score,
+    i.e. where a steep head turns into a flat tail. Curves whose furthest
+    point is within sensitivity of the line have no knee.
+    """
+    if len(scores) < 3 or scores[0] == scores[-1]:
+        return None
+    span = scores[0] - scores[-1]
+    last = len(scores) - 1
+    distances = [(1 - i / last) - (score - scores[-1]) / span for i, score in enumerate(scores)]
+    knee = max(range(len(distances)), key=distances.__getitem__)
+    return knee if distances[knee] >= sensitivity else None
+
+
+class ScoreCutoff:
+    """
+    Adaptive cutoff over search results ranked best first
+
+    Scores come from @search.reranker_score when the top result has one
+    (semantic ranking), otherwise @search.score. Results are kept up to the
+    first of:
+        - a drop between consecutive scores larger than relative_drop times the top score
+        - a score below the absolute minimum for that score field
+        - the knee of the score curve
+    and always at least min_docs and at most max_docs. Results without a
+    score (the service reranks only the top 50) are never cut by the score
+    rules; they are kept when no rule fires within the scored head.
+
+    Environment variables:
+        SCORE_CUTOFF_ENABLED: Apply the cutoff (default false; tune the thresholds on real queries first)
+        SCORE_CUTOFF_MIN_DOCS: Documents always kept
+        SCORE_CUTOFF_MAX_DOCS: Documents kept at most (0 = no limit beyond top_k)
+        SCORE_CUTOFF_RELATIVE_DROP: Largest gap between neighbours, as a fraction of the top score (0 = off)
+        SCORE_CUTOFF_MIN_RERANKER_SCORE: Minimum @search.reranker_score (0-4 scale, 0 = off)
+        SCORE_CUTOFF_MIN_SEARCH_SCORE: Minimum @search.score (0 = off)
+        SCORE_CUTOFF_KNEE_SENSITIVITY: Minimum knee prominence in [0, 1] (0 = knee detection off)
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 min_docs: int = 5,
+                 max_docs: int = 0,
+                 relative_drop: float = 0.3,
+                 min_reranker_score: float = 0.0,
+                 min_search_score: float = 0.0,
+                 knee_sensitivity: float = 0.3):
+        if min_docs < 0 or max_docs < 0:
+            raise ValueError("SCORE_CUTOFF_MIN_DOCS and SCORE_CUTOFF_MAX_DOCS must not be negative")
+        if max_docs and max_docs < min_docs:
+            raise ValueError(f"SCORE_CUTOFF_MAX_DOCS ({max_docs}) must be at least SCORE_CUTOFF_MIN_DOCS ({min_docs})")
+
+        self.enabled = enabled
+        self.min_docs = min_docs
+        self.max_docs = max_docs
+        self.relative_drop = relative_drop
+        self.min_scores = {RERANKER_SCORE_FIELD: min_reranker_score, SEARCH_SCORE_FIELD: min_search_score}
+        self.knee_sensitivity = knee_sensitivity
+
+    @classmethod
+    def from_env(cls) -> "ScoreCutoff":
+        return cls(
+            enabled=os.getenv("SCORE_CUTOFF_ENABLED", "false").lower() == "true",
+            min_docs=int(os.getenv("SCORE_CUTOFF_MIN_DOCS", "5")),
+            max_docs=int(os.getenv("SCORE_CUTOFF_MAX_DOCS", "0")),
+            relative_drop=float(os.getenv("SCORE_CUTOFF_RELATIVE_DROP", "0.3")),
+            min_reranker_score=float(os.getenv("SCORE_CUTOFF_MIN_RERANKER_SCORE", "0")),
+            min_search_score=float(os.getenv("SCORE_CUTOFF_MIN_SEARCH_SCORE", "0")),
+            knee_sensitivity=float(os.getenv("SCORE_CUTOFF_KNEE_SENSITIVITY", "0.3"))
+        )
+
+    def apply(self, documents: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Documents to keep and the cutoff decision
+
+        Returns:
+            (kept documents, {"applied", "score_field", "input_documents",
+             "kept_documents", "reason", "cutoff_score", "candidates"})
+            where candidates maps each rule that fired to its cut position and
+            "raised_to_min_docs" is set when min_docs overrode the rule
+        """
+        decision = {
+            "applied": False,
+            "score_field": None,
+            "input_documents": len(documents),
+            "kept_documents": len(documents),
+            "reason": "disabled" if not self.enabled else "none",
+            "cutoff_score": None,
+            "candidates": {}
+        }
+        if not self.enabled or not documents:
+            return documents, decision
+
+        score_field = RERANKER_SCORE_FIELD if documents[0].get(RERANKER_SCORE_FIELD) is not None \
+            else SEARCH_SCORE_FIELD
+        decision["score_field"] = score_field
+
+        # Scored head: the service leaves scores unset beyond what it reranked
+        scores = []
+        for document in documents:
+            score = document.get(score_field)
+            if score is None:
+                break
+            scores.append(float(score))
+
+        candidates = decision["candidates"]
+        if self.relative_drop > 0 and scores and scores[0] > 0:
+            for i in range(1, len(scores)):
+                if (scores[i - 1] - scores[i]) / scores[0] > self.relative_drop:
+                    candidates["relative_drop"] = i
+                    break
+        min_score = self.min_scores[score_field]
+        if min_score > 0:
+            below = next((i for i, score in enumerate(scores) if score < min_score), None)
+            if below is not None:
+                candidates["min_score"] = below
+        if self.knee_sensitivity > 0:
+            knee = find_knee(scores, self.knee_sensitivity)
+            if knee is not None:
+                candidates["knee"] = knee + 1
+
+        cut, reason = len(documents), "none"
+        if candidates:
+            reason = min(candidates, key=candidates.get)
+            cut = candidates[reason]
+        if self.max_docs and cut > self.max_docs:
+            cut, reason = self.max_docs, "max_docs"
+        if cut < min(self.min_docs, len(documents)):
+            # The rule still explains the cut; min_docs only moved it
+            cut = min(self.min_docs, len(documents))
+            decision["raised_to_min_docs"] = True
+
+        kept = documents[:cut]
+        decision.update({
+            "applied": cut < len(documents),
+            "kept_documents": len(kept),
+            "reason": reason if cut < len(documents) else "none",
+            "cutoff_score": scores[cut - 1] if 0 < cut <= len(scores) else None
+        })
+        return kept, decision
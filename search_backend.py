@@ -0,0 +1,140 @@
+"""
+Search Backend Selection
+Chooses between the Azure AI Search client, the local snapshot engine, or
+Azure with a local fallback, based on SEARCH_BACKEND
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SEARCH_BACKENDS = ("azure", "local", "fallback")
+
+
+class FallbackSearchClient:
+    """
+    Azure AI Search with the local engine as a degraded-mode fallback
+
+    Each search is sent to the primary client with a latency budget. If the
+    primary returns an error or exceeds timeout_seconds, the same call is
+    answered by the local engine and the result is marked with
+    "fallback": True. A timed-out primary call is left to finish in the
+    background.
+    """
+
+    def __init__(self, primary, fallback, timeout_seconds: float = 2.0, max_workers: int = 8):
+        """
+        Args:
+            primary: HybridSearchClient
+            fallback: LocalHybridSearchEngine
+            timeout_seconds: Latency budget for the primary before falling back
+            max_workers: Concurrent primary calls
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-primary")
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "fallback_timeouts": 0, "fallback_errors": 0}
+
+    def _call(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._stats["calls"] += 1
+        future = self._executor.submit(getattr(self.primary, name), *args, **kwargs)
+        try:
+            result = future.result(timeout=self.timeout_seconds)
+            if "error" not in result:
+                return result
+            reason = "fallback_errors"
+            print(f"Search service error in {name}; answering from the local snapshot")
+        except FutureTimeoutError:
+            reason = "fallback_timeouts"
+            print(f"Search service slower than {self.timeout_seconds}s in {name}; answering from the local snapshot")
+
+        with self._lock:
+            self._stats[reason] += 1
+        result = getattr(self.fallback, name)(*args, **kwargs)
+        result["fallback"] = True
+        return result
+
+    def keyword_search(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("keyword_search", *args, **kwargs)
+
+    def vector_search(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("vector_search", *args, **kwargs)
+
+    def hybrid_search(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("hybrid_search", *args, **kwargs)
+
+    def filter_search(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("filter_search", *args, **kwargs)
+
+    def get_facet_counts(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("get_facet_counts", *args, **kwargs)
+
+    def create_embedding(self, text: str):
+        return self.primary.create_embedding(text)
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        return self.primary.get_embedding_cache_stats()
+
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        return self.primary.get_single_flight_stats()
+
+    def get_filter_validation_stats(self) -> Dict[str, Any]:
+        return self.primary.get_filter_validation_stats()
+
+    def get_fallback_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        fallbacks = stats["fallback_timeouts"] + stats["fallback_errors"]
+        stats["fallback_rate"] = round(fallbacks / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.primary.close()
+        self.fallback.close()
+
+
+def get_search_backend() -> str:
+    backend = os.getenv("SEARCH_BACKEND", "azure").lower()
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"SEARCH_BACKEND must be one of {SEARCH_BACKENDS}, got '{backend}'")
+    return backend
+
+
+def create_search_client(backend: str = None):
+    """
+    Search client for the configured backend
+
+    Environment variables:
+        SEARCH_BACKEND: azure (default), local or fallback
+        LOCAL_SEARCH_SNAPSHOT_PATH: Snapshot used by local and fallback
+        SEARCH_FALLBACK_TIMEOUT_SECONDS: Latency budget before falling back
+    """
+    backend = backend or get_search_backend()
+
+    if backend == "local":
+        from local_search_engine import LocalHybridSearchEngine
+        return LocalHybridSearchEngine()
+
+    from hybrid_search_client import HybridSearchClient
+    primary = HybridSearchClient()
+    if backend == "azure":
+        return primary
+
+    # The fallback embeds queries itself with a short timeout, so a slow
+    # embeddings endpoint degrades hybrid search to keyword ranking
+    from local_search_engine import LocalHybridSearchEngine
+    return FallbackSearchClient(
+        primary,
+        LocalHybridSearchEngine(),
+        timeout_seconds=float(os.getenv("SEARCH_FALLBACK_TIMEOUT_SECONDS", "2"))
+    )
@@ -5,8 +5,9 @@ Demonstrates all search capabilities including filtering, hybrid search, and sem
 
 import os
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from hybrid_search_client import HybridSearchClient
+from search_records import SearchResultStream
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,8 +17,21 @@ class SearchExamples:
     def __init__(self):
         self.search_client = HybridSearchClient()
     
-    def print_results(self, result: Dict[str, Any], max_results: int = 3):
-        """Print search results in a formatted way"""
+    def print_results(self, result: Union[Dict[str, Any], SearchResultStream], max_results: int = 3):
+        """Print search results in a formatted way (a result dict or a lazy result stream)"""
+        if isinstance(result, SearchResultStream):
+            # One page of SEARCH_STREAM_PAGE_SIZE hits is requested and only max_results are materialized
+            documents = result.first(max_results)
+            result = {
+                "query_type": result.query_type,
+                "query": result.query,
+                "filters": result.filters,
+                "total_count": result.total_count,
+                **({"error": result.error} if result.error else {})
+            }
+        else:
+            documents = result.get('results', [])[:max_results]
+        
         if "error" in result:
             print(f"Error: {result['error']}")
             return
@@ -28,15 +42,15 @@ class SearchExamples:
         print(f"Total Results: {result.get('total_count', 0)}")
         print("-" * 50)
         
-        results = result.get('results', [])
-        for i, doc in enumerate(results[:max_results]):
+        for i, doc in enumerate(documents):
             print(f"{i+1}. {doc.get('NameofTools', 'N/A')}")
             print(f"   Manufacturer: {doc.get('Manufacturer', 'N/A')}")
             print(f"   TEB Status: {doc.get('TEBStatus', 'N/A')}")
             print(f"   Capability: {doc.get('Capabilities', 'N/A')}")
             print(f"   Sub-capability: {doc.get('SubCapability', 'N/A')}")
-            if doc.get('Description'):
-                desc = doc['Description'][:100] + "..." if len(doc['Description']) > 100 else doc['Description']
+            description = doc.get('Description')
+            if description:
+                desc = description[:100] + "..." if len(description) > 100 else description
                 print(f"   Description: {desc}")
             print()
     
@@ -47,17 +61,17 @@ class SearchExamples:
         
         # TEB Approved tools
         print("\n1. TEB Approved tools:")
-        result = self.search_client.filter_search("TEBStatus eq 'TEB Approved'")
+        result = self.search_client.iter_filter_search("TEBStatus eq 'TEB Approved'")
         self.print_results(result)
         
         # TEB Not Approved tools
         print("\n2. TEB Not Approved tools:")
-        result = self.search_client.filter_search("TEBStatus eq 'TEB Not Approved'")
+        result = self.search_client.iter_filter_search("TEBStatus eq 'TEB Not Approved'")
         self.print_results(result)
         
         # Under Review tools
         print("\n3. Under Review tools:")
-        result = self.search_client.filter_search("TEBStatus eq 'Under Review'")
+        result = self.search_client.iter_filter_search("TEBStatus eq 'Under Review'")
         self.print_results(result)
     
     def example_2_filter_by_manufacturer(self):
@@ -67,17 +81,17 @@ class SearchExamples:
         
         # Google tools
         print("\n1. Google tools:")
-        result = self.search_client.filter_search("Manufacturer eq 'Google'")
+        result = self.search_client.iter_filter_search("Manufacturer eq 'Google'")
         self.print_results(result)
         
         # Microsoft tools
         print("\n2. Microsoft tools:")
-        result = self.search_client.filter_search("Manufacturer eq 'Microsoft'")
+        result = self.search_client.iter_filter_search("Manufacturer eq 'Microsoft'")
         self.print_results(result)
         
         # Amazon tools
         print("\n3. Amazon tools:")
-        result = self.search_client.filter_search("Manufacturer eq 'Amazon'")
+        result = self.search_client.iter_filter_search("Manufacturer eq 'Amazon'")
         self.print_results(result)
     
     def example_3_filter_by_capability(self):
@@ -87,17 +101,17 @@ class SearchExamples:
         
         # Identity & Access Management tools
         print("\n1. Identity & Access Management tools:")
-        result = self.search_client.filter_search("Capabilities eq 'Identity & Access Mgmt'")
+        result = self.search_client.iter_filter_search("Capabilities eq 'Identity & Access Mgmt'")
         self.print_results(result)
         
         # DevOps tools
         print("\n2. DevOps tools:")
-        result = self.search_client.filter_search("Capabilities eq 'DevOps'")
+        result = self.search_client.iter_filter_search("Capabilities eq 'DevOps'")
         self.print_results(result)
         
         # Analytics tools
         print("\n3. Analytics tools:")
-        result = self.search_client.filter_search("Capabilities eq 'Analytics'")
+        result = self.search_client.iter_filter_search("Capabilities eq 'Analytics'")
         self.print_results(result)
     
     def example_4_hybrid_search(self):
@@ -105,25 +119,17 @@ class SearchExamples:
         print("\nEXAMPLE 4: Hybrid Search")
         print("=" * 60)
         
-        # Authentication tools
-        print("\n1. Authentication tools:")
-        result = self.search_client.hybrid_search("authentication tools")
-        self.print_results(result)
-        
-        # Pub/Sub messaging tools
-        print("\n2. Pub/Sub messaging tools:")
-        result = self.search_client.hybrid_search("pub sub messaging")
-        self.print_results(result)
-        
-        # Monitoring and observability tools
-        print("\n3. Monitoring and observability tools:")
-        result = self.search_client.hybrid_search("monitoring observability")
-        self.print_results(result)
-        
-        # Data engineering tools
-        print("\n4. Data engineering tools:")
-        result = self.search_client.hybrid_search("data engineering ETL")
-        self.print_results(result)
+        # One fan-out: the queries are embedded in a single call and searched concurrently
+        queries = [
+            ("Authentication tools", "authentication tools"),
+            ("Pub/Sub messaging tools", "pub sub messaging"),
+            ("Monitoring and observability tools", "monitoring observability"),
+            ("Data engineering tools", "data engineering ETL")
+        ]
+        results = self.search_client.multi_search([{"query": query} for _, query in queries])
+        for i, ((title, _), result) in enumerate(zip(queries, results)):
+            print(f"\n{i+1}. {title} ({result['elapsed_seconds']}s):")
+            self.print_results(result)
     
     def example_5_hybrid_search_with_filters(self):
         """Example 5: Hybrid Search with Filters"""
@@ -132,7 +138,7 @@ class SearchExamples:
         
         # TEB Approved authentication tools
         print("\n1. TEB Approved authentication tools:")
-        result = self.search_client.hybrid_search(
+        result = self.search_client.iter_hybrid_search(
             "authentication tools",
             filters="TEBStatus eq 'TEB Approved'"
         )
@@ -140,7 +146,7 @@ class SearchExamples:
         
         # Google pub/sub tools
         print("\n2. Google pub/sub tools:")
-        result = self.search_client.hybrid_search(
+        result = self.search_client.iter_hybrid_search(
             "pub sub messaging",
             filters="Manufacturer eq 'Google'"
         )
@@ -148,7 +154,7 @@ class SearchExamples:
         
         # TEB Approved DevOps tools
         print("\n3. TEB Approved DevOps tools:")
-        result = self.search_client.hybrid_search(
+        result = self.search_client.iter_hybrid_search(
             "DevOps CI/CD",
             filters="TEBStatus eq 'TEB Approved' and Capabilities eq 'DevOps'"
         )
@@ -156,7 +162,7 @@ class SearchExamples:
         
         # Under Review analytics tools
         print("\n4. Under Review analytics tools:")
-        result = self.search_client.hybrid_search(
+        result = self.search_client.iter_hybrid_search(
             "analytics data",
             filters="TEBStatus eq 'Under Review' and Capabilities eq 'Analytics'"
         )
@@ -169,17 +175,17 @@ class SearchExamples:
         
         # Search for specific tools
         print("\n1. Tools containing 'Kubernetes':")
-        result = self.search_client.keyword_search("Kubernetes")
+        result = self.search_client.iter_keyword_search("Kubernetes")
         self.print_results(result)
         
         # Search for specific capabilities
         print("\n2. Tools for 'backup and recovery':")
-        result = self.search_client.keyword_search("backup recovery")
+        result = self.search_client.iter_keyword_search("backup recovery")
         self.print_results(result)
         
         # Search for specific technologies
         print("\n3. Tools for 'machine learning':")
-        result = self.search_client.keyword_search("machine learning ML")
+        result = self.search_client.iter_keyword_search("machine learning ML")
         self.print_results(result)
     
     def example_7_vector_search(self):
@@ -189,17 +195,17 @@ class SearchExamples:
         
         # Semantic search for security tools
         print("\n1. Security and compliance tools:")
-        result = self.search_client.vector_search("security compliance governance")
+        result = self.search_client.iter_vector_search("security compliance governance")
         self.print_results(result)
         
         # Semantic search for cloud platforms
         print("\n2. Cloud platform tools:")
-        result = self.search_client.vector_search("cloud platform infrastructure")
+        result = self.search_client.iter_vector_search("cloud platform infrastructure")
         self.print_results(result)
         
         # Semantic search for data processing
         print("\n3. Data processing and analytics:")
-        result = self.search_client.vector_search("data processing analytics insights")
+        result = self.search_client.iter_vector_search("data processing analytics insights")
         self.print_results(result)
     
     def example_8_complex_filters(self):
@@ -209,28 +215,28 @@ class SearchExamples:
         
         # Multiple manufacturer filter
         print("\n1. Tools from Google OR Microsoft:")
-        result = self.search_client.filter_search(
+        result = self.search_client.iter_filter_search(
             "Manufacturer eq 'Google' or Manufacturer eq 'Microsoft'"
         )
         self.print_results(result)
         
         # Status and capability combination
         print("\n2. TEB Approved Identity & Access Management tools:")
-        result = self.search_client.filter_search(
+        result = self.search_client.iter_filter_search(
             "TEBStatus eq 'TEB Approved' and Capabilities eq 'Identity & Access Mgmt'"
         )
         self.print_results(result)
         
         # Exclude deprecated tools
         print("\n3. Non-deprecated DevOps tools:")
-        result = self.search_client.filter_search(
+        result = self.search_client.iter_filter_search(
             "Capabilities eq 'DevOps' and TEBStatus ne 'Deprecated'"
         )
         self.print_results(result)
         
         # Version filtering (if version field has numeric values)
         print("\n4. Tools with version 3.x or higher:")
-        result = self.search_client.filter_search(
+        result = self.search_client.iter_filter_search(
             "Version ge '3.0.0'"
         )
         self.print_results(result)
@@ -268,7 +274,7 @@ class SearchExamples:
         
         # Search with specific field selection
         print("\n1. TEB Approved tools (selected fields only):")
-        result = self.search_client.filter_search(
+        result = self.search_client.iter_filter_search(
             "TEBStatus eq 'TEB Approved'",
             select_fields=["NameofTools", "Manufacturer", "TEBStatus", "Capabilities"]
         )
@@ -276,7 +282,7 @@ class SearchExamples:
         
         # Hybrid search with multiple filters
         print("\n2. Google or Microsoft authentication tools:")
-        result = self.search_client.hybrid_search(
+        result = self.search_client.iter_hybrid_search(
             "authentication identity access",
             filters="(Manufacturer eq 'Google' or Manufacturer eq 'Microsoft') and Capabilities eq 'Identity & Access Mgmt'"
         )
@@ -284,7 +290,7 @@ class SearchExamples:
         
         # Search with wildcards
         print("\n3. Tools with 'Azure' in the name:")
-        result = self.search_client.keyword_search("Azure*")
+        result = self.search_client.iter_keyword_search("Azure*")
         self.print_results(result)
     
     def run_all_examples(self):
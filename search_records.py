@@ -0,0 +1,140 @@
+"""
+Search Result Records
+Compact per-hit records and lazily paged result streams, for callers that
+only need the first few hits or want to avoid a dict copy per result
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+
+# Service metadata keys and the attribute names they get on a record
+METADATA_ATTRIBUTES = {
+    "@search.score": "search_score",
+    "@search.reranker_score": "reranker_score",
+    "@search.captions": "captions",
+    "@search.highlights": "highlights",
+}
+
+
+@lru_cache(maxsize=256)
+def record_type(keys: Tuple[str, ...]) -> type:
+    """
+    Slotted namedtuple class for results with the given keys
+
+    One class is built per distinct key layout (i.e. per select list), so
+    each hit costs a tuple instead of a dict. Fields are readable as
+    attributes (record.NameofTools, record.search_score) or with
+    get(), which also accepts the original keys ("@search.score").
+    """
+    base = namedtuple("SearchRecord", [METADATA_ATTRIBUTES.get(key, key) for key in keys], rename=True)
+    positions = {key: index for index, key in enumerate(keys)}
+    positions.update({name: index for index, name in enumerate(base._fields)})
+
+    class SearchRecord(base):
+        __slots__ = ()
+
+        def get(self, key: str, default: Any = None) -> Any:
+            index = positions.get(key)
+            return default if index is None else self[index]
+
+        def to_dict(self) -> Dict[str, Any]:
+            """The result as the service returned it"""
+            return dict(zip(keys, self))
+
+    return SearchRecord
+
+
+def to_record(result: Dict[str, Any]):
+    """Compact record of one search result dict"""
+    return record_type(tuple(result))(*result.values())
+
+
+class SearchResultStream:
+    """
+    Lazily fetched search results
+
+    No request is sent until the stream is iterated or total_count is read.
+    Results are requested page_size at a time (top/skip), up to top in
+    total, and the next page is only requested once iteration reaches it,
+    so stopping early (first(n), break) skips the remaining requests and
+    their payload. Iteration yields records (see record_type). A stream can
+    be iterated once. Errors are reported through error, as with the
+    dict-returning search methods.
+    """
+
+    def __init__(self,
+                 query_type: str,
+                 query: Optional[str],
+                 filters: Optional[str],
+                 open_page: Callable[[int, int], Any],
+                 top: int,
+                 page_size: int = 10):
+        """
+        Args:
+            query_type: keyword, vector, hybrid or filter
+            query: Search text
+            filters: OData filter expression
+            open_page: open_page(skip, top) sends one search request and returns its results
+            top: Results to return at most
+            page_size: Results requested per page
+        """
+        self.query_type = query_type
+        self.query = query
+        self.filters = filters
+        self.top = top
+        self.page_size = max(1, page_size)
+        self.error: Optional[str] = None
+        self.consumed = 0
+        self.pages = 0
+        self._open_page = open_page
+        self._results = None
+
+    def _request(self, skip: int):
+        try:
+            self._results = self._open_page(skip, min(self.page_size, self.top - skip))
+            self.pages += 1
+        except Exception as e:
+            self._fail(e)
+
+    def _open(self):
+        if self._results is None:
+            self._request(0)
+
+    def _fail(self, error: Exception):
+        print(f"Error in {self.query_type} search: {str(error)}")
+        self.error = str(error)
+        self._results = []
+
+    @property
+    def total_count(self) -> int:
+        self._open()
+        if self.error:
+            return 0
+        try:
+            return self._results.get_count() or 0
+        except Exception as e:
+            self._fail(e)
+            return 0
+
+    def __iter__(self) -> Iterator:
+        self._open()
+        try:
+            while True:
+                requested = min(self.page_size, self.top - self.consumed)
+                received = 0
+                for result in self._results:
+                    received += 1
+                    self.consumed += 1
+                    yield to_record(result)
+                # A short page is the last one
+                if self.error or received < requested or self.consumed >= self.top:
+                    return
+                self._request(self.consumed)
+        except Exception as e:
+            self._fail(e)
+
+    def first(self, n: int) -> List:
+        """Up to n records; pages past the nth record are never requested"""
+        return list(islice(self, n))
@@ -0,0 +1,196 @@
+"""
+Search Result Cache
+In-process cache of search results tagged with the index content version,
+with per-entry byte accounting, size-bounded LRU eviction and
+stale-while-revalidate refreshes
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+
+from odata_filter import ODataFilterError, canonicalize_filter
+
+
+def make_result_key(query_type: str,
+                    query: Optional[str] = None,
+                    filters: Optional[str] = None,
+                    select_fields: Optional[List[str]] = None,
+                    top: Optional[int] = None,
+                    facets: Optional[List[str]] = None) -> str:
+    """
+    Canonical cache key of a search request
+
+    Whitespace in the query is collapsed, the filter is canonicalized (so
+    reordered or re-spaced filters share an entry) and field lists are sorted.
+    """
+    try:
+        canonical_filter = canonicalize_filter(filters)
+    except ODataFilterError:
+        # The service will reject it; key on the raw text so the error is not cached under a valid key
+        canonical_filter = re.sub(r"\s+", " ", filters or "").strip()
+
+    material = json.dumps([
+        query_type,
+        re.sub(r"\s+", " ", query or "").strip(),
+        canonical_filter,
+        sorted(select_fields) if select_fields else None,
+        top,
+        sorted(facets) if facets else None,
+    ])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """
+    Result cache bounded by total serialized size
+
+    Each entry carries the index version it was computed against (e.g. the
+    serving index name and its content version). An entry from another
+    version is never served. Within a version, an entry is fresh for
+    ttl_seconds; for stale_seconds after that it is still served while one
+    background refresh recomputes it. Concurrent misses for the same key
+    wait for a single computation instead of each calling the service.
+    Error results (dicts with an "error" key) are returned but not cached.
+    """
+
+    def __init__(self,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 300,
+                 stale_seconds: float = 600,
+                 refresh_workers: int = 2):
+        """
+        Args:
+            max_bytes: Maximum total serialized size of cached results
+            ttl_seconds: Age until an entry needs revalidation
+            stale_seconds: Further age during which a stale entry is served while refreshing
+            refresh_workers: Threads running background refreshes
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+
+        # key -> (result, size_bytes, version, stored_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="result-cache-refresh")
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "invalidations": 0,
+            "evictions": 0,
+            "uncacheable": 0,
+        }
+
+    def get_or_compute(self, key: str, version: Any, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Cached result for key at version, computing it on a miss
+
+        Returns a shallow copy, so callers may add keys without affecting the cache.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] != version:
+                self._discard(key)
+                self._stats["invalidations"] += 1
+                entry = None
+
+            if entry is not None:
+                age = now - entry[3]
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return dict(entry[0])
+                if age < self.ttl_seconds + self.stale_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._in_flight:
+                        self._stats["refreshes"] += 1
+                        self._in_flight[key] = self._refresher.submit(self._compute, key, version, compute)
+                    return dict(entry[0])
+                self._discard(key)
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                self._stats["misses"] += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            return dict(future.result())
+
+        try:
+            result = self._compute(key, version, compute)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return dict(result)
+
+    def _compute(self, key: str, version: Any, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Run compute, store a successful result and release waiters on key"""
+        try:
+            result = compute()
+            self._store(key, version, result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _store(self, key: str, version: Any, result: Dict[str, Any]):
+        if not isinstance(result, dict) or "error" in result:
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return
+
+        size = len(json.dumps(result, default=str).encode("utf-8"))
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return
+            self._discard(key)
+            self._entries[key] = (result, size, version, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self._stats["evictions"] += 1
+
+    def _discard(self, key: str):
+        """Remove key (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts, hit rate and memory use"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def close(self):
+        self._refresher.shutdown(wait=False)
@@ -0,0 +1,96 @@
+"""
+Single-flight Request Coalescing
+Concurrent calls with the same key share one in-flight upstream call and all
+receive its result, for both thread-based and asyncio callers
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+def _share(result: Any) -> Any:
+    # Each caller gets its own top-level dict so adding keys does not leak between callers
+    return dict(result) if isinstance(result, dict) else result
+
+
+class SingleFlight:
+    """
+    Thread-safe coalescing of identical concurrent calls
+
+    The first caller for a key runs fn; callers arriving while it runs wait
+    for and receive the same result (or exception). Nothing is cached once
+    the call finishes.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._in_flight: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                self._stats["executions"] += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            return _share(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        future.set_result(result)
+        return _share(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._in_flight)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for one event loop
+
+    The shared call runs as its own task, so a caller that is cancelled
+    (e.g. a client disconnect) does not cancel it for the other waiters.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._in_flight: Dict[Any, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self._stats["coalesced"] += 1
+        return _share(await asyncio.shield(task))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._in_flight)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
@@ -0,0 +1,110 @@
+"""
+Speculative Retrieval
+Decides whether an unfiltered search for the raw question, started while
+the question is still being analyzed, can stand in for the search of the
+analyzed query, and keeps hit-rate and latency-saved counters
+"""
+
+import os
+import threading
+from typing import Dict, Any, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from facet_vocabulary import STRUCTURAL_WORDS, tokenize
+
+load_dotenv()
+
+
+def content_tokens(text: str) -> Set[str]:
+    """Tokens of text that carry search intent"""
+    return {token for token in tokenize(text) if token not in STRUCTURAL_WORDS}
+
+
+def query_similarity(question: str, search_query: str) -> float:
+    """Jaccard similarity of the content tokens of the question and the analyzed search query"""
+    question_tokens = content_tokens(question)
+    query_tokens = content_tokens(search_query)
+    if not question_tokens or not query_tokens:
+        return 0.0
+    return len(question_tokens & query_tokens) / len(question_tokens | query_tokens)
+
+
+class SpeculativeSearch:
+    """
+    Acceptance rule and counters for speculative retrieval
+
+    When a question needs an LLM analysis (the rule fast path, analysis
+    cache and local model cannot answer it), RAGSystem starts a hybrid
+    search for the raw question, without filters, alongside the LLM call.
+    The speculative results are used when the analysis asks for no filters
+    and its search query is the question itself or shares at least
+    min_similarity of its content tokens with it (query_similarity);
+    otherwise they are discarded and the analyzed query is searched as
+    before. On a hit the overlap of search and analysis is the latency
+    saved.
+
+    Environment variables:
+        SPECULATIVE_SEARCH_ENABLED: Start the speculative search (default true)
+        SPECULATIVE_SEARCH_MIN_SIMILARITY: Minimum query_similarity to use the speculative results
+    """
+
+    def __init__(self, enabled: bool = True, min_similarity: float = 0.5):
+        if not 0 < min_similarity <= 1:
+            raise ValueError(f"SPECULATIVE_SEARCH_MIN_SIMILARITY must be in (0, 1], got {min_similarity}")
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._stats = {"attempts": 0, "hits": 0, "misses": 0, "errors": 0,
+                       "latency_saved_seconds": 0.0, "discarded_search_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "SpeculativeSearch":
+        return cls(
+            enabled=os.getenv("SPECULATIVE_SEARCH_ENABLED", "true").lower() == "true",
+            min_similarity=float(os.getenv("SPECULATIVE_SEARCH_MIN_SIMILARITY", "0.5"))
+        )
+
+    def accepts(self, question: str, analysis: Dict[str, Any]) -> Tuple[bool, str, Optional[float]]:
+        """(use the speculative results, reason, query similarity)"""
+        if analysis.get("filters"):
+            return False, "filters", None
+        search_query = analysis.get("search_query") or ""
+        if search_query.strip() == question.strip():
+            return True, "same_query", 1.0
+        similarity = round(query_similarity(question, search_query), 4)
+        if similarity >= self.min_similarity:
+            return True, "similar_query", similarity
+        return False, "different_query", similarity
+
+    def record(self, hit: bool, search_seconds: float, waited_seconds: float, error: bool = False) -> Dict[str, Any]:
+        """
+        Count one speculation and describe it for the request's metadata
+
+        Args:
+            hit: The speculative results were used
+            search_seconds: Duration of the speculative search (so far, when discarded unfinished)
+            waited_seconds: Time spent waiting for it after the analysis finished
+            error: The speculative search failed and the analyzed query was searched instead
+        """
+        saved = max(0.0, search_seconds - waited_seconds) if hit else 0.0
+        with self._lock:
+            self._stats["attempts"] += 1
+            self._stats["hits" if hit else "misses"] += 1
+            if error:
+                self._stats["errors"] += 1
+            self._stats["latency_saved_seconds"] += saved
+            if not hit:
+                self._stats["discarded_search_seconds"] += search_seconds
+        return {"hit": hit, "latency_saved_seconds": round(saved, 3)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = self.enabled
+        stats["hit_rate"] = round(stats["hits"] / stats["attempts"], 4) if stats["attempts"] else 0.0
+        stats["mean_latency_saved_per_hit_seconds"] = \
+            round(stats["latency_saved_seconds"] / stats["hits"], 3) if stats["hits"] else 0.0
+        stats["latency_saved_seconds"] = round(stats["latency_saved_seconds"], 3)
+        stats["discarded_search_seconds"] = round(stats["discarded_search_seconds"], 3)
+        return stats
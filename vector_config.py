@@ -0,0 +1,109 @@
+"""
+Vector Compression Settings
+Single source of truth for embedding dimensions, vector quantization and
+vector storage type, applied to the index schema, ingestion and queries
+"""
+
+import copy
+import os
+from typing import Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_FIELD_NAME = "content_vector"
+COMPRESSION_API_VERSION = "2024-07-01"
+DEFAULT_API_VERSION = "2023-11-01"
+
+# Models that accept a reduced `dimensions` parameter (Matryoshka embeddings)
+REDUCIBLE_MODEL_PREFIXES = ("text-embedding-3",)
+
+
+class VectorSettings:
+    """
+    Embedding and vector index configuration
+
+    Environment variables:
+        EMBEDDING_DIMENSIONS: Reduced dimensions for text-embedding-3 models (unset = model default)
+        VECTOR_COMPRESSION: none, scalar (int8) or binary quantization
+        VECTOR_STORAGE_TYPE: Edm.Single or Edm.Half
+        VECTOR_OVERSAMPLING: Oversampling used to rescore compressed results
+    """
+
+    COMPRESSIONS = ("none", "scalar", "binary")
+    STORAGE_TYPES = ("Edm.Single", "Edm.Half")
+
+    def __init__(self,
+                 dimensions: Optional[int] = None,
+                 compression: str = "none",
+                 storage_type: str = "Edm.Single",
+                 oversampling: float = 4.0):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"VECTOR_COMPRESSION must be one of {self.COMPRESSIONS}, got '{compression}'")
+        if storage_type not in self.STORAGE_TYPES:
+            raise ValueError(f"VECTOR_STORAGE_TYPE must be one of {self.STORAGE_TYPES}, got '{storage_type}'")
+
+        self.dimensions = dimensions
+        self.compression = compression
+        self.storage_type = storage_type
+        self.oversampling = oversampling
+
+    @classmethod
+    def from_env(cls) -> "VectorSettings":
+        return cls(
+            dimensions=int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None,
+            compression=os.getenv("VECTOR_COMPRESSION", "none").lower(),
+            storage_type=os.getenv("VECTOR_STORAGE_TYPE", "Edm.Single"),
+            oversampling=float(os.getenv("VECTOR_OVERSAMPLING", "4.0"))
+        )
+
+    @property
+    def index_api_version(self) -> str:
+        """Compression and half-precision storage need a newer REST API version"""
+        if self.compression != "none" or self.storage_type != "Edm.Single":
+            return COMPRESSION_API_VERSION
+        return DEFAULT_API_VERSION
+
+    def embedding_kwargs(self, model: Optional[str]) -> Dict[str, Any]:
+        """Extra arguments for embeddings.create so documents and queries share one vector space"""
+        if self.dimensions and (model or "").startswith(REDUCIBLE_MODEL_PREFIXES):
+            return {"dimensions": self.dimensions}
+        return {}
+
+    def apply_to_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of the index schema with the vector field and compression configured"""
+        schema = copy.deepcopy(schema)
+        profile_name = None
+
+        for field in schema["fields"]:
+            if field["name"] == VECTOR_FIELD_NAME:
+                field["type"] = f"Collection({self.storage_type})"
+                if self.dimensions:
+                    field["dimensions"] = self.dimensions
+                profile_name = field.get("vectorSearchProfile")
+
+        if self.compression == "none":
+            return schema
+
+        vector_search = schema.setdefault("vectorSearch", {})
+        compression_name = f"{self.compression}-compression"
+        compression = {
+            "name": compression_name,
+            "kind": "scalarQuantization" if self.compression == "scalar" else "binaryQuantization",
+            "rerankWithOriginalVectors": True,
+            "defaultOversampling": self.oversampling
+        }
+        if self.compression == "scalar":
+            compression["scalarQuantizationParameters"] = {"quantizedDataType": "int8"}
+        vector_search["compressions"] = [compression]
+
+        for profile in vector_search.get("profiles", []):
+            if profile["name"] == profile_name:
+                profile["compression"] = compression_name
+
+        return schema
+
+    def describe(self) -> str:
+        return (f"dimensions={self.dimensions or 'model default'}, "
+                f"compression={self.compression}, storage={self.storage_type}")